@@ -0,0 +1,511 @@
+# alert_enrichment.py
+# Streaming enrichment of Wazuh alerts: alerts.json (or NDJSON on stdin) ->
+# bounded queue -> one retrieval and LLM call per alert group -> NDJSON out.
+import os
+import sys
+import json
+import time
+import queue
+import random
+import argparse
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from telemetry import get_logger, metrics, span
+
+logger = get_logger("alert_enrichment")
+
+DEFAULT_ALERTS_FILE = "/var/ossec/logs/alerts/alerts.json"
+
+# Fields that, with the rule and decoder, make two alerts the same kind of event
+DEFAULT_KEY_FIELDS = (
+    "rule.id",
+    "decoder.name",
+    "decoder.parent",
+    "syscheck.event",
+    "data.win.system.eventID",
+    "data.vulnerability.cve",
+)
+
+ENRICHMENT_TEMPLATE = """Based on the following Wazuh documentation context, explain this Wazuh alert to a SOC analyst.
+
+DOCUMENTATION CONTEXT:
+{context}
+
+ALERT:
+{alert}
+
+Answer concisely as a Wazuh specialist with:
+1. What the alert means and what triggered it
+2. Whether it is likely benign or malicious, and why
+3. Triage steps to confirm it
+4. Recommended response or tuning (rules, decoders, active response)
+
+Wazuh Specialist Enrichment:"""
+
+_DONE = object()
+UNGROUPED_PREFIX = "ungrouped:"
+
+
+def field(alert, path):
+    """Value at a dotted path such as ``rule.id``, or None"""
+    value = alert
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def group_key(alert, key_fields=DEFAULT_KEY_FIELDS):
+    """Alerts with the same key share one enrichment"""
+    parts = []
+    for name in key_fields:
+        value = field(alert, name)
+        if value is not None:
+            parts.append(f"{name}={value}")
+    return "|".join(parts)
+
+
+def describe_alert(alert, key_fields=DEFAULT_KEY_FIELDS):
+    """Group-level description of an alert, without per-event values like IPs"""
+    rule = alert.get("rule") or {}
+    lines = [
+        f"Rule {rule.get('id', '?')} (level {rule.get('level', '?')}): {rule.get('description', '')}",
+        f"Groups: {', '.join(rule.get('groups') or [])}",
+    ]
+    mitre = rule.get("mitre") or {}
+    if mitre.get("id"):
+        lines.append(f"MITRE ATT&CK: {', '.join(mitre['id'])} "
+                     f"({', '.join(mitre.get('technique') or [])})")
+    for name in key_fields:
+        value = field(alert, name)
+        if value is not None and not name.startswith("rule."):
+            lines.append(f"{name}: {value}")
+    if alert.get("full_log"):
+        lines.append(f"Example log: {alert['full_log'][:500]}")
+    return "\n".join(lines)
+
+
+def follow(path, from_start=False, poll_interval=0.5, stop=None):
+    """Yield lines appended to a file, like ``tail -F``.
+
+    Survives rotation (the path pointing to a new file) and truncation.
+    Lines are only yielded once complete. Files opened after a rotation
+    are read from the beginning.
+    """
+    stop = stop or threading.Event()
+    f = None
+    inode = None
+    partial = ""
+    while not stop.is_set():
+        if f is None:
+            try:
+                f = open(path, 'r', encoding='utf-8', errors='replace')
+            except FileNotFoundError:
+                stop.wait(poll_interval)
+                continue
+            inode = os.fstat(f.fileno()).st_ino
+            if not from_start:
+                f.seek(0, os.SEEK_END)
+            from_start = True
+            partial = ""
+
+        line = f.readline()
+        if line:
+            partial += line
+            if partial.endswith("\n"):
+                yield partial
+                partial = ""
+            continue
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stat = None
+        if stat is None or stat.st_ino != inode:
+            f.close()
+            f = None
+            continue
+        if stat.st_size < f.tell():
+            f.seek(0)
+            partial = ""
+            continue
+        stop.wait(poll_interval)
+    if f is not None:
+        f.close()
+
+
+class EnrichmentCache:
+    """In-memory LRU of enrichments per alert group, expiring after ``ttl_seconds``"""
+
+    def __init__(self, ttl_seconds=3600, max_entries=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry["created"] > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self._entries[key] = dict(entry, created=time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class AlertEnricher:
+    """Enriches a stream of Wazuh alerts with documentation-grounded LLM analysis.
+
+    Alerts are read on a background thread into a queue of ``queue_size``;
+    when it is full the reader blocks, which holds back the tailed file or
+    the stdin pipe. Alerts are grouped by ``key_fields`` (rule, decoder and
+    a few event fields), and each group gets one retrieval and one Ollama
+    generation, cached for ``cache_ttl`` seconds. Alerts of a group already
+    being generated wait for that generation instead of starting another.
+    At most ``concurrency`` generations run at once, with up to
+    ``max_pending_groups`` groups in flight. A group holds at most
+    ``max_waiting_per_group`` alerts; further alerts of that group block
+    reading until its generation finishes. Alerts without any key field
+    are enriched on their own and not cached. Each input alert is written to
+    ``output`` as one NDJSON line with an ``ai_enrichment`` object. Output
+    order follows completion, not input order.
+    """
+
+    def __init__(self, specialist, output=None, concurrency=2, queue_size=1000,
+                 cache_ttl=3600, cache_max_entries=10000, key_fields=DEFAULT_KEY_FIELDS,
+                 max_pending_groups=None, max_waiting_per_group=1000, progress_interval=30.0):
+        self.specialist = specialist
+        self.output = output or sys.stdout
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.key_fields = tuple(key_fields)
+        self.max_pending_groups = max_pending_groups or concurrency * 2
+        self.max_waiting_per_group = max_waiting_per_group
+        self.progress_interval = progress_interval
+        self.cache = EnrichmentCache(cache_ttl, cache_max_entries)
+        self.stats = {"alerts": 0, "invalid": 0, "generated": 0, "cached": 0,
+                      "coalesced": 0, "errors": 0, "llm_calls": 0}
+        self._waiting = {}
+        self._in_flight = {}
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _put(alerts, item, stop):
+        """Put an item unless the consumer has stopped; returns False if it has"""
+        while not stop.is_set():
+            try:
+                alerts.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self, lines, alerts, stop):
+        try:
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    alert = json.loads(line)
+                except ValueError:
+                    self.stats["invalid"] += 1
+                    metrics.inc("enrich_invalid_lines_total")
+                    continue
+                if not isinstance(alert, dict):
+                    self.stats["invalid"] += 1
+                    continue
+                if not self._put(alerts, alert, stop):
+                    return
+        except BaseException as e:
+            logger.error(f"❌ Error reading alerts: {e}")
+        finally:
+            self._put(alerts, _DONE, stop)
+
+    # ------------------------------------------------------------------
+    # Enrichment
+    # ------------------------------------------------------------------
+
+    def _enrich_group(self, alert):
+        """Retrieve documentation and generate the enrichment shared by a group"""
+        specialist = self.specialist
+        description = describe_alert(alert, self.key_fields)
+        rule = alert.get("rule") or {}
+        question = (f"Wazuh rule {rule.get('id', '')} {rule.get('description', '')} "
+                    f"{' '.join(rule.get('groups') or [])}")
+        fixed_tokens = (specialist.context_packer.count_tokens(specialist.system_prompt)
+                        + specialist.context_packer.count_tokens(
+                            ENRICHMENT_TEMPLATE.format(context="", alert=description)))
+        start = time.perf_counter()
+        with span("enrich", rule=rule.get("id")):
+            context, sources = specialist.retrieve(question, used_tokens=fixed_tokens)
+            prompt = ENRICHMENT_TEMPLATE.format(context=context, alert=description)
+            stats = {}
+            text = "".join(specialist.generate_stream(prompt, stats))
+        metrics.observe("enrich_group_seconds", time.perf_counter() - start)
+        return {"text": text, "sources": sources, "model": specialist.model,
+                "generation_time": stats.get("generation_time")}
+
+    def _emit(self, alert, key, entry, result):
+        enrichment = {"group": key, "result": result}
+        if "error" in entry:
+            enrichment["error"] = entry["error"]
+        else:
+            enrichment.update(text=entry["text"], sources=entry["sources"], model=entry["model"])
+        self.output.write(json.dumps(dict(alert, ai_enrichment=enrichment)) + "\n")
+        self.output.flush()
+        self.stats[result] += 1
+        metrics.inc("enrich_alerts_total", result=result)
+
+    def _dispatch(self, alert, pool):
+        self.stats["alerts"] += 1
+        key = group_key(alert, self.key_fields)
+        if not key:
+            # Nothing identifies the event, so it shares nothing with others
+            key = f"{UNGROUPED_PREFIX}{self.stats['alerts']}"
+        entry = self.cache.get(key)
+        if entry is not None:
+            self._emit(alert, key, entry, "cached")
+            return
+        if key in self._waiting:
+            if len(self._waiting[key]) < self.max_waiting_per_group:
+                self._waiting[key].append(alert)
+                return
+            # Stop reading until the group's generation finishes instead of
+            # buffering without bound; the queue then blocks the reader
+            future = next(future for future, k in self._in_flight.items() if k == key)
+            wait([future])
+            self._collect([future])
+            entry = self.cache.get(key)
+            if entry is not None:
+                self._emit(alert, key, entry, "cached")
+                return
+        self._waiting[key] = [alert]
+        self.stats["llm_calls"] += 1
+        self._in_flight[pool.submit(self._enrich_group, alert)] = key
+
+    def _collect(self, futures):
+        for future in futures:
+            key = self._in_flight.pop(future)
+            alerts = self._waiting.pop(key)
+            try:
+                entry = future.result()
+            except Exception as e:
+                entry = {"error": f"Error communicating with AI model: {e}"}
+                for alert in alerts:
+                    self._emit(alert, key, entry, "errors")
+                continue
+            if not key.startswith(UNGROUPED_PREFIX):
+                self.cache.put(key, entry)
+            self._emit(alerts[0], key, entry, "generated")
+            for alert in alerts[1:]:
+                self._emit(alert, key, entry, "coalesced")
+
+    def run(self, lines):
+        """Enrich alerts from an iterable of NDJSON lines until it ends; return the stats"""
+        alerts = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        reader = threading.Thread(
+            target=self._read, args=(lines, alerts, stop), name="alert-reader", daemon=True
+        )
+        start = time.perf_counter()
+        last_report = start
+        logger.info(f"🚨 Enriching alerts grouped by {', '.join(self.key_fields)} "
+                    f"with {self.concurrency} concurrent generations")
+
+        reader.start()
+        with ThreadPoolExecutor(max_workers=self.concurrency,
+                                thread_name_prefix="enrich-generation") as pool:
+            try:
+                while True:
+                    finished = [future for future in self._in_flight if future.done()]
+                    self._collect(finished)
+
+                    now = time.perf_counter()
+                    if now - last_report >= self.progress_interval:
+                        last_report = now
+                        self._report(now - start, alerts.qsize())
+
+                    # Stop taking alerts while Ollama is saturated; the full
+                    # queue then blocks the reader
+                    if len(self._in_flight) >= self.max_pending_groups:
+                        finished, _ = wait(self._in_flight, timeout=1.0,
+                                           return_when=FIRST_COMPLETED)
+                        self._collect(finished)
+                        continue
+
+                    try:
+                        alert = alerts.get(timeout=0.2)
+                    except queue.Empty:
+                        continue
+                    if alert is _DONE:
+                        break
+                    self._dispatch(alert, pool)
+                    metrics.set_gauge("enrich_queue_depth", alerts.qsize())
+
+                while self._in_flight:
+                    finished, _ = wait(self._in_flight, return_when=FIRST_COMPLETED)
+                    self._collect(finished)
+            finally:
+                stop.set()
+                for future in self._in_flight:
+                    future.cancel()
+
+        self.stats["seconds"] = time.perf_counter() - start
+        self._report(self.stats["seconds"], 0)
+        return self.stats
+
+    def _report(self, elapsed, queued):
+        stats = self.stats
+        rate = stats["alerts"] / elapsed * 60 if elapsed else 0.0
+        logger.info(f"⏳ {stats['alerts']} alerts ({rate:.0f}/min), {stats['llm_calls']} LLM calls, "
+                    f"{stats['cached']} cached, {stats['coalesced']} coalesced, "
+                    f"{stats['errors']} errors, queue {queued}/{self.queue_size}")
+
+
+# ----------------------------------------------------------------------
+# Synthetic alerts for testing
+# ----------------------------------------------------------------------
+
+ALERT_TYPES = [
+    {"rule": {"id": "5710", "level": 5, "description": "sshd: Attempt to login using a non-existent user",
+              "groups": ["syslog", "sshd", "authentication_failed"],
+              "mitre": {"id": ["T1110.001"], "technique": ["Password Guessing"]}},
+     "decoder": {"parent": "sshd", "name": "sshd"},
+     "full_log": "sshd[{pid}]: Invalid user {user} from {ip} port {port}"},
+    {"rule": {"id": "5712", "level": 10,
+              "description": "sshd: brute force trying to get access to the system. Non existent user.",
+              "groups": ["syslog", "sshd", "authentication_failures"],
+              "mitre": {"id": ["T1110"], "technique": ["Brute Force"]}},
+     "decoder": {"parent": "sshd", "name": "sshd"},
+     "full_log": "sshd[{pid}]: Invalid user {user} from {ip} port {port}"},
+    {"rule": {"id": "5715", "level": 3, "description": "sshd: authentication success.",
+              "groups": ["syslog", "sshd", "authentication_success"]},
+     "decoder": {"parent": "sshd", "name": "sshd"},
+     "full_log": "sshd[{pid}]: Accepted publickey for {user} from {ip} port {port} ssh2"},
+    {"rule": {"id": "550", "level": 7, "description": "Integrity checksum changed.",
+              "groups": ["ossec", "syscheck", "syscheck_entry_modified"]},
+     "decoder": {"name": "syscheck_integrity_changed"},
+     "syscheck": {"event": "modified", "path": "/etc/{file}"}},
+    {"rule": {"id": "554", "level": 5, "description": "File added to the system.",
+              "groups": ["ossec", "syscheck", "syscheck_entry_added"]},
+     "decoder": {"name": "syscheck_new_entry"},
+     "syscheck": {"event": "added", "path": "/usr/bin/{file}"}},
+    {"rule": {"id": "60122", "level": 5, "description": "Logon Failure - Unknown user or bad password",
+              "groups": ["windows", "windows_security", "authentication_failed"]},
+     "decoder": {"name": "windows_eventchannel"},
+     "data": {"win": {"system": {"eventID": "4625"}, "eventdata": {"targetUserName": "{user}",
+                                                                  "ipAddress": "{ip}"}}}},
+    {"rule": {"id": "31101", "level": 5, "description": "Web server 400 error code.",
+              "groups": ["web", "accesslog", "attack"]},
+     "decoder": {"name": "web-accesslog"},
+     "full_log": '{ip} - - "GET /{file}.php HTTP/1.1" 404 162'},
+    {"rule": {"id": "23505", "level": 10, "description": "{cve} affects openssl",
+              "groups": ["vulnerability-detector"]},
+     "decoder": {"name": "json"},
+     "data": {"vulnerability": {"cve": "{cve}", "package": {"name": "openssl"}, "severity": "High"}}},
+]
+
+
+def _fill(value, values):
+    if isinstance(value, dict):
+        return {k: _fill(v, values) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, values) for v in value]
+    if isinstance(value, str):
+        return value.format(**values)
+    return value
+
+
+def synthetic_alerts(count, agents=20, cves=5, seed=0):
+    """Yield Wazuh-shaped alerts drawn from ALERT_TYPES with varying per-event fields"""
+    rng = random.Random(seed)
+    for i in range(count):
+        values = {
+            "pid": rng.randint(1000, 60000),
+            "user": rng.choice(["admin", "root", "test", "oracle", "deploy", "guest"]),
+            "ip": f"203.0.113.{rng.randint(1, 254)}",
+            "port": rng.randint(30000, 65000),
+            "file": rng.choice(["passwd", "shadow", "sudoers", "wp-login", "hosts"]),
+            "cve": f"CVE-2024-{1000 + rng.randrange(cves)}",
+        }
+        alert = _fill(rng.choice(ALERT_TYPES), values)
+        agent = rng.randrange(agents)
+        alert.update({
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S.000+0000", time.gmtime()),
+            "agent": {"id": f"{agent:03d}", "name": f"agent-{agent}", "ip": f"10.0.0.{agent + 10}"},
+            "manager": {"name": "wazuh-manager"},
+            "id": f"{int(time.time())}.{i}",
+            "location": "/var/log/auth.log",
+        })
+        yield alert
+
+
+def add_arguments(parser):
+    parser.add_argument("--alerts-file", default=DEFAULT_ALERTS_FILE,
+                        help="alerts.json to follow, or '-' to read NDJSON from stdin")
+    parser.add_argument("--from-start", action="store_true",
+                        help="Enrich alerts already in the file, not only new ones")
+    parser.add_argument("--no-follow", action="store_true",
+                        help="Stop at the end of the file instead of waiting for new alerts")
+    parser.add_argument("--output", default="-", help="Enriched NDJSON output file ('-' for stdout)")
+    parser.add_argument("--concurrency", type=int, default=2,
+                        help="Generations sent to Ollama at once")
+    parser.add_argument("--queue-size", type=int, default=1000,
+                        help="Alerts buffered before reading is paused")
+    parser.add_argument("--cache-ttl", type=float, default=3600,
+                        help="Seconds an enrichment is reused for its alert group")
+    parser.add_argument("--key-fields", type=lambda value: [v for v in value.split(",") if v],
+                        default=list(DEFAULT_KEY_FIELDS),
+                        help="Comma-separated alert fields that define a group")
+
+
+def main(args, specialist):
+    with ExitStack() as files:
+        if args.alerts_file == "-":
+            lines = sys.stdin
+        elif args.no_follow:
+            lines = files.enter_context(open(args.alerts_file, 'r', encoding='utf-8', errors='replace'))
+        else:
+            lines = follow(args.alerts_file, from_start=args.from_start)
+        output = sys.stdout if args.output == "-" else files.enter_context(
+            open(args.output, 'a', encoding='utf-8'))
+        enricher = AlertEnricher(
+            specialist,
+            output=output,
+            concurrency=args.concurrency,
+            queue_size=args.queue_size,
+            cache_ttl=args.cache_ttl,
+            key_fields=args.key_fields
+        )
+        try:
+            stats = enricher.run(lines)
+        except KeyboardInterrupt:
+            stats = enricher.stats
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic Wazuh alerts as NDJSON")
+    parser.add_argument("--count", type=int, default=1000, help="Alerts to generate")
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for alert in synthetic_alerts(args.count, agents=args.agents, seed=args.seed):
+        sys.stdout.write(json.dumps(alert) + "\n")
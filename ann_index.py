@@ -0,0 +1,146 @@
+import math
+
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq")
+
+
+class IndexConfig:
+    """FAISS index type and its build/search parameters.
+
+    ``flat`` is exact search. ``hnsw`` is a graph index tuned with
+    ``hnsw_m``/``ef_construction`` at build time and ``ef_search`` at query
+    time. ``ivf`` and ``ivfpq`` are inverted-file indexes trained on a sample
+    of up to ``train_sample`` vectors and searched over ``nprobe`` lists;
+    ``ivfpq`` additionally compresses vectors with ``pq_m`` sub-quantizers of
+    ``pq_bits`` bits. ``nlist`` defaults to about 4*sqrt(N), and ``pq_bits``
+    is lowered to log2(N) when there are too few vectors to train it.
+    """
+
+    def __init__(self, index_type="flat", hnsw_m=32, ef_construction=200, ef_search=64,
+                 nlist=None, nprobe=8, pq_m=16, pq_bits=8, train_sample=50000):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+        self.index_type = index_type
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.pq_bits = pq_bits
+        self.train_sample = train_sample
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    def build_params(self):
+        """Parameters that require rebuilding the index when changed"""
+        params = self.to_dict()
+        del params["nprobe"]
+        del params["ef_search"]
+        return params
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**(data or {}))
+
+    def describe(self):
+        if self.index_type == "hnsw":
+            return f"hnsw(M={self.hnsw_m}, efSearch={self.ef_search})"
+        if self.index_type == "ivf":
+            return f"ivf(nlist={self.nlist or 'auto'}, nprobe={self.nprobe})"
+        if self.index_type == "ivfpq":
+            return f"ivfpq(nlist={self.nlist or 'auto'}, nprobe={self.nprobe}, m={self.pq_m})"
+        return "flat"
+
+    def __repr__(self):
+        return f"IndexConfig({self.describe()})"
+
+
+def default_nlist(n_vectors):
+    # FAISS wants roughly 39 training points per centroid
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39 or 1))
+
+
+def _pq_bits(n_vectors, pq_bits):
+    """Bits per code that ``n_vectors`` training points can train (2**bits centroids)"""
+    return min(pq_bits, int(math.log2(max(n_vectors, 1))))
+
+
+def _pq_subquantizers(dim, pq_m):
+    """Largest sub-quantizer count <= pq_m that divides the dimension"""
+    for m in range(min(pq_m, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def create_index(dim, config, n_vectors):
+    """Empty FAISS index of the configured type; IVF types still need training.
+
+    ``n_vectors`` sizes the default ``nlist`` of IVF indexes and caps the
+    PQ code size; below two vectors ``ivfpq`` falls back to IVF-Flat.
+    """
+    import faiss
+
+    if config.index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif config.index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, config.hnsw_m)
+        index.hnsw.efConstruction = config.ef_construction
+    else:
+        nlist = config.nlist or default_nlist(n_vectors)
+        pq_bits = _pq_bits(n_vectors, config.pq_bits)
+        if config.index_type == "ivf" or pq_bits < 1:
+            spec = f"IVF{nlist},Flat"
+        else:
+            spec = f"IVF{nlist},PQ{_pq_subquantizers(dim, config.pq_m)}x{pq_bits}"
+        index = faiss.index_factory(dim, spec, faiss.METRIC_L2)
+    return index
+
+
+def train_index(index, vectors, config):
+    """Train an IVF index on up to ``train_sample`` of the given vectors"""
+    import numpy as np
+
+    if index.is_trained:
+        return
+    sample = vectors
+    if len(vectors) > config.train_sample:
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(len(vectors), config.train_sample, replace=False)]
+    index.train(sample)
+
+
+def build_index(vectors, config):
+    """Build, train and fill a FAISS index for a float32 matrix of vectors"""
+    import numpy as np
+
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    n_vectors, dim = vectors.shape
+    index = create_index(dim, config, n_vectors)
+    train_index(index, vectors, config)
+    index.add(vectors)
+    apply_search_params(index, config)
+    return index
+
+
+def apply_search_params(index, config):
+    """Set query-time parameters (nprobe / efSearch) on a built or loaded index"""
+    import faiss
+
+    if config.index_type in ("ivf", "ivfpq"):
+        faiss.extract_index_ivf(index).nprobe = config.nprobe
+    elif config.index_type == "hnsw":
+        faiss.downcast_index(index).hnsw.efSearch = config.ef_search
+
+
+def supports_removal(config):
+    """HNSW graphs cannot delete vectors in place"""
+    return config.index_type != "hnsw"
+
+
+def index_memory_bytes(index):
+    """Serialized size of an index, a close proxy for its resident memory"""
+    import faiss
+
+    return int(faiss.serialize_index(index).nbytes)
@@ -0,0 +1,165 @@
+import os
+import json
+import math
+import time
+import atexit
+import tempfile
+import threading
+from collections import OrderedDict
+from telemetry import get_logger
+
+logger = get_logger("answer_cache")
+
+
+def _normalize(vector):
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else list(vector)
+
+
+class SemanticAnswerCache:
+    """Answer cache that matches questions by embedding cosine similarity.
+
+    Entries live in a namespace built from the LLM model, the prompt template
+    version and the vector store version, so rebuilding the index or changing
+    the prompt never returns stale answers. Entries are evicted in LRU order
+    once ``max_entries`` is reached and expire after ``ttl_seconds``.
+
+    New answers are written to ``path`` at most every ``save_interval``
+    seconds, plus once at exit, instead of rewriting the file per answer.
+    """
+
+    def __init__(self, path="./wazuh_answer_cache.json", similarity_threshold=0.92,
+                 max_entries=500, ttl_seconds=7 * 24 * 3600, save_interval=5.0):
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.save_interval = save_interval
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._dirty = False
+        self._last_save = 0.0
+        self.load()
+        if path:
+            atexit.register(self.flush)
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Ignoring unreadable answer cache {self.path}: {e}")
+            return
+        for entry in data.get("entries", []):
+            self.entries[self._next_id] = entry
+            self._next_id += 1
+        self._expire()
+        self._trim()
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            self._write()
+
+    def flush(self):
+        """Save if answers were stored since the last write"""
+        if self.path and self._dirty:
+            self.save()
+
+    def _write(self):
+        # Called with the lock held, so snapshots are written in order
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(
+            dir=directory, prefix=os.path.basename(self.path) + ".", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"entries": list(self.entries.values())}, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def _write_if_due(self):
+        if self.path and self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+            self._write()
+
+    def _expire(self):
+        if not self.ttl_seconds:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        for key in [k for k, e in self.entries.items() if e["created"] < cutoff]:
+            del self.entries[key]
+            self._dirty = True
+
+    def _trim(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self._dirty = True
+
+    def lookup(self, namespace, embedding):
+        """Return (entry, similarity) for the closest cached question, or (None, best)"""
+        query = _normalize(embedding)
+        best_key, best_score = None, -1.0
+        with self._lock:
+            self._expire()
+            for key, entry in self.entries.items():
+                if entry["namespace"] != namespace:
+                    continue
+                score = sum(a * b for a, b in zip(query, entry["embedding"]))
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            self._write_if_due()
+
+            if best_key is not None and best_score >= self.similarity_threshold:
+                self.entries.move_to_end(best_key)
+                entry = self.entries[best_key]
+                self.hits += 1
+                self.latency_saved += entry.get("generation_time", 0.0)
+                return entry, best_score
+            self.misses += 1
+            return None, best_score
+
+    def store(self, namespace, question, embedding, answer, generation_time, sources=None):
+        entry = {
+            "namespace": namespace,
+            "question": question,
+            "embedding": _normalize(embedding),
+            "answer": answer,
+            "sources": sources or [],
+            "generation_time": generation_time,
+            "created": time.time(),
+        }
+        with self._lock:
+            self.entries[self._next_id] = entry
+            self._next_id += 1
+            self._trim()
+            self._dirty = True
+            self._write_if_due()
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            if self.path:
+                self._write()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self.entries),
+            "latency_saved": self.latency_saved,
+        }
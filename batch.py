@@ -0,0 +1,311 @@
+# batch.py
+# Answer a JSONL file of prepared questions: batched embedding and retrieval,
+# bounded parallel generation, results streamed to an output JSONL.
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from percentiles import percentile
+from telemetry import configure_logging, get_logger, metrics, span
+
+logger = get_logger("batch")
+
+
+def load_questions(path):
+    """Read {"id": ..., "question": ...} lines; a missing id becomes the line number"""
+    questions = []
+    seen = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{number}: invalid JSON ({e})")
+            if not isinstance(record, dict):
+                raise ValueError(f"{path}:{number}: expected a JSON object")
+            question = str(record.get("question", "")).strip()
+            if not question:
+                raise ValueError(f"{path}:{number}: missing 'question'")
+            question_id = str(record.get("id", number))
+            if question_id in seen:
+                raise ValueError(f"{path}:{number}: duplicate id {question_id}")
+            seen.add(question_id)
+            questions.append((question_id, question))
+    return questions
+
+
+def _drop_partial_line(path):
+    """Truncate a last line left unterminated by an interrupted run"""
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def completed_ids(path, retry_failed=False):
+    """IDs already recorded in an output file, answered or failed.
+
+    With ``retry_failed`` the error records are removed from the file so
+    those questions are asked again without leaving two records per ID.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    _drop_partial_line(path)
+    kept = []
+    dropped = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if retry_failed and "error" in record:
+                dropped += 1
+                continue
+            done.add(str(record.get("id")))
+            kept.append(line)
+    if dropped:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(kept)
+        os.replace(tmp_path, path)
+        logger.info(f"🔁 Retrying {dropped} failed questions")
+    return done
+
+
+class BatchRunner:
+    """Answers prepared questions in batches against a shared WazuhSpecialist.
+
+    Questions are processed ``batch_size`` at a time. Each batch is embedded
+    with one batched model call, checked against the answer cache and
+    retrieved with one multi-query FAISS search. Prompts then go to Ollama
+    with at most ``concurrency`` generations running, while the next batch
+    is retrieved. Every result is appended to the output JSONL as soon as
+    it is finished, so an interrupted run resumes by skipping the IDs the
+    output already contains. Questions that fail are recorded with an
+    ``error`` and skipped on resume unless ``retry_failed`` is set.
+    """
+
+    def __init__(self, specialist, concurrency=2, batch_size=64, progress_interval=10.0):
+        self.specialist = specialist
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+
+    def _generate(self, prompt, submitted):
+        stats = {}
+        queue_time = time.perf_counter() - submitted
+        answer = "".join(self.specialist.generate_stream(prompt, stats))
+        return answer, dict(stats, queue=queue_time)
+
+    def _prepare(self, batch):
+        """Return (prepared, failed) for a batch, isolating questions that cannot be prepared.
+
+        ``prepared`` holds (question_id, question, embedding, namespace,
+        cached_entry, prompt, sources) and ``failed`` (question_id,
+        question, error). If the batched path fails, the questions are
+        prepared one at a time so a single bad question does not fail the
+        rest of its batch.
+        """
+        try:
+            return self._prepare_batch(batch), []
+        except Exception as e:
+            if len(batch) == 1:
+                return [], [(batch[0][0], batch[0][1], str(e))]
+            logger.warning(f"⚠️  Batch preparation failed ({e}), preparing questions one at a time")
+        prepared = []
+        failed = []
+        for question_id, question in batch:
+            try:
+                prepared.extend(self._prepare_batch([(question_id, question)]))
+            except Exception as e:
+                failed.append((question_id, question, str(e)))
+        return prepared, failed
+
+    def _prepare_batch(self, batch):
+        specialist = self.specialist
+        questions = [question for _, question in batch]
+        embeddings = specialist.vector_store.embeddings.embed_queries(questions)
+
+        prepared = []
+        pending = []
+        for (question_id, question), embedding in zip(batch, embeddings):
+            entry, _, _, namespace = specialist.lookup_cached_answer(question, embedding)
+            prepared.append([question_id, question, embedding, namespace, entry, None, []])
+            if entry is None:
+                pending.append(len(prepared) - 1)
+
+        retrieved = specialist.retrieve_batch(
+            [questions[i] for i in pending], embeddings=[embeddings[i] for i in pending]
+        )
+        for i, (context, sources) in zip(pending, retrieved):
+            prepared[i][5] = specialist.build_prompt(questions[i], context)
+            prepared[i][6] = sources
+        return prepared
+
+    def run(self, questions, output_path, resume=True, retry_failed=False):
+        """Answer (id, question) pairs into output_path and return throughput stats"""
+        done = completed_ids(output_path, retry_failed) if resume else set()
+        todo = [(qid, question) for qid, question in questions if qid not in done]
+        counts = {"answered": 0, "cached": 0, "failed": 0}
+        latencies = []
+        eval_tokens = 0
+        in_flight = {}
+        start = time.perf_counter()
+        last_report = start
+        logger.info(f"📋 {len(todo)} questions to answer ({len(questions) - len(todo)} already done), "
+                    f"{self.concurrency} concurrent generations")
+
+        with open(output_path, 'a' if resume else 'w', encoding='utf-8') as output, \
+                ThreadPoolExecutor(max_workers=self.concurrency,
+                                   thread_name_prefix="batch-generation") as pool, \
+                span("batch", questions=len(todo), concurrency=self.concurrency) as stage:
+
+            def write(record, result, latency):
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                counts[result] += 1
+                metrics.inc("batch_questions_total", result=result)
+                if result != "failed":
+                    latencies.append(latency)
+                    metrics.observe("batch_question_seconds", latency)
+
+            def collect(futures):
+                nonlocal eval_tokens
+                for future in futures:
+                    question_id, question, embedding, namespace, sources, batch_start, retrieval = \
+                        in_flight.pop(future)
+                    latency = time.perf_counter() - batch_start
+                    try:
+                        answer, stats = future.result()
+                    except Exception as e:
+                        write({"id": question_id, "question": question,
+                               "error": f"Error communicating with AI model: {e}"}, "failed", latency)
+                        continue
+                    eval_tokens += stats["eval_count"]
+                    try:
+                        self.specialist.store_cached_answer(
+                            namespace, question, embedding, answer,
+                            generation_time=latency, sources=sources
+                        )
+                    except Exception as e:
+                        logger.warning(f"⚠️  Could not cache answer for {question_id}: {e}")
+                    write({"id": question_id, "question": question, "answer": answer,
+                           "sources": sources, "cached": False,
+                           "timings": dict(stats, retrieval=retrieval, total=latency)},
+                          "answered", latency)
+
+            for i in range(0, len(todo), self.batch_size):
+                batch_start = time.perf_counter()
+                prepared, failed = self._prepare(todo[i:i + self.batch_size])
+                retrieval = time.perf_counter() - batch_start
+
+                for question_id, question, error in failed:
+                    logger.error(f"❌ Could not prepare question {question_id}: {error}")
+                    write({"id": question_id, "question": question,
+                           "error": f"Error preparing question: {error}"}, "failed", retrieval)
+
+                for question_id, question, embedding, namespace, entry, prompt, sources in prepared:
+                    if entry is not None:
+                        write({"id": question_id, "question": question, "answer": entry["answer"],
+                               "sources": entry.get("sources", []), "cached": True,
+                               "timings": {"retrieval": retrieval, "total": retrieval}},
+                              "cached", retrieval)
+                        continue
+                    future = pool.submit(self._generate, prompt, time.perf_counter())
+                    in_flight[future] = (question_id, question, embedding, namespace, sources,
+                                         batch_start, retrieval)
+
+                # Keep generating while the next batch is retrieved, but never
+                # let more than one batch of prompts queue up behind Ollama
+                while len(in_flight) > self.concurrency:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                    now = time.perf_counter()
+                    if now - last_report >= self.progress_interval:
+                        last_report = now
+                        self._report(counts, len(todo), now - start)
+
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(finished)
+            stage.set(**counts)
+
+        elapsed = time.perf_counter() - start
+        processed = sum(counts.values())
+        summary = dict(
+            counts,
+            questions=len(questions),
+            skipped=len(questions) - len(todo),
+            seconds=elapsed,
+            questions_per_second=processed / elapsed if elapsed else 0.0,
+            eval_tokens=eval_tokens,
+            tokens_per_second=eval_tokens / elapsed if elapsed else 0.0,
+            latency_p50=percentile(latencies, 50) if latencies else None,
+            latency_p99=percentile(latencies, 99) if latencies else None,
+        )
+        self._report(counts, len(todo), elapsed)
+        return summary
+
+    def _report(self, counts, total, elapsed):
+        processed = sum(counts.values())
+        rate = processed / elapsed if elapsed else 0.0
+        logger.info(f"⏳ {processed}/{total} questions in {elapsed:.1f}s ({rate:.2f} questions/s, "
+                    f"{counts['cached']} cached, {counts['failed']} failed)")
+
+
+def print_summary(summary, output_path):
+    print("\n" + "=" * 60)
+    print("📊 BATCH SUMMARY")
+    print("=" * 60)
+    print(f"  Questions:        {summary['questions']} ({summary['skipped']} already in the output)")
+    print(f"  Answered:         {summary['answered']} generated, {summary['cached']} from cache, "
+          f"{summary['failed']} failed")
+    print(f"  Wall time:        {summary['seconds']:.1f}s")
+    print(f"  Throughput:       {summary['questions_per_second']:.2f} questions/s, "
+          f"{summary['tokens_per_second']:.1f} generated tokens/s")
+    if summary["latency_p50"] is not None:
+        print(f"  Latency:          p50 {summary['latency_p50']:.2f}s, p99 {summary['latency_p99']:.2f}s")
+    print(f"  Output:           {output_path}")
+    print("=" * 60)
+
+
+def add_arguments(parser):
+    parser.add_argument("questions", help='JSONL file of {"id": ..., "question": ...} lines')
+    parser.add_argument("--output", default=None,
+                        help="Output JSONL (default: <questions>.answers.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=2,
+                        help="Generations sent to Ollama at once (match OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="Questions embedded and retrieved together")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Overwrite the output instead of skipping answered IDs")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Ask again the questions that failed in a previous run")
+
+
+def main(args, specialist):
+    questions = load_questions(args.questions)
+    output_path = args.output or os.path.splitext(args.questions)[0] + ".answers.jsonl"
+    runner = BatchRunner(specialist, concurrency=args.concurrency, batch_size=args.batch_size)
+    summary = runner.run(questions, output_path, resume=not args.no_resume,
+                         retry_failed=args.retry_failed)
+    print_summary(summary, output_path)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of Wazuh questions")
+    parser.add_argument("--ollama-host", default=None)
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_logging()
+
+    from wazuh_specialist import WazuhSpecialist
+    raise SystemExit(main(args, WazuhSpecialist(ollama_host=args.ollama_host)))
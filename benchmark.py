@@ -0,0 +1,415 @@
+import io
+import os
+import re
+import json
+import math
+import time
+import random
+import shutil
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager, redirect_stdout
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from percentiles import percentile
+from telemetry import LOGGER_NAME
+
+TOPICS = [
+    ("installation-guide/wazuh-indexer", "Wazuh indexer installation", "wazuh-indexer"),
+    ("installation-guide/wazuh-server", "Wazuh server installation", "wazuh-manager"),
+    ("user-manual/capabilities/log-data-collection", "Log data collection", "wazuh-logcollector"),
+    ("user-manual/capabilities/file-integrity", "File integrity monitoring", "wazuh-syscheckd"),
+    ("reference/ossec-conf/localfile", "localfile", "wazuh-logcollector"),
+    ("reference/ossec-conf/syscheck", "syscheck", "wazuh-syscheckd"),
+    ("reference/daemons/wazuh-analysisd", "wazuh-analysisd", "wazuh-analysisd"),
+    ("proof-of-concept/brute-force-attack", "Detecting a brute-force attack", "wazuh-analysisd"),
+    ("cloud-security/aws", "Monitoring AWS", "wazuh-modulesd"),
+    ("compliance/pci-dss", "PCI DSS", "wazuh-analysisd"),
+]
+
+SENTENCES = [
+    "Edit the {option} block in /var/ossec/etc/ossec.conf and restart the {daemon} service.",
+    "The {daemon} daemon reads events and matches them against rule {rule_id} at level {level}.",
+    "Use the GET /agents endpoint of the Wazuh server API to list the agents reporting {topic}.",
+    "Run systemctl restart wazuh-manager after changing {option} to apply the configuration.",
+    "High availability deployments distribute {topic} across several Wazuh server nodes.",
+    "Alerts generated by rule {rule_id} are indexed by the Wazuh indexer and shown in the dashboard.",
+    "Set the frequency option to {level}00 seconds to control how often {topic} runs.",
+    "Decoders extract fields such as srcip and dstuser before {daemon} evaluates the rules.",
+]
+
+QUERIES = [
+    "How do I install the Wazuh indexer?",
+    "How to detect brute force attacks?",
+    "<localfile>",
+    "wazuh-analysisd",
+    "What does the syscheck frequency option do?",
+    "How do I monitor AWS with Wazuh?",
+    "/agents",
+    "Which rule detects PCI DSS violations?",
+]
+
+
+class HashingEmbeddings:
+    """Deterministic feature-hashing embeddings so benchmarks run without a model download.
+
+    Used wrapped in CachedEmbeddings, which provides the langchain interface.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = [0.0] * self.dim
+        for token in re.findall(r'\w+', text.lower()):
+            digest = int(hashlib.md5(token.encode('utf-8')).hexdigest(), 16)
+            vector[digest % self.dim] += 1.0 if (digest >> 64) & 1 else -1.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def synthetic_page(index, paragraphs=12, seed=0, links=()):
+    """HTML page shaped like a documentation.wazuh.com page"""
+    rng = random.Random(seed * 100003 + index)
+    path, title, daemon = TOPICS[index % len(TOPICS)]
+    body = []
+    for p in range(paragraphs):
+        sentences = [
+            rng.choice(SENTENCES).format(
+                option=f"<{path.rsplit('/', 1)[-1]}>",
+                daemon=daemon,
+                rule_id=rng.randint(5500, 100999),
+                level=rng.randint(3, 15),
+                topic=title.lower(),
+            )
+            for _ in range(rng.randint(3, 7))
+        ]
+        body.append(f"<h2>{title} section {p + 1}</h2><p>{' '.join(sentences)}</p>")
+    nav = "".join(f' <a href="{href}">{href}</a>' for href in links)
+    return (
+        f"<html><head><title>{title} - Wazuh documentation</title></head><body>"
+        f"<nav>Wazuh documentation{nav}</nav>"
+        f"<h1>{title} (page {index})</h1>"
+        f"{''.join(body)}<footer>Copyright Wazuh, Inc.</footer></body></html>"
+    )
+
+
+class FixtureDocsServer:
+    """Local static site standing in for documentation.wazuh.com.
+
+    Serves ``n_pages`` synthetic pages under ``/current/`` with ETag and
+    Last-Modified validators, so conditional re-downloads return 304. With
+    ``link_fanout`` each page links to that many child pages (a tree rooted
+    at page 0, the same shape as a crawl by depth) plus duplicate, fragment,
+    off-site and other-version links a crawler must skip, and
+    ``/sitemap.xml`` lists every page.
+    """
+
+    def __init__(self, n_pages=100, host="127.0.0.1", port=0, latency=0.0, seed=0,
+                 link_fanout=0):
+        self.latency = latency
+        self.last_modified = formatdate(time.time(), usegmt=True)
+        paths = [f"/current/{TOPICS[i % len(TOPICS)][0]}/page-{i}.html" for i in range(n_pages)]
+        self.pages = {}
+        for i, page_path in enumerate(paths):
+            links = []
+            if link_fanout:
+                children = range(i * link_fanout + 1, min(n_pages, (i + 1) * link_fanout + 1))
+                links = [paths[child] for child in children]
+                links += [paths[0] + "#top", "/current/_static/../" + paths[0][len("/current/"):],
+                          "https://wazuh.com/", "/4.3/index.html", "/current/_static/logo.png"]
+            html = synthetic_page(i, seed=seed, links=links).encode('utf-8')
+            self.pages[page_path] = (html, hashlib.md5(html).hexdigest())
+        self.sitemap = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            + "".join(f"<url><loc>{{base}}{path}</loc></url>" for path in paths)
+            + "</urlset>"
+        )
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def urls(self):
+        return [self.url + path for path in self.pages]
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler_class(self):
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if fixture.latency:
+                    time.sleep(fixture.latency)
+                path = self.path.split("?", 1)[0]
+                if path == "/sitemap.xml":
+                    body = fixture.sitemap.replace("{base}", fixture.url).encode('utf-8')
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/xml")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                page = fixture.pages.get(path)
+                if page is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                html, etag = page
+                etag = f'"{etag}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(html)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", fixture.last_modified)
+                self.end_headers()
+                self.wfile.write(html)
+
+        return Handler
+
+
+def _metric(value, unit, better):
+    return {"value": value, "unit": unit, "better": better}
+
+
+@contextmanager
+def _quiet():
+    """Silence status output and info logs so they do not skew timings"""
+    logger = logging.getLogger(LOGGER_NAME)
+    level = logger.level
+    logger.setLevel(max(level, logging.WARNING))
+    try:
+        with redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        logger.setLevel(level)
+
+
+def _timed(fn, quiet=True):
+    start = time.perf_counter()
+    if quiet:
+        with _quiet():
+            result = fn()
+    else:
+        result = fn()
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(n_pages=100, n_questions=10, token_latency=0.005, doc_latency=0.0,
+                  embeddings="hashing", download_rps=0.0, workdir=None):
+    """Run every stage offline against local fixture servers and return metrics"""
+    from stub_ollama import StubOllamaServer
+    from document_processor import WazuhDocumentProcessor
+    from embedding_cache import EmbeddingCache, CachedEmbeddings
+    from vector_store import WazuhVectorStore, get_shared_embeddings
+    from wazuh_specialist import WazuhSpecialist
+
+    workdir = workdir or tempfile.mkdtemp(prefix="wazuh_bench_")
+    docs_folder = os.path.join(workdir, "docs")
+    metrics = {}
+
+    try:
+        with FixtureDocsServer(n_pages, latency=doc_latency) as docs_server, \
+                StubOllamaServer(token_latency=token_latency) as ollama_server:
+            print(f"🧪 Fixture site: {n_pages} pages at {docs_server.url}")
+
+            # Download: cold, then conditional re-run that should be all 304s
+            processor = WazuhDocumentProcessor(
+                docs_folder=docs_folder,
+                requests_per_second=download_rps
+            )
+            processor.wazuh_urls = docs_server.urls
+            _, elapsed = _timed(processor.download_wazuh_documentation)
+            total_bytes = sum(r["bytes"] for r in processor.last_download_results)
+            metrics["download_pages_per_sec"] = _metric(n_pages / elapsed, "pages/s", "higher")
+            metrics["download_mb_per_sec"] = _metric(total_bytes / elapsed / 1e6, "MB/s", "higher")
+            _, elapsed = _timed(processor.download_wazuh_documentation)
+            hits = sum(1 for r in processor.last_download_results if r["status"] == "not_modified")
+            metrics["redownload_seconds"] = _metric(elapsed, "s", "lower")
+            metrics["redownload_cache_hit_rate"] = _metric(hits / n_pages, "ratio", "higher")
+
+            documents, elapsed = _timed(processor.load_documents)
+            metrics["load_docs_per_sec"] = _metric(len(documents) / elapsed, "docs/s", "higher")
+            chunks, elapsed = _timed(lambda: processor.chunk_documents(documents))
+            metrics["chunk_docs_per_sec"] = _metric(len(documents) / elapsed, "docs/s", "higher")
+            metrics["chunks"] = _metric(len(chunks), "chunks", "info")
+
+            # Embedding throughput with a cold cache
+            if embeddings == "hashing":
+                model = HashingEmbeddings()
+                cache = EmbeddingCache(os.path.join(workdir, "embeddings.sqlite"))
+                embedder = CachedEmbeddings(model, cache, model_name="hashing-384")
+            else:
+                embedder = get_shared_embeddings(embeddings, os.path.join(workdir, "embeddings.sqlite"))
+            texts = [chunk.page_content for chunk in chunks]
+            _, elapsed = _timed(lambda: embedder.embed_documents(texts))
+            metrics["embed_chunks_per_sec"] = _metric(len(texts) / elapsed, "chunks/s", "higher")
+
+            # Index build (embeddings now come from the cache) and retrieval
+            vector_store = WazuhVectorStore(
+                persist_directory=os.path.join(workdir, "index"),
+                docs_folder=docs_folder,
+                embeddings=embedder
+            )
+            _, elapsed = _timed(vector_store.create_vector_store)
+            metrics["index_build_seconds"] = _metric(elapsed, "s", "lower")
+
+            latencies = []
+            for i in range(max(50, len(QUERIES))):
+                _, elapsed = _timed(lambda: vector_store.search_documents(QUERIES[i % len(QUERIES)]))
+                latencies.append(elapsed * 1000)
+            metrics["search_p50_ms"] = _metric(percentile(latencies, 50), "ms", "lower")
+            metrics["search_p99_ms"] = _metric(percentile(latencies, 99), "ms", "lower")
+
+            # End-to-end question answering against the stub Ollama server
+            with _quiet():
+                specialist = WazuhSpecialist(
+                    vector_store=vector_store,
+                    ollama_host=ollama_server.url,
+                    use_answer_cache=False
+                )
+            latencies = []
+            first_tokens = []
+            for i in range(n_questions):
+                _, elapsed = _timed(lambda: specialist.ask_question(QUERIES[i % len(QUERIES)]))
+                latencies.append(elapsed * 1000)
+                first_token = specialist.last_generation_stats.get("time_to_first_token")
+                if first_token is not None:
+                    first_tokens.append(first_token * 1000)
+            metrics["ask_p50_ms"] = _metric(percentile(latencies, 50), "ms", "lower")
+            metrics["ask_p99_ms"] = _metric(percentile(latencies, 99), "ms", "lower")
+            metrics["ask_ttft_p50_ms"] = _metric(percentile(first_tokens, 50), "ms", "lower")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {
+            "pages": n_pages,
+            "questions": n_questions,
+            "token_latency": token_latency,
+            "doc_latency": doc_latency,
+            "download_rps": download_rps,
+            "embeddings": embeddings,
+        },
+        "metrics": metrics,
+    }
+
+
+def compare(results, baseline, tolerance=0.1):
+    """Return the metrics that got worse than the baseline by more than tolerance"""
+    regressions = []
+    for name, metric in results["metrics"].items():
+        old = baseline.get("metrics", {}).get(name)
+        if not old or metric["better"] not in ("higher", "lower") or not old["value"]:
+            continue
+        change = (metric["value"] - old["value"]) / old["value"]
+        worse = change < -tolerance if metric["better"] == "higher" else change > tolerance
+        if worse:
+            regressions.append((name, old["value"], metric["value"], change))
+    return regressions
+
+
+def print_results(results, regressions=None):
+    print("\n" + "=" * 60)
+    print("📊 END-TO-END BENCHMARK")
+    print("=" * 60)
+    for name, metric in results["metrics"].items():
+        print(f"  {name:<28} {metric['value']:>12.2f} {metric['unit']}")
+    if regressions is not None:
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) against baseline:")
+            for name, old, new, change in regressions:
+                print(f"   - {name}: {old:.2f} -> {new:.2f} ({change:+.0%})")
+        else:
+            print("✅ No regressions against baseline")
+    print("=" * 60)
+
+
+def add_arguments(parser):
+    parser.add_argument("--pages", type=int, default=100, help="Synthetic corpus size in pages")
+    parser.add_argument("--questions", type=int, default=10, help="End-to-end questions to ask")
+    parser.add_argument("--token-latency", type=float, default=0.005,
+                        help="Stub Ollama delay per generated token in seconds")
+    parser.add_argument("--doc-latency", type=float, default=0.0,
+                        help="Fixture site delay per page in seconds")
+    parser.add_argument("--download-rps", type=float, default=0.0,
+                        help="Per-host download rate limit (0 = unlimited for the local fixture)")
+    parser.add_argument("--embeddings", default="hashing",
+                        help="'hashing' for offline runs, or a sentence-transformers model name")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write results")
+    parser.add_argument("--baseline", default=None, help="Previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative change counted as a regression")
+
+
+def main(args):
+    results = run_benchmark(
+        n_pages=args.pages,
+        n_questions=args.questions,
+        token_latency=args.token_latency,
+        doc_latency=args.doc_latency,
+        embeddings=args.embeddings,
+        download_rps=args.download_rps
+    )
+    regressions = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("params") != results["params"]:
+            print("⚠️  Baseline was run with different parameters, comparison may be misleading")
+        regressions = compare(results, baseline, args.tolerance)
+        results["regressions"] = [
+            {"metric": name, "baseline": old, "value": new, "change": change}
+            for name, old, new, change in regressions
+        ]
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print_results(results, regressions)
+    print(f"💾 Results written to {args.output}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the assistant")
+    add_arguments(parser)
+    raise SystemExit(main(parser.parse_args()))
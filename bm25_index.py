@@ -0,0 +1,110 @@
+import re
+import math
+import pickle
+from collections import Counter
+
+# Compound identifiers such as wazuh-analysisd, ossec.conf, agents/summary or
+# rule IDs are kept whole and additionally split into their parts.
+TOKEN_RE = re.compile(r"[a-z0-9_]+(?:[-./:][a-z0-9_]+)*")
+PART_RE = re.compile(r"[a-z0-9_]+")
+
+# Queries made only of identifiers: <localfile>, /agents, 5710, wazuh-analysisd
+IDENTIFIER_QUERY_RE = re.compile(
+    r"^\s*(?:(?:</?[\w\-]+/?>|/[\w\-./{}]*|\d{3,6}|\w+(?:[-_.:/]\w+)+)\s*)+$"
+)
+
+
+def tokenize(text):
+    """Lowercase tokens, keeping compound identifiers and their parts"""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = PART_RE.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def is_identifier_query(query):
+    """True for queries that only name config options, daemons, rule IDs or endpoints"""
+    return bool(IDENTIFIER_QUERY_RE.match(query))
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several ranked ID lists into one list of (id, score), best first"""
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """In-memory BM25 inverted index over chunk IDs that supports incremental updates"""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_term_freqs = {}
+        self.doc_lengths = {}
+        self.postings = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id, text):
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        term_freqs = Counter(tokenize(text))
+        self.doc_term_freqs[doc_id] = term_freqs
+        self.doc_lengths[doc_id] = sum(term_freqs.values())
+        self.total_length += self.doc_lengths[doc_id]
+        for term, freq in term_freqs.items():
+            self.postings.setdefault(term, {})[doc_id] = freq
+
+    def remove(self, doc_id):
+        term_freqs = self.doc_term_freqs.pop(doc_id, None)
+        if term_freqs is None:
+            return
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        for term in term_freqs:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def search(self, query, k=5):
+        """Return up to k (doc_id, score) pairs, best first"""
+        n_docs = len(self.doc_lengths)
+        if not n_docs:
+            return []
+        avg_length = self.total_length / n_docs
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, freq in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump({"k1": self.k1, "b": self.b, "doc_term_freqs": self.doc_term_freqs}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        for doc_id, term_freqs in data["doc_term_freqs"].items():
+            index.doc_term_freqs[doc_id] = term_freqs
+            index.doc_lengths[doc_id] = sum(term_freqs.values())
+            index.total_length += index.doc_lengths[doc_id]
+            for term, freq in term_freqs.items():
+                index.postings.setdefault(term, {})[doc_id] = freq
+        return index
@@ -0,0 +1,141 @@
+import re
+from telemetry import get_logger
+
+logger = get_logger("context_packer")
+
+EXCERPT_SEPARATOR = "\n\n--- DOCUMENTATION EXCERPT ---\n"
+SHINGLE_SIZE = 5
+
+
+def _shingles(text):
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _containment(candidate, other):
+    """Share of the candidate's shingles that already appear in another excerpt"""
+    if not candidate:
+        return 0.0
+    return len(candidate & other) / len(candidate)
+
+
+def _merge_overlap(first, second, min_overlap, max_overlap=400):
+    """Join two texts if the end of ``first`` repeats the start of ``second``"""
+    longest = min(len(first), len(second), max_overlap)
+    for size in range(longest, min_overlap - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return None
+
+
+class ContextPacker:
+    """Packs retrieved chunks into a token budget derived from the model context.
+
+    Adjacent or overlapping chunks from the same source are merged into one
+    excerpt, near-duplicate excerpts are dropped, and excerpts are added in
+    retrieval rank order until the budget is full. Token counts come from
+    tiktoken (cl100k_base, close to llama3's tokenizer); if the encoding is
+    unavailable, a 4-characters-per-token estimate is used instead.
+    """
+
+    def __init__(self, num_ctx=4096, answer_reserve=1024, encoding_name="cl100k_base",
+                 min_overlap=40, duplicate_threshold=0.8, min_excerpt_tokens=64):
+        self.num_ctx = num_ctx
+        self.answer_reserve = answer_reserve
+        self.min_overlap = min_overlap
+        self.duplicate_threshold = duplicate_threshold
+        self.min_excerpt_tokens = min_excerpt_tokens
+        try:
+            import tiktoken
+            self.encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            logger.warning(f"⚠️  tiktoken unavailable ({e}), estimating tokens from length")
+            self.encoding = None
+
+    def count_tokens(self, text):
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def _truncate(self, text, max_tokens):
+        if self.encoding is None:
+            return text[:max_tokens * 4]
+        return self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:max_tokens])
+
+    def budget(self, fixed_tokens):
+        """Tokens left for context after the fixed prompt parts and the answer reserve"""
+        return max(0, self.num_ctx - fixed_tokens - self.answer_reserve)
+
+    def merge_chunks(self, documents):
+        """Merge overlapping chunks per source; returns [(rank, source, text)] in rank order"""
+        segments = []
+        by_source = {}
+        for rank, doc in enumerate(documents):
+            source = doc.metadata.get('source', 'Unknown')
+            text = doc.page_content.strip()
+            if not text:
+                continue
+
+            merged = False
+            for segment in by_source.get(source, []):
+                if text in segment["text"]:
+                    merged = True
+                elif segment["text"] in text:
+                    segment["text"] = text
+                    merged = True
+                else:
+                    joined = (_merge_overlap(segment["text"], text, self.min_overlap)
+                              or _merge_overlap(text, segment["text"], self.min_overlap))
+                    if joined is not None:
+                        segment["text"] = joined
+                        merged = True
+                if merged:
+                    break
+
+            if not merged:
+                segment = {"rank": rank, "source": source, "text": text}
+                by_source.setdefault(source, []).append(segment)
+                segments.append(segment)
+
+        return [(s["rank"], s["source"], s["text"]) for s in sorted(segments, key=lambda s: s["rank"])]
+
+    def drop_near_duplicates(self, segments):
+        kept = []
+        kept_shingles = []
+        for segment in segments:
+            shingles = _shingles(segment[2])
+            if any(_containment(shingles, other) >= self.duplicate_threshold for other in kept_shingles):
+                continue
+            kept.append(segment)
+            kept_shingles.append(shingles)
+        return kept
+
+    def pack(self, documents, token_budget):
+        """Return (context, sources, context_tokens) filling at most token_budget tokens"""
+        segments = self.drop_near_duplicates(self.merge_chunks(documents))
+        separator_tokens = self.count_tokens(EXCERPT_SEPARATOR)
+
+        excerpts = []
+        sources = []
+        used = 0
+        for _, source, text in segments:
+            excerpt = f"SOURCE: {source}\nCONTENT:\n{text}"
+            cost = self.count_tokens(excerpt) + (separator_tokens if excerpts else 0)
+            remaining = token_budget - used
+            if cost > remaining:
+                # Fill the tail of the budget with a truncated excerpt if it is worth it
+                header_cost = self.count_tokens(f"SOURCE: {source}\nCONTENT:\n") + separator_tokens
+                room = remaining - header_cost
+                if room >= self.min_excerpt_tokens:
+                    excerpt = f"SOURCE: {source}\nCONTENT:\n{self._truncate(text, room)}"
+                    excerpts.append(excerpt)
+                    sources.append(source)
+                    used += self.count_tokens(excerpt) + (separator_tokens if len(excerpts) > 1 else 0)
+                break
+            excerpts.append(excerpt)
+            sources.append(source)
+            used += cost
+
+        return EXCERPT_SEPARATOR.join(excerpts), sources, used
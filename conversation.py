@@ -0,0 +1,272 @@
+# conversation.py
+import re
+import time
+
+from bm25_index import tokenize
+from telemetry import get_logger, metrics
+
+logger = get_logger("conversation")
+
+FOLLOW_UP_TEMPLATE = """USER FOLLOW-UP QUESTION: {question}
+
+Answer as a Wazuh specialist using the documentation context and the conversation above."""
+
+FOLLOW_UP_WITH_CONTEXT_TEMPLATE = """ADDITIONAL DOCUMENTATION CONTEXT:
+{context}
+
+USER FOLLOW-UP QUESTION: {question}
+
+Answer as a Wazuh specialist using all documentation context in this conversation."""
+
+HISTORY_TEMPLATE = """CONVERSATION SO FAR:
+{history}
+
+"""
+
+# Explicit references to something already in the conversation
+REFERENCE_RE = re.compile(
+    r"\b(it|its|this|that|these|those|they|them|above|previous|earlier|same|"
+    r"step \d+|the (first|second|third|last|other) (one|option|step|example|command))\b",
+    re.IGNORECASE
+)
+
+# Openers that tie a question to the previous answer, or explicit references
+FOLLOW_UP_RE = re.compile(
+    r"^\s*(and|also|but|so|then|what about|how about|why|how so|can you|could you|"
+    r"show me|give me|explain|elaborate|tell me more|more)\b"
+    r"|" + REFERENCE_RE.pattern,
+    re.IGNORECASE
+)
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "so", "then", "also", "to", "of", "in", "on", "for",
+    "with", "at", "by", "from", "as", "is", "are", "was", "were", "be", "been", "do", "does",
+    "did", "can", "could", "should", "would", "will", "i", "you", "we", "me", "my", "your",
+    "it", "its", "this", "that", "these", "those", "they", "them", "what", "which", "how",
+    "why", "when", "where", "who", "about", "more", "show", "give", "explain", "tell",
+    "elaborate", "please", "example", "examples", "there", "any", "some", "if", "not", "no",
+    "yes", "than", "one", "step", "steps", "first", "second", "third", "last", "other", "same",
+    "above", "previous", "earlier", "wazuh",
+}
+
+
+def content_terms(text):
+    return {token for token in tokenize(text) if token not in STOPWORDS and len(token) > 1}
+
+
+class ConversationSession:
+    """Multi-turn conversation that continues Ollama's context between turns.
+
+    Each turn sends only the new question (and any new documentation) along
+    with the ``context`` tokens Ollama returned for the previous turn, so the
+    system prompt, earlier documentation and answers are not re-sent or
+    re-evaluated. Follow-ups that explicitly refer back ("it", "that",
+    "step 2") and whose terms all appear in the questions or documentation
+    already in the conversation skip retrieval; other follow-ups search
+    only the sources already used, and anything else is retrieved as a new
+    question. The model's own answers never count as coverage. When the
+    context would no longer fit ``num_ctx`` it is restarted with the most
+    recent turns replayed as text, bounded by ``history_tokens``.
+    """
+
+    def __init__(self, specialist, history_tokens=None, keep_alive="30m", min_context_tokens=256):
+        self.specialist = specialist
+        self.packer = specialist.context_packer
+        self.history_tokens = history_tokens or specialist.num_ctx // 4
+        self.keep_alive = keep_alive
+        self.min_context_tokens = min_context_tokens
+        self.reset()
+
+    def reset(self):
+        """Forget the conversation; the next question starts a new Ollama context"""
+        self.context = None
+        self.turns = []
+        self.sources = []
+        self.documentation = ""
+        self.known_terms = set()
+        self.last_turn = {}
+        self.last_generation_stats = {}
+
+    # ------------------------------------------------------------------
+    # Follow-up handling
+    # ------------------------------------------------------------------
+
+    def classify(self, question):
+        """'new', 'narrow' (search previous sources only) or 'reuse' (skip retrieval)"""
+        if not self.turns:
+            return "new"
+        novel = content_terms(question) - self.known_terms
+        if not novel and REFERENCE_RE.search(question):
+            return "reuse"
+        if FOLLOW_UP_RE.search(question) and self.sources:
+            return "narrow"
+        return "new"
+
+    def _select(self, mode):
+        """Candidate filter that drops documentation already sent, optionally by source"""
+        sources = set(self.sources)
+
+        def select(documents):
+            fresh = [doc for doc in documents if doc.page_content.strip() not in self.documentation]
+            if mode == "narrow":
+                narrowed = [doc for doc in fresh if doc.metadata.get('source', 'Unknown') in sources]
+                if narrowed:
+                    return narrowed
+            return fresh
+
+        return select
+
+    def _history(self):
+        """Most recent turns as text, within history_tokens"""
+        lines = []
+        used = 0
+        for question, answer in reversed(self.turns):
+            turn = f"User: {question}\nAssistant: {answer}"
+            cost = self.packer.count_tokens(turn)
+            if used + cost > self.history_tokens:
+                room = self.history_tokens - used - self.packer.count_tokens(f"User: {question}\nAssistant: ")
+                if room >= self.packer.min_excerpt_tokens:
+                    lines.append(f"User: {question}\nAssistant: {self.packer._truncate(answer, room)}")
+                break
+            lines.append(turn)
+            used += cost
+        return "\n\n".join(reversed(lines))
+
+    def _restart_context(self, reason):
+        logger.info(f"🧹 {reason}; restarting the model context with the last turns as history")
+        metrics.inc("conversation_context_restarts_total")
+        self.context = None
+        self.documentation = ""
+        self.known_terms = set()
+
+    # ------------------------------------------------------------------
+    # Turns
+    # ------------------------------------------------------------------
+
+    def _prepare(self, question, mode):
+        """Return (prompt, context_tokens, new_documentation, sources)"""
+        specialist = self.specialist
+
+        if self.context is not None:
+            if mode == "reuse":
+                prompt = FOLLOW_UP_TEMPLATE.format(question=question)
+                if self.packer.budget(len(self.context) + self.packer.count_tokens(prompt)) > 0:
+                    return prompt, self.context, "", []
+            else:
+                used = len(self.context) + self.packer.count_tokens(
+                    FOLLOW_UP_WITH_CONTEXT_TEMPLATE.format(context="", question=question)
+                )
+                if self.packer.budget(used) >= self.min_context_tokens:
+                    logger.info(f"🔍 Searching Wazuh documentation for: '{question}' ({mode})")
+                    documentation, sources = specialist.retrieve(
+                        question, used_tokens=used, select=self._select(mode)
+                    )
+                    if not documentation:
+                        return FOLLOW_UP_TEMPLATE.format(question=question), self.context, "", []
+                    prompt = FOLLOW_UP_WITH_CONTEXT_TEMPLATE.format(
+                        context=documentation, question=question
+                    )
+                    return prompt, self.context, documentation, sources
+            self._restart_context(
+                f"Conversation reached {len(self.context)} of {self.packer.num_ctx} context tokens"
+            )
+
+        # Without a model context nothing can be reused, but previous sources still narrow
+        mode = "narrow" if mode == "reuse" else mode
+        history = self._history()
+        prefix = HISTORY_TEMPLATE.format(history=history) if history else ""
+        used = (self.packer.count_tokens(specialist.system_prompt)
+                + self.packer.count_tokens(prefix + specialist.build_prompt(question, "")))
+        logger.info(f"🔍 Searching Wazuh documentation for: '{question}'")
+        documentation, sources = specialist.retrieve(
+            question, used_tokens=used, select=self._select(mode) if self.turns else None
+        )
+        return prefix + specialist.build_prompt(question, documentation), None, documentation, sources
+
+    def ask_stream(self, question):
+        """Answer one turn, yielding tokens as Ollama produces them"""
+        specialist = self.specialist
+        start = time.perf_counter()
+        mode = self.classify(question)
+        self.last_generation_stats = {}
+        self.last_turn = {"mode": mode}
+        specialist.last_answer_info = {"cache_hit": False}
+
+        # Only a conversation's opening question is independent enough to cache
+        opening = not self.turns
+        cached = specialist.lookup_cached_answer(question) if opening else (None, None, None, None)
+        entry, similarity, question_embedding, namespace = cached
+        if entry is not None:
+            specialist.last_answer_info = {
+                "cache_hit": True,
+                "similarity": similarity,
+                "cached_question": entry["question"],
+                "latency": time.perf_counter() - start,
+                "latency_saved": entry.get("generation_time", 0.0)
+            }
+            self._record(question, entry["answer"], entry.get("sources", []), "", None)
+            yield entry["answer"]
+            return
+
+        prompt, context, documentation, sources = self._prepare(question, mode)
+        stats = {}
+        result = {}
+        parts = []
+        try:
+            for token in specialist.generate_stream(
+                prompt, stats, start=start, context=context,
+                keep_alive=self.keep_alive, result=result
+            ):
+                parts.append(token)
+                yield token
+        except Exception as e:
+            yield f"❌ Error communicating with AI model: {e}"
+            return
+
+        answer = "".join(parts)
+        latency = time.perf_counter() - start
+        self.last_generation_stats = stats
+        self.last_turn.update(latency=latency, continued=context is not None,
+                              context_tokens=len(context or []), retrieved=bool(documentation))
+        metrics.inc("conversation_turns_total", mode=mode,
+                    continued="true" if context is not None else "false")
+        self._record(question, answer, sources, documentation, result.get("context"))
+        if opening:
+            specialist.last_answer_info["latency"] = latency
+            specialist.store_cached_answer(
+                namespace, question, question_embedding, answer,
+                generation_time=latency, sources=sources
+            )
+
+    def _record(self, question, answer, sources, documentation, context):
+        self.turns.append((question, answer))
+        self.context = list(context) if context else None
+        for source in sources:
+            if source not in self.sources:
+                self.sources.append(source)
+        if self.context is None:
+            # Nothing is held by the model; the next turn replays the history
+            self.documentation = ""
+        elif documentation:
+            self.documentation += "\n" + documentation
+        self.specialist.last_sources = sources
+        # Only what the user asked and what was retrieved; terms the model
+        # merely mentioned in an answer have no documentation behind them
+        self.known_terms |= content_terms(question) | content_terms(documentation)
+
+    def ask(self, question):
+        return "".join(self.ask_stream(question))
+
+    def print_turn_stats(self):
+        """Show how the last turn was answered and what prompt evaluation cost"""
+        turn = self.last_turn
+        stats = self.last_generation_stats
+        if not stats:
+            return
+        if turn.get("continued"):
+            reused = f"continued {turn['context_tokens']} context tokens"
+        else:
+            reused = "new context"
+        retrieval = "retrieved" if turn.get("retrieved") else "no retrieval"
+        print(f"🧠 Turn {len(self.turns)} ({turn['mode']}, {retrieval}, {reused}): "
+              f"prompt eval {stats['prompt_eval_count']} tokens in {stats['prompt_eval_time']:.2f}s")
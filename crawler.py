@@ -0,0 +1,338 @@
+# crawler.py
+import os
+import json
+import time
+import sqlite3
+import threading
+import posixpath
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qsl, urlencode
+from urllib.robotparser import RobotFileParser
+
+from doc_downloader import DocumentDownloader, url_to_filename
+from telemetry import get_logger, metrics, span
+
+logger = get_logger("crawler")
+
+SKIP_EXTENSIONS = (
+    ".png", ".jpg", ".jpeg", ".gif", ".svg", ".ico", ".css", ".js", ".json", ".xml",
+    ".pdf", ".zip", ".gz", ".tgz", ".tar", ".rpm", ".deb", ".msi", ".pkg", ".woff", ".woff2",
+    ".ttf", ".eot", ".txt", ".yml", ".yaml",
+)
+
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+def normalize_url(url, base=None):
+    """Canonical form used to deduplicate the frontier, or None if not crawlable.
+
+    Resolves relative links, lowercases the scheme and host, drops default
+    ports, fragments and dot segments, and sorts query parameters.
+    """
+    if base is not None:
+        url = urljoin(base, url)
+    parts = urlparse(url.strip())
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if parts.port and parts.port != {"http": 80, "https": 443}[parts.scheme]:
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    normalized = posixpath.normpath(path)
+    if path.endswith("/") and normalized != "/":
+        normalized += "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunparse((parts.scheme.lower(), host, normalized, "", query, ""))
+
+
+def url_scope(url):
+    """(host, first path segment) a crawl seeded from ``url`` stays inside"""
+    parts = urlparse(url)
+    segments = [s for s in parts.path.split("/") if s]
+    prefix = "/" + segments[0] + "/" if len(segments) > 1 else "/"
+    return parts.netloc, prefix
+
+
+class CrawlFrontier:
+    """Persistent, deduplicated crawl frontier stored in SQLite.
+
+    Each normalized URL is stored once with its link depth and state
+    (pending, done, failed). Outgoing links of fetched pages are kept too,
+    so pages that come back 304 Not Modified can still be expanded, and so
+    are their ETag/Last-Modified validators, committed with each page so an
+    interrupted crawl still sends conditional GETs when it resumes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS frontier (
+                url TEXT PRIMARY KEY,
+                depth INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                status TEXT,
+                links TEXT,
+                updated REAL
+            )"""
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(frontier)")}
+        for column in ("etag", "last_modified"):
+            # Frontiers created before validators were stored
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE frontier ADD COLUMN {column} TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_frontier_state ON frontier (state, depth)"
+        )
+        self._conn.commit()
+
+    def add(self, urls, depth):
+        """Insert URLs not seen before; return how many were new"""
+        before = self._conn.total_changes
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO frontier (url, depth) VALUES (?, ?)",
+            [(url, depth) for url in urls]
+        )
+        self._conn.commit()
+        return self._conn.total_changes - before
+
+    def next_pending(self, limit, exclude=()):
+        """Shallowest pending URLs first, so the page limit favours breadth"""
+        rows = self._conn.execute(
+            "SELECT url, depth FROM frontier WHERE state = 'pending' "
+            "ORDER BY depth, rowid LIMIT ?",
+            (limit + len(exclude),)
+        ).fetchall()
+        return [(url, depth) for url, depth in rows if url not in exclude][:limit]
+
+    def complete(self, url, state, status, links=None, validators=None):
+        """Record a fetched page, with its links and ETag/Last-Modified when known"""
+        validators = validators or {}
+        self._conn.execute(
+            "UPDATE frontier SET state = ?, status = ?, links = COALESCE(?, links), "
+            "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), updated = ? "
+            "WHERE url = ?",
+            (state, status, json.dumps(links) if links is not None else None,
+             validators.get("etag"), validators.get("last_modified"), time.time(), url)
+        )
+        self._conn.commit()
+
+    def validators(self):
+        """{url: {"etag": ..., "last_modified": ...}} of every page that had validators"""
+        rows = self._conn.execute(
+            "SELECT url, etag, last_modified FROM frontier "
+            "WHERE etag IS NOT NULL OR last_modified IS NOT NULL"
+        )
+        return {url: {"etag": etag, "last_modified": last_modified}
+                for url, etag, last_modified in rows}
+
+    def links(self, url):
+        row = self._conn.execute("SELECT links FROM frontier WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else []
+
+    def restart(self):
+        """Queue every known URL again, e.g. to refresh a finished crawl"""
+        self._conn.execute("UPDATE frontier SET state = 'pending'")
+        self._conn.commit()
+
+    def clear(self):
+        self._conn.execute("DELETE FROM frontier")
+        self._conn.commit()
+
+    def counts(self):
+        return dict(self._conn.execute("SELECT state, COUNT(*) FROM frontier GROUP BY state"))
+
+    def close(self):
+        self._conn.close()
+
+
+class SiteCrawler:
+    """Breadth-first crawler that follows in-scope links from seed URLs and sitemaps.
+
+    Pages are fetched with a DocumentDownloader, so per-host concurrency,
+    rate limiting, retries and conditional GETs all apply. A crawl stays
+    within the host and top-level path (e.g. ``/current/``) of its seeds,
+    honours robots.txt and stops at ``max_depth`` links from a seed, after
+    ``max_pages`` fetches or after ``time_budget`` seconds. The frontier and
+    each page's validators are persisted after every page, so an
+    interrupted crawl resumes where it stopped.
+    """
+
+    def __init__(self, docs_folder, max_depth=3, max_pages=2000, time_budget=None,
+                 max_workers=8, per_host_concurrency=4, requests_per_second=4.0,
+                 respect_robots=True, frontier_path=None, downloader=None):
+        self.docs_folder = docs_folder
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.time_budget = time_budget
+        self.max_workers = max_workers
+        self.respect_robots = respect_robots
+        self.downloader = downloader or DocumentDownloader(
+            docs_folder,
+            max_workers=max_workers,
+            per_host_concurrency=per_host_concurrency,
+            requests_per_second=requests_per_second
+        )
+        self.frontier = CrawlFrontier(
+            frontier_path or os.path.join(docs_folder, ".crawl_frontier.sqlite")
+        )
+        # The frontier's validators are committed per page, so they are at
+        # least as recent as the downloader's cache file
+        for url, validators in self.frontier.validators().items():
+            self.downloader.validators[url] = dict(validators, filename=url_to_filename(url))
+        self.scopes = set()
+        self._robots = {}
+        self._robots_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Scope and politeness
+    # ------------------------------------------------------------------
+
+    def in_scope(self, url):
+        parts = urlparse(url)
+        if parts.path.lower().endswith(SKIP_EXTENSIONS):
+            return False
+        return any(parts.netloc == host and parts.path.startswith(prefix)
+                   for host, prefix in self.scopes)
+
+    def _robots_for(self, url):
+        parts = urlparse(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._robots_lock:
+            if origin not in self._robots:
+                self._robots[origin] = self._load_robots(origin)
+            return self._robots[origin]
+
+    def _load_robots(self, origin):
+        parser = RobotFileParser()
+        try:
+            response = self.downloader.session.get(
+                origin + "/robots.txt", timeout=self.downloader.timeout
+            )
+            if response.status_code == 200:
+                parser.parse(response.text.splitlines())
+            else:
+                parser.allow_all = True
+        except Exception:
+            parser.allow_all = True
+        return parser
+
+    def allowed(self, url):
+        if not self.respect_robots:
+            return True
+        agent = self.downloader.session.headers.get("User-Agent", "*")
+        return self._robots_for(url).can_fetch(agent, url)
+
+    # ------------------------------------------------------------------
+    # Seeding
+    # ------------------------------------------------------------------
+
+    def sitemap_urls(self, sitemap_url, _seen=None):
+        """URLs listed in a sitemap, following nested sitemap indexes"""
+        seen = _seen if _seen is not None else set()
+        if sitemap_url in seen:
+            return []
+        seen.add(sitemap_url)
+        try:
+            response = self.downloader._get(sitemap_url, {})
+            response.raise_for_status()
+            root = ET.fromstring(response.content)
+        except Exception as e:
+            logger.warning(f"⚠️  Could not read sitemap {sitemap_url}: {e}")
+            return []
+        urls = []
+        for loc in root.iter(f"{SITEMAP_NS}loc"):
+            url = (loc.text or "").strip()
+            if root.tag == f"{SITEMAP_NS}sitemapindex":
+                urls.extend(self.sitemap_urls(url, seen))
+            elif url:
+                urls.append(url)
+        return urls
+
+    def seed(self, urls=(), sitemaps=()):
+        """Add seed URLs and sitemap entries at depth 0; return the number of new URLs"""
+        seeds = [u for u in (normalize_url(url) for url in urls) if u]
+        self.scopes.update(url_scope(url) for url in seeds)
+        for sitemap in sitemaps:
+            if not self.scopes:
+                self.scopes.add(url_scope(sitemap))
+            seeds.extend(u for u in (normalize_url(url) for url in self.sitemap_urls(sitemap)) if u)
+        return self.frontier.add([url for url in seeds if self.in_scope(url)], 0)
+
+    # ------------------------------------------------------------------
+    # Crawling
+    # ------------------------------------------------------------------
+
+    def _fetch(self, url):
+        if not self.allowed(url):
+            return {"url": url, "status": "disallowed", "bytes": 0, "elapsed": 0.0,
+                    "error": "disallowed by robots.txt", "links": []}
+        return self.downloader.fetch(url, extract_links=True)
+
+    def _expand(self, url, depth, result):
+        """Queue in-scope links of a fetched page one level deeper"""
+        if depth >= self.max_depth:
+            return 0
+        links = result.get("links")
+        if links is None:
+            links = self.frontier.links(url)
+        children = {normalize_url(link) for link in links}
+        children = [link for link in children if link and self.in_scope(link)]
+        return self.frontier.add(children, depth + 1)
+
+    def crawl(self, on_result=None):
+        """Fetch pending frontier URLs until the frontier, page or time budget runs out"""
+        os.makedirs(self.docs_folder, exist_ok=True)
+        if not self.scopes:
+            raise ValueError("Seed the crawler with at least one URL or sitemap first")
+        start = time.perf_counter()
+        results = []
+        in_flight = {}
+        fetched = 0
+
+        def out_of_time():
+            return self.time_budget is not None and time.perf_counter() - start >= self.time_budget
+
+        with span("crawl", max_pages=self.max_pages, max_depth=self.max_depth) as stage, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                room = min(self.max_workers * 2 - len(in_flight),
+                           self.max_pages - fetched - len(in_flight))
+                if room > 0 and not out_of_time():
+                    busy = {url for url, _ in in_flight.values()}
+                    for url, depth in self.frontier.next_pending(room, exclude=busy):
+                        in_flight[executor.submit(self._fetch, url)] = (url, depth)
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, depth = in_flight.pop(future)
+                    result = future.result()
+                    result["depth"] = depth
+                    fetched += 1
+                    ok = result["status"] in ("downloaded", "not_modified", "empty")
+                    if ok:
+                        result["discovered"] = self._expand(url, depth, result)
+                    validators = None
+                    if result["status"] == "downloaded":
+                        validators = self.downloader.validators.get(url)
+                    self.frontier.complete(
+                        url, "done" if ok else "failed", result["status"],
+                        links=result.get("links"), validators=validators
+                    )
+                    metrics.inc("crawl_pages_total", status=result["status"])
+                    results.append(result)
+                    if on_result:
+                        on_result(result)
+            stage.set(fetched=fetched)
+
+        self.downloader._save_validators()
+        return results
+
+    def close(self):
+        self.frontier.close()
@@ -0,0 +1,235 @@
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def url_to_filename(url):
+    """Map a documentation URL to the file name used inside docs_folder.
+
+    URLs that differ only in their query string (``?page=2``) get distinct
+    names through a short hash of the query.
+    """
+    parts = urlparse(url)
+    path = parts.path.strip('/')
+    if not path:
+        path = "index"
+    name = re.sub(r'[^\w\-_.]', '_', path)
+    if parts.query:
+        name += "_" + hashlib.sha256(parts.query.encode('utf-8')).hexdigest()[:12]
+    return name + ".txt"
+
+
+class TokenBucket:
+    """Thread-safe token bucket that limits the request rate for one host"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available"""
+        if not self.rate or self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class DocumentDownloader:
+    """Concurrent, conditional downloader for documentation pages.
+
+    A pooled ``requests.Session`` is shared by a thread pool. Each host gets its
+    own concurrency semaphore and token bucket, failed requests are retried with
+    exponential backoff, and ETag/Last-Modified validators are kept per URL so
+    later runs send conditional GETs and skip unchanged pages.
+    """
+
+    def __init__(self, docs_folder, max_workers=8, per_host_concurrency=4,
+                 requests_per_second=4.0, max_retries=3, backoff_factor=0.5,
+                 timeout=30, user_agent="wazuh-ai-assistant/1.0"):
+        self.docs_folder = docs_folder
+        self.max_workers = max_workers
+        self.per_host_concurrency = per_host_concurrency
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.cache_path = os.path.join(docs_folder, ".http_cache.json")
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = user_agent
+
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self.validators = self._load_validators()
+
+    def _load_validators(self):
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return {}
+
+    def _save_validators(self):
+        with self._cache_lock:
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.docs_folder, prefix=".http_cache.", suffix=".tmp"
+            )
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self.validators, f, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.cache_path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+
+    def _host_limits(self, url):
+        host = urlparse(url).netloc
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = (
+                    threading.Semaphore(self.per_host_concurrency),
+                    TokenBucket(self.requests_per_second),
+                )
+            return self._hosts[host]
+
+    def _conditional_headers(self, url, filepath):
+        headers = {}
+        cached = self.validators.get(url)
+        if cached and os.path.exists(filepath):
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    def _get(self, url, headers):
+        """GET with per-host limits and retries with exponential backoff"""
+        semaphore, bucket = self._host_limits(url)
+        attempt = 0
+        while True:
+            bucket.acquire()
+            try:
+                with semaphore:
+                    response = self.session.get(url, headers=headers, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                retry_after = response.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else self.backoff_factor * (2 ** attempt)
+            except requests.RequestException:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_factor * (2 ** attempt)
+            attempt += 1
+            time.sleep(delay)
+
+    @staticmethod
+    def extract_text(html):
+        """Extract page text the same way WebBaseLoader does"""
+        return BeautifulSoup(html, "html.parser").get_text()
+
+    @staticmethod
+    def extract_text_and_links(html, base_url):
+        """Page text plus the absolute URLs of its links, from a single parse"""
+        soup = BeautifulSoup(html, "html.parser")
+        links = [urljoin(base_url, a["href"]) for a in soup.find_all("a", href=True)]
+        return soup.get_text(), links
+
+    def save_page(self, url, text):
+        """Write a page in the ``SOURCE:`` format used by docs_folder"""
+        filename = url_to_filename(url)
+        filepath = os.path.join(self.docs_folder, filename)
+        tmp_path = filepath + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(f"SOURCE: {url}\n")
+            f.write("=" * 80 + "\n")
+            f.write(text)
+        os.replace(tmp_path, filepath)
+        return filename
+
+    def fetch(self, url, extract_links=False):
+        """Download a single URL and return a result record.
+
+        With ``extract_links`` the record also carries the page's outgoing
+        links under ``links`` (absent when the page was not modified).
+        """
+        filename = url_to_filename(url)
+        filepath = os.path.join(self.docs_folder, filename)
+        result = {"url": url, "filename": filename, "status": "failed",
+                  "bytes": 0, "elapsed": 0.0, "error": None}
+        start = time.perf_counter()
+        try:
+            response = self._get(url, self._conditional_headers(url, filepath))
+            result["elapsed"] = time.perf_counter() - start
+
+            if response.status_code == 304:
+                result["status"] = "not_modified"
+                return result
+
+            response.raise_for_status()
+            result["bytes"] = len(response.content)
+            if extract_links:
+                text, result["links"] = self.extract_text_and_links(response.text, response.url)
+            else:
+                text = self.extract_text(response.text)
+            if not text.strip():
+                result["status"] = "empty"
+                return result
+
+            self.save_page(url, text)
+            with self._cache_lock:
+                self.validators[url] = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "filename": filename,
+                }
+            result["status"] = "downloaded"
+        except Exception as e:
+            result["elapsed"] = time.perf_counter() - start
+            result["error"] = str(e)
+        return result
+
+    def download(self, urls, on_result=None):
+        """Download all URLs concurrently and return the list of results"""
+        os.makedirs(self.docs_folder, exist_ok=True)
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.fetch, url) for url in urls]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if on_result:
+                    on_result(result)
+        self._save_validators()
+        return results
@@ -1,33 +1,43 @@
 # document_processor.py
 import os
 import glob
-import requests
-from bs4 import BeautifulSoup
-from langchain.document_loaders import (
-    PyPDFLoader,
-    TextLoader,
-    UnstructuredHTMLLoader,
-    WebBaseLoader
-)
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from urllib.parse import urljoin, urlparse
 import time
-import re
+from telemetry import configure_logging, get_logger, span
+
+logger = get_logger("document_processor")
 
 class WazuhDocumentProcessor:
-    def __init__(self, docs_folder="./wazuh_docs"):
+    def __init__(self, docs_folder="./wazuh_docs", max_workers=8,
+                 per_host_concurrency=4, requests_per_second=4.0,
+                 chunk_size=1000, chunk_overlap=200, version="current"):
         self.docs_folder = docs_folder
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-        )
+        self.version = version
+        self.max_workers = max_workers
+        self.per_host_concurrency = per_host_concurrency
+        self.requests_per_second = requests_per_second
+        self.last_download_results = []
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._text_splitter = None
         
         # Wazuh documentation URLs from your file
-        self.wazuh_urls = self.load_wazuh_urls()
+        self.wazuh_urls = self.load_wazuh_urls(version)
+    
+    @property
+    def text_splitter(self):
+        """Text splitter, created on first use so langchain is not imported at startup"""
+        if self._text_splitter is None:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+            
+            self._text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                length_function=len
+            )
+        return self._text_splitter
     
-    def load_wazuh_urls(self):
-        """Load all Wazuh URLs from the provided list"""
+    def load_wazuh_urls(self, version="current"):
+        """Load all Wazuh URLs from the provided list, for one documentation version"""
         urls = [
             # Getting started
             "https://documentation.wazuh.com/current/quickstart.html",
@@ -136,95 +146,182 @@ class WazuhDocumentProcessor:
             # Release notes
             "https://documentation.wazuh.com/current/release-notes/index.html"
         ]
+        if version != "current":
+            urls = [url.replace("/current/", f"/{version}/", 1) for url in urls]
         return urls
     
     def download_wazuh_documentation(self):
         """Download all Wazuh documentation from the provided URLs"""
-        print("🚀 Starting Wazuh documentation download...")
-        print(f"📁 Saving to: {self.docs_folder}")
-        
-        os.makedirs(self.docs_folder, exist_ok=True)
-        
-        successful_downloads = 0
-        failed_downloads = []
-        
-        for url in self.wazuh_urls:
-            try:
-                print(f"📥 Downloading: {url}")
-                
-                # Use WebBaseLoader from LangChain
-                loader = WebBaseLoader(url)
-                documents = loader.load()
-                
-                if documents and documents[0].page_content.strip():
-                    # Create filename from URL
-                    parsed_url = urlparse(url)
-                    path = parsed_url.path.strip('/')
-                    if not path:
-                        path = "index"
-                    
-                    # Clean filename
-                    filename = re.sub(r'[^\w\-_.]', '_', path) + ".txt"
-                    filepath = os.path.join(self.docs_folder, filename)
-                    
-                    # Save content
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        f.write(f"SOURCE: {url}\n")
-                        f.write("=" * 80 + "\n")
-                        f.write(documents[0].page_content)
-                    
-                    successful_downloads += 1
-                    print(f"✅ Saved: {filename}")
-                
-                # Be polite to the server
-                time.sleep(1)
-                
-            except Exception as e:
-                error_msg = f"Failed to download {url}: {str(e)}"
-                print(f"❌ {error_msg}")
-                failed_downloads.append(error_msg)
-                continue
-        
-        # Summary
-        print("\n" + "=" * 60)
-        print("📊 DOWNLOAD SUMMARY")
-        print("=" * 60)
-        print(f"✅ Successful downloads: {successful_downloads}/{len(self.wazuh_urls)}")
-        if failed_downloads:
-            print(f"❌ Failed downloads: {len(failed_downloads)}")
-            for failure in failed_downloads:
-                print(f"   - {failure}")
+        # requests/bs4 are only needed when downloading
+        from doc_downloader import DocumentDownloader
+        
+        logger.info("🚀 Starting Wazuh documentation download...")
+        logger.info(f"📁 Saving to: {self.docs_folder}")
+        
+        downloader = DocumentDownloader(
+            self.docs_folder,
+            max_workers=self.max_workers,
+            per_host_concurrency=self.per_host_concurrency,
+            requests_per_second=self.requests_per_second
+        )
         
+        def report(result):
+            size_kb = result['bytes'] / 1024
+            if result['status'] == 'downloaded':
+                logger.info(f"✅ Saved: {result['filename']} ({size_kb:.1f} KB in {result['elapsed']:.2f}s)")
+            elif result['status'] == 'not_modified':
+                logger.info(f"♻️  Not modified: {result['filename']} ({result['elapsed']:.2f}s)")
+            elif result['status'] == 'empty':
+                logger.warning(f"⚠️  Empty page: {result['url']}")
+            else:
+                logger.error(f"❌ Failed to download {result['url']}: {result['error']}")
+        
+        start = time.perf_counter()
+        with span("download", urls=len(self.wazuh_urls)) as stage:
+            results = downloader.download(self.wazuh_urls, on_result=report)
+            stage.set(bytes=sum(r['bytes'] for r in results))
+        wall_time = time.perf_counter() - start
+        
+        downloaded = [r for r in results if r['status'] == 'downloaded']
+        cache_hits = [r for r in results if r['status'] == 'not_modified']
+        failed = [r for r in results if r['status'] == 'failed']
+        total_bytes = sum(r['bytes'] for r in results)
+        successful_downloads = len(downloaded) + len(cache_hits)
+        
+        # Summary, as one record so JSON logs get one object with the counts
+        lines = [
+            f"📊 Download summary: {successful_downloads}/{len(self.wazuh_urls)} successful",
+            f"   📥 Fetched: {len(downloaded)} pages, {total_bytes / 1024:.1f} KB",
+            f"   ♻️  Cache hits (304 Not Modified): {len(cache_hits)}",
+            f"   ⏱️  Wall time: {wall_time:.2f}s",
+        ]
+        if results:
+            slowest = max(results, key=lambda r: r['elapsed'])
+            avg = sum(r['elapsed'] for r in results) / len(results)
+            lines.append(f"   ⏱️  Per-URL: avg {avg:.2f}s, slowest {slowest['elapsed']:.2f}s ({slowest['url']})")
+        logger.info("\n".join(lines), extra={"fields": {
+            "urls": len(self.wazuh_urls),
+            "downloaded": len(downloaded),
+            "not_modified": len(cache_hits),
+            "failed": len(failed),
+            "bytes": total_bytes,
+            "wall_seconds": round(wall_time, 3),
+        }})
+        if failed:
+            logger.error(f"❌ Failed downloads: {len(failed)}")
+            for failure in failed:
+                logger.error(f"   - Failed to download {failure['url']}: {failure['error']}",
+                             extra={"fields": {"url": failure['url'], "error": str(failure['error'])}})
+        
+        self.last_download_results = results
         return successful_downloads > 0
     
+    def crawl_wazuh_documentation(self, max_depth=3, max_pages=2000, time_budget=None,
+                                  use_sitemap=True, restart=False):
+        """Crawl in-scope links from the URL list (and sitemap.xml) into docs_folder.
+        
+        The frontier persists in docs_folder, so an interrupted crawl picks up
+        where it stopped; ``restart`` queues every known page again instead.
+        """
+        from urllib.parse import urlparse
+        from crawler import SiteCrawler
+        
+        logger.info("🕸️  Starting Wazuh documentation crawl...")
+        logger.info(f"📁 Saving to: {self.docs_folder} (depth {max_depth}, up to {max_pages} pages)")
+        
+        crawler = SiteCrawler(
+            self.docs_folder,
+            max_depth=max_depth,
+            max_pages=max_pages,
+            time_budget=time_budget,
+            max_workers=self.max_workers,
+            per_host_concurrency=self.per_host_concurrency,
+            requests_per_second=self.requests_per_second
+        )
+        try:
+            if restart:
+                crawler.frontier.restart()
+            sitemaps = []
+            if use_sitemap:
+                origins = {f"{p.scheme}://{p.netloc}" for p in map(urlparse, self.wazuh_urls)}
+                sitemaps = [origin + "/sitemap.xml" for origin in sorted(origins)]
+            new_urls = crawler.seed(self.wazuh_urls, sitemaps)
+            logger.info(f"🌱 Seeded {new_urls} new URLs, frontier: {crawler.frontier.counts()}")
+            
+            def report(result):
+                if result['status'] in ('failed', 'disallowed'):
+                    logger.error(f"❌ Failed to crawl {result['url']}: {result['error']}")
+                else:
+                    logger.debug(f"🕷️  {result['status']}: {result['url']} "
+                                 f"(depth {result['depth']}, +{result.get('discovered', 0)} links)")
+            
+            start = time.perf_counter()
+            results = crawler.crawl(on_result=report)
+            wall_time = time.perf_counter() - start
+            counts = crawler.frontier.counts()
+        finally:
+            crawler.close()
+        
+        fetched = [r for r in results if r['status'] == 'downloaded']
+        cache_hits = [r for r in results if r['status'] == 'not_modified']
+        skipped = len(results) - len(fetched) - len(cache_hits)
+        logger.info("\n".join([
+            f"📊 Crawl summary: {len(fetched)} downloaded, {len(cache_hits)} not modified, "
+            f"{skipped} failed or skipped this run",
+            f"   ⏱️  Wall time: {wall_time:.2f}s ({len(results) / wall_time if wall_time else 0:.1f} pages/s)",
+            f"   🗂️  Frontier: {counts.get('done', 0)} done, {counts.get('pending', 0)} pending, "
+            f"{counts.get('failed', 0)} failed",
+        ]), extra={"fields": {
+            "downloaded": len(fetched),
+            "not_modified": len(cache_hits),
+            "skipped": skipped,
+            "wall_seconds": round(wall_time, 3),
+            "frontier": counts,
+        }})
+        if counts.get('pending'):
+            logger.info("⏸️  Pending pages remain; run the crawl again to resume")
+        
+        self.last_download_results = results
+        return bool(fetched or cache_hits)
+    
+    def iter_document_files(self):
+        """Yield downloaded documentation files lazily, without listing them all first"""
+        for pattern in ("**/*.txt", "**/*.html"):
+            yield from glob.iglob(os.path.join(self.docs_folder, pattern), recursive=True)
+    
     def load_documents(self):
         """Load all downloaded Wazuh documents"""
+        from langchain.document_loaders import TextLoader
+        
         all_documents = []
         
         # Load text files
-        text_files = glob.glob(os.path.join(self.docs_folder, "**/*.txt"), recursive=True)
-        text_files.extend(glob.glob(os.path.join(self.docs_folder, "**/*.html"), recursive=True))
-        
-        for text_file in text_files:
-            try:
-                loader = TextLoader(text_file, encoding='utf-8')
-                documents = loader.load()
-                all_documents.extend(documents)
-                print(f"📖 Loaded: {os.path.basename(text_file)}")
-            except Exception as e:
-                print(f"❌ Error loading {text_file}: {e}")
-        
-        print(f"📚 Total documents loaded: {len(all_documents)}")
+        text_files = list(self.iter_document_files())
+        
+        with span("load", files=len(text_files)):
+            for text_file in text_files:
+                try:
+                    loader = TextLoader(text_file, encoding='utf-8')
+                    documents = loader.load()
+                    all_documents.extend(documents)
+                    logger.debug(f"📖 Loaded: {os.path.basename(text_file)}")
+                except Exception as e:
+                    logger.error(f"❌ Error loading {text_file}: {e}")
+        
+        logger.info(f"📚 Total documents loaded: {len(all_documents)}")
         return all_documents
     
     def chunk_documents(self, documents):
         """Split documents into manageable chunks"""
-        print("✂️  Splitting documents into chunks...")
-        chunks = self.text_splitter.split_documents(documents)
-        print(f"📄 Created {len(chunks)} document chunks")
+        logger.info("✂️  Splitting documents into chunks...")
+        with span("chunk", documents=len(documents)) as stage:
+            chunks = self.text_splitter.split_documents(documents)
+            stage.set(chunks=len(chunks))
+        logger.info(f"📄 Created {len(chunks)} document chunks")
         return chunks
 
 if __name__ == "__main__":
+    configure_logging()
     processor = WazuhDocumentProcessor()
     
     # Download documentation
@@ -235,6 +332,6 @@ if __name__ == "__main__":
         documents = processor.load_documents()
         chunks = processor.chunk_documents(documents)
         
-        print(f"🎉 Successfully processed {len(documents)} documents into {len(chunks)} chunks")
+        logger.info(f"🎉 Successfully processed {len(documents)} documents into {len(chunks)} chunks")
     else:
-        print("❌ Documentation download failed. Please check your internet connection.")
+        logger.error("❌ Documentation download failed. Please check your internet connection.")
@@ -0,0 +1,230 @@
+# embedding_backend.py
+# Sentence embedding backends. torch, sentence-transformers, onnxruntime and
+# tokenizers are imported only when the backend that needs them is created.
+import os
+import time
+import importlib.util
+
+from telemetry import get_logger, span
+
+logger = get_logger("embedding_backend")
+
+BACKENDS = ("torch", "onnx")
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_ONNX_MODEL_DIR = "./wazuh_onnx_models"
+
+
+def model_key(model_name, backend="torch", quantize=False):
+    """Name of the vectors a model produces with a backend and quantization"""
+    if backend == "torch" and not quantize:
+        # fp32 PyTorch vectors keep the key used before backends existed
+        return model_name
+    return f"{model_name}|{backend}{'-int8' if quantize else ''}"
+
+
+def onnx_model_dir(model_name, model_dir=DEFAULT_ONNX_MODEL_DIR):
+    return os.path.join(model_dir, model_name.replace("/", "__"))
+
+
+def onnx_available(model_name=DEFAULT_MODEL, model_dir=DEFAULT_ONNX_MODEL_DIR):
+    """Whether the ONNX Runtime backend can load, checked without importing it"""
+    modules = ["onnxruntime", "tokenizers"]
+    if not os.path.exists(os.path.join(onnx_model_dir(model_name, model_dir), "model.onnx")):
+        # Exporting the model the first time also needs optimum and transformers
+        modules += ["optimum", "transformers"]
+    return all(importlib.util.find_spec(module) is not None for module in modules)
+
+
+def resolve_backend(backend, model_name=DEFAULT_MODEL):
+    """Backend create_embedding_backend actually loads for a requested one"""
+    if backend == "onnx" and not onnx_available(model_name):
+        return "torch"
+    return backend
+
+
+class EmbeddingBackend:
+    """Embeds texts with one model on CPU.
+
+    ``model_key`` names the model, backend and quantization, so vectors
+    from different backends are never mixed in the embedding cache or in
+    one index.
+    """
+
+    name = None
+
+    def __init__(self, model_name=DEFAULT_MODEL, threads=None, batch_size=32, quantize=False):
+        self.model_name = model_name
+        self.threads = threads
+        self.batch_size = batch_size
+        self.quantize = quantize
+
+    @property
+    def model_key(self):
+        return model_key(self.model_name, self.name, self.quantize)
+
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class TorchEmbeddingBackend(EmbeddingBackend):
+    """sentence-transformers on PyTorch, optionally with dynamic int8 Linear layers"""
+
+    name = "torch"
+
+    def __init__(self, model_name=DEFAULT_MODEL, threads=None, batch_size=32, quantize=False):
+        super().__init__(model_name, threads, batch_size, quantize)
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device="cpu")
+        if quantize:
+            self.model = torch.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        vectors = self.model.encode(
+            list(texts), batch_size=self.batch_size, convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return vectors.tolist()
+
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """ONNX Runtime inference of an exported sentence-transformers model.
+
+    The model is exported once to ``model_dir`` (this needs optimum and
+    PyTorch); afterwards only onnxruntime and tokenizers are loaded. With
+    ``quantize`` the exported graph's weights are dynamically quantized to
+    int8. Token embeddings are mean-pooled over the attention mask and
+    L2-normalized, matching all-MiniLM-L6-v2's Pooling and Normalize
+    modules. Texts are sorted by length before batching to limit padding.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name=DEFAULT_MODEL, threads=None, batch_size=32, quantize=False,
+                 model_dir=DEFAULT_ONNX_MODEL_DIR, max_length=256, normalize=True):
+        super().__init__(model_name, threads, batch_size, quantize)
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.max_length = max_length
+        self.normalize = normalize
+        self.model_dir = onnx_model_dir(model_name, model_dir)
+        model_path = self.ensure_model()
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+    def ensure_model(self):
+        """Path of the (quantized) ONNX model, exporting it on first use"""
+        fp32_path = os.path.join(self.model_dir, "model.onnx")
+        int8_path = os.path.join(self.model_dir, "model_int8.onnx")
+        if not os.path.exists(fp32_path):
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+            from transformers import AutoTokenizer
+
+            logger.info(f"🔧 Exporting {self.model_name} to ONNX in {self.model_dir} (one time)...")
+            with span("onnx_export", model=self.model_name):
+                model = ORTModelForFeatureExtraction.from_pretrained(self.model_name, export=True)
+                model.save_pretrained(self.model_dir)
+                AutoTokenizer.from_pretrained(self.model_name).save_pretrained(self.model_dir)
+        if not self.quantize:
+            return fp32_path
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            logger.info(f"🔧 Quantizing {self.model_name} to int8...")
+            with span("onnx_quantize", model=self.model_name):
+                quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        return int8_path
+
+    def _embed_batch(self, texts):
+        import numpy as np
+
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for i in range(0, len(order), self.batch_size):
+            batch = order[i:i + self.batch_size]
+            for position, vector in zip(batch, self._embed_batch([texts[j] for j in batch])):
+                vectors[position] = vector.tolist()
+        return vectors
+
+
+def create_embedding_backend(backend="torch", model_name=DEFAULT_MODEL, threads=None,
+                             batch_size=32, quantize=False):
+    """Load an embedding backend, falling back to PyTorch if ONNX Runtime is unavailable"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    start = time.perf_counter()
+    if resolve_backend(backend, model_name) != backend:
+        logger.warning("⚠️  ONNX Runtime backend unavailable (pip install -r requirements-onnx.txt), "
+                       "using PyTorch")
+        backend = "torch"
+    with span("embedding_model_load", backend=backend, quantize=quantize):
+        if backend == "onnx":
+            try:
+                model = OnnxEmbeddingBackend(model_name, threads, batch_size, quantize)
+            except ImportError as e:
+                logger.warning(f"⚠️  ONNX Runtime backend unavailable ({e}), using PyTorch")
+                model = TorchEmbeddingBackend(model_name, threads, batch_size, quantize)
+        else:
+            model = TorchEmbeddingBackend(model_name, threads, batch_size, quantize)
+    logger.info(f"🧠 Loaded {model.model_key} embeddings in {time.perf_counter() - start:.1f}s")
+    return model
+
+
+def add_embedding_arguments(parser):
+    parser.add_argument("--embedding-backend", choices=BACKENDS, default="torch",
+                        help="Run the embedding model on PyTorch or ONNX Runtime")
+    parser.add_argument("--quantize-embeddings", action="store_true",
+                        help="Use a dynamically int8-quantized embedding model")
+    parser.add_argument("--embedding-threads", type=int, default=None,
+                        help="Intra-op threads for the embedding model (default: all cores)")
+    parser.add_argument("--embedding-batch-size", type=int, default=32,
+                        help="Texts per embedding model forward pass")
+
+
+def embedding_options(args):
+    """WazuhVectorStore/ShardedVectorStore keyword arguments from parsed arguments"""
+    return {
+        "embedding_backend": args.embedding_backend,
+        "embedding_threads": args.embedding_threads,
+        "embedding_quantize": args.quantize_embeddings,
+        "model_batch_size": args.embedding_batch_size,
+    }
@@ -0,0 +1,189 @@
+import os
+import re
+import time
+import random
+import argparse
+from itertools import islice
+
+from embedding_backend import DEFAULT_MODEL, OnnxEmbeddingBackend, TorchEmbeddingBackend
+from percentiles import percentile
+from telemetry import configure_logging
+
+DEFAULT_BACKENDS = [("torch", False), ("onnx", False), ("onnx", True)]
+
+
+def benchmark_corpus(docs_folder=None, n_pages=200, max_chunks=2000):
+    """Chunks of the downloaded documentation, or of synthetic pages if there is none"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    texts = []
+    if docs_folder and os.path.isdir(docs_folder) and os.listdir(docs_folder):
+        from document_processor import WazuhDocumentProcessor
+
+        processor = WazuhDocumentProcessor(docs_folder=docs_folder)
+        for path in islice(processor.iter_document_files(), n_pages):
+            with open(path, 'r', encoding='utf-8') as f:
+                texts.append(f.read())
+    else:
+        from benchmark import synthetic_page
+        from doc_downloader import DocumentDownloader
+
+        texts = [DocumentDownloader.extract_text_and_links(synthetic_page(i), "http://docs/")[0]
+                 for i in range(n_pages)]
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    return splitter.split_text("\n\n".join(texts))[:max_chunks]
+
+
+def sample_queries(chunks, n_queries, seed=0):
+    """Short question-like snippets taken from random chunks"""
+    from benchmark import QUERIES
+
+    rng = random.Random(seed)
+    queries = list(QUERIES)
+    while len(queries) < n_queries:
+        sentences = [s for s in re.split(r'(?<=[.?!])\s+', rng.choice(chunks)) if len(s.split()) >= 6]
+        if sentences:
+            queries.append(" ".join(rng.choice(sentences).split()[:12]))
+    return queries[:n_queries]
+
+
+def measure_backend(backend, quantize, model_name, chunks, queries, threads, batch_size):
+    """Load one backend and embed the corpus and queries; return (stats, doc vectors, query vectors)"""
+    import numpy as np
+
+    backend_class = OnnxEmbeddingBackend if backend == "onnx" else TorchEmbeddingBackend
+    start = time.perf_counter()
+    model = backend_class(model_name, threads=threads, batch_size=batch_size, quantize=quantize)
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    doc_vectors = np.array(model.embed_documents(chunks), dtype='float32')
+    embed_time = time.perf_counter() - start
+
+    latencies = []
+    query_vectors = []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(model.embed_query(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    stats = {
+        "backend": model.model_key,
+        "load_seconds": load_time,
+        "chunks_per_sec": len(chunks) / embed_time,
+        "query_p50_ms": percentile(latencies, 50),
+        "query_p99_ms": percentile(latencies, 99),
+    }
+    return stats, doc_vectors, np.array(query_vectors, dtype='float32')
+
+
+def top_k(doc_vectors, query_vectors, k):
+    """Exact cosine-similarity neighbours of each query"""
+    import faiss
+
+    doc_vectors = doc_vectors.copy()
+    query_vectors = query_vectors.copy()
+    faiss.normalize_L2(doc_vectors)
+    faiss.normalize_L2(query_vectors)
+    index = faiss.IndexFlatIP(doc_vectors.shape[1])
+    index.add(doc_vectors)
+    _, ids = index.search(query_vectors, k)
+    return ids
+
+
+def run_benchmark(model_name=DEFAULT_MODEL, backends=None, docs_folder=None, n_pages=200,
+                  max_chunks=2000, n_queries=200, k=5, threads=None, batch_size=32, tolerance=0.1):
+    """Compare embedding backends against the first fp32 one.
+
+    recall@k is the share of the fp32 model's top-k chunks that a backend
+    also retrieves when both documents and queries are embedded with it.
+    A backend passes when its recall@k is at least ``1 - tolerance``; the
+    run only counts as checked if a quantized backend got a recall@k.
+    """
+    backends = backends or DEFAULT_BACKENDS
+    chunks = benchmark_corpus(docs_folder, n_pages, max_chunks)
+    queries = sample_queries(chunks, n_queries)
+    print(f"🧪 Corpus: {len(chunks)} chunks, {len(queries)} queries, k={k}, model {model_name}")
+
+    results = []
+    reference = None
+    for backend, quantize in backends:
+        label = f"{backend}{' int8' if quantize else ''}"
+        print(f"🔨 Embedding with {label}...")
+        try:
+            stats, doc_vectors, query_vectors = measure_backend(
+                backend, quantize, model_name, chunks, queries, threads, batch_size
+            )
+        except ImportError as e:
+            print(f"⚠️  Skipping {label}: {e}")
+            continue
+        stats["quantized"] = quantize
+        ids = top_k(doc_vectors, query_vectors, k)
+        if reference is None and not quantize:
+            reference = ids
+        if reference is not None:
+            hits = sum(len(set(row.tolist()) & set(truth.tolist())) for row, truth in zip(ids, reference))
+            stats["recall_at_k"] = hits / (len(queries) * k)
+            stats["passed"] = stats["recall_at_k"] >= 1 - tolerance
+        results.append(stats)
+
+    print("\n" + "=" * 96)
+    print(f"📊 EMBEDDING BACKEND BENCHMARK (recall@{k} vs fp32, tolerance {tolerance:.2f})")
+    print("=" * 96)
+    print(f"{'backend':<48}{'load s':>8}{'chunks/s':>10}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'recall@' + str(k):>10}")
+    for r in results:
+        recall = f"{r['recall_at_k']:.3f}" if "recall_at_k" in r else "n/a"
+        mark = "" if r.get("passed", True) else "  ❌"
+        print(f"{r['backend']:<48}{r['load_seconds']:>8.2f}{r['chunks_per_sec']:>10.1f}"
+              f"{r['query_p50_ms']:>9.2f}{r['query_p99_ms']:>9.2f}{recall:>10}{mark}")
+    print("=" * 96)
+    if reference is None:
+        print("❌ No fp32 backend could be loaded, recall was not checked")
+    elif not quantized_recalls(results):
+        print("❌ No quantized backend could be loaded, recall was not checked")
+    return results
+
+
+def quantized_recalls(results):
+    return [r["recall_at_k"] for r in results if r.get("quantized") and "recall_at_k" in r]
+
+
+def add_arguments(parser):
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="sentence-transformers model")
+    parser.add_argument("--docs-folder", default="./wazuh_docs",
+                        help="Documentation to embed (synthetic pages if it is empty)")
+    parser.add_argument("--pages", type=int, default=200, help="Pages to take the corpus from")
+    parser.add_argument("--max-chunks", type=int, default=2000, help="Corpus size in chunks")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("-k", type=int, default=5, help="Neighbours compared per query")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads")
+    parser.add_argument("--batch-size", type=int, default=32, help="Texts per forward pass")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Allowed recall@k loss against the fp32 model")
+
+
+def main(args):
+    results = run_benchmark(
+        model_name=args.model,
+        docs_folder=args.docs_folder,
+        n_pages=args.pages,
+        max_chunks=args.max_chunks,
+        n_queries=args.queries,
+        k=args.k,
+        threads=args.threads,
+        batch_size=args.batch_size,
+        tolerance=args.tolerance
+    )
+    if not quantized_recalls(results):
+        return 1
+    return 0 if all(r.get("passed", True) for r in results) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare embedding backends and check int8 recall")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_logging()
+    raise SystemExit(main(args))
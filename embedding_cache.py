@@ -0,0 +1,213 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from telemetry import metrics, span
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:
+    from langchain.embeddings.base import Embeddings
+
+
+def normalize_text(text):
+    """Collapse whitespace so formatting-only changes still hit the cache"""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent SQLite store of float32 embedding vectors.
+
+    Entries are keyed by (model name, normalized text hash) and evicted in
+    least-recently-used order once ``max_entries`` is exceeded.
+    """
+
+    def __init__(self, path="./wazuh_embedding_cache.sqlite", max_entries=200000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    def get_many(self, model, hashes):
+        """Return {hash: vector} for the hashes present in the cache"""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(unique), 500):
+                batch = unique[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model] + batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array('f')
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, key) for key in found]
+                )
+                self._conn.commit()
+        self.hits += sum(1 for h in hashes if h in found)
+        self.misses += sum(1 for h in hashes if h not in found)
+        return found
+
+    def put_many(self, model, items):
+        """Store (hash, vector) pairs and evict the oldest entries if needed"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                [(model, key, array('f', vector).tobytes(), now) for key, vector in items]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self),
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves document vectors from an EmbeddingCache.
+
+    Only cache misses are sent to the wrapped model, in batches of
+    ``batch_size`` texts. Query embeddings are not persisted, but the last
+    ``query_cache_size`` of them are kept in an in-memory LRU so repeated
+    questions skip the model.
+    """
+
+    def __init__(self, embeddings, cache, model_name, batch_size=256, query_cache_size=1024):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.query_cache_size = query_cache_size
+        self._queries = OrderedDict()
+        self._queries_lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        hashes = [text_hash(text) for text in texts]
+        cached = self.cache.get_many(self.model_name, hashes)
+
+        misses = {}
+        for key, text in zip(hashes, texts):
+            if key not in cached and key not in misses:
+                misses[key] = text
+
+        pending = list(misses.items())
+        for i in range(0, len(pending), self.batch_size):
+            batch = pending[i:i + self.batch_size]
+            with span("embed", texts=len(batch)):
+                vectors = self.embeddings.embed_documents([text for _, text in batch])
+            items = [(key, vector) for (key, _), vector in zip(batch, vectors)]
+            self.cache.put_many(self.model_name, items)
+            cached.update(items)
+
+        return [cached[key] for key in hashes]
+
+    def _cached_queries(self, texts):
+        """Return ({normalized text: vector} found in the query LRU, misses by key)"""
+        found = {}
+        misses = {}
+        with self._queries_lock:
+            for text in texts:
+                key = normalize_text(text)
+                if key in self._queries:
+                    self._queries.move_to_end(key)
+                    found[key] = self._queries[key]
+                elif key not in misses:
+                    misses[key] = text
+        metrics.inc("query_embedding_cache_total", len(texts) - len(misses), result="hit")
+        metrics.inc("query_embedding_cache_total", len(misses), result="miss")
+        return found, misses
+
+    def _remember_queries(self, items):
+        if not self.query_cache_size:
+            return
+        with self._queries_lock:
+            for key, vector in items:
+                self._queries[key] = vector
+                self._queries.move_to_end(key)
+            while len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+
+    def embed_query(self, text):
+        found, misses = self._cached_queries([text])
+        if found:
+            return found[normalize_text(text)]
+        with span("embed_query"):
+            vector = self.embeddings.embed_query(text)
+        self._remember_queries(zip(misses, [vector]))
+        return vector
+
+    def embed_queries(self, texts):
+        """Embed several queries with batched model calls instead of one call each"""
+        found, misses = self._cached_queries(texts)
+        pending = list(misses.items())
+        for i in range(0, len(pending), self.batch_size):
+            batch = pending[i:i + self.batch_size]
+            with span("embed_query", texts=len(batch)):
+                # sentence-transformers models embed queries and documents alike
+                vectors = self.embeddings.embed_documents([text for _, text in batch])
+            items = [(key, vector) for (key, _), vector in zip(batch, vectors)]
+            self._remember_queries(items)
+            found.update(items)
+        return [found[normalize_text(text)] for text in texts]
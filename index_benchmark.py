@@ -0,0 +1,102 @@
+import time
+import argparse
+
+from ann_index import IndexConfig, build_index, index_memory_bytes
+from percentiles import percentile
+
+DEFAULT_CONFIGS = [
+    IndexConfig("flat"),
+    IndexConfig("hnsw", hnsw_m=32, ef_search=32),
+    IndexConfig("hnsw", hnsw_m=32, ef_search=128),
+    IndexConfig("ivf", nprobe=4),
+    IndexConfig("ivf", nprobe=16),
+    IndexConfig("ivfpq", nprobe=16, pq_m=32),
+]
+
+
+def synthetic_corpus(n_vectors, dim=384, n_queries=200, n_clusters=256, seed=0):
+    """Clustered, L2-normalized random vectors shaped like sentence embeddings"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype('float32')
+
+    def sample(count):
+        labels = rng.integers(0, n_clusters, count)
+        vectors = centers[labels] + 0.35 * rng.standard_normal((count, dim)).astype('float32')
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors.astype('float32')
+
+    return sample(n_vectors), sample(n_queries)
+
+
+def benchmark_config(config, vectors, queries, ground_truth, k):
+    """Build one index and measure recall@k, per-query latency and memory"""
+    start = time.perf_counter()
+    index = build_index(vectors, config)
+    build_time = time.perf_counter() - start
+
+    latencies = []
+    hits = 0
+    for i in range(len(queries)):
+        query = queries[i:i + 1]
+        start = time.perf_counter()
+        _, ids = index.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(ids[0].tolist()) & set(ground_truth[i].tolist()))
+
+    return {
+        "config": config.describe(),
+        "index_type": config.index_type,
+        "build_seconds": build_time,
+        "recall_at_k": hits / (len(queries) * k),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "memory_mb": index_memory_bytes(index) / (1024 * 1024),
+    }
+
+
+def run_benchmark(n_vectors=100000, dim=384, n_queries=200, k=10, configs=None):
+    """Compare index configurations against the exact flat baseline"""
+    import faiss
+
+    configs = configs or DEFAULT_CONFIGS
+    print(f"🧪 Synthetic corpus: {n_vectors} vectors x {dim} dims, {n_queries} queries, k={k}")
+    vectors, queries = synthetic_corpus(n_vectors, dim, n_queries)
+
+    baseline = faiss.IndexFlatL2(dim)
+    baseline.add(vectors)
+    _, ground_truth = baseline.search(queries, k)
+
+    results = []
+    for config in configs:
+        print(f"🔨 Building {config.describe()}...")
+        results.append(benchmark_config(config, vectors, queries, ground_truth, k))
+
+    print("\n" + "=" * 88)
+    print("📊 ANN INDEX BENCHMARK")
+    print("=" * 88)
+    print(f"{'config':<36}{'recall@' + str(k):>10}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'memory MB':>12}{'build s':>10}")
+    for r in results:
+        print(f"{r['config']:<36}{r['recall_at_k']:>10.3f}{r['p50_ms']:>9.3f}{r['p99_ms']:>9.3f}"
+              f"{r['memory_mb']:>12.1f}{r['build_seconds']:>10.2f}")
+    print("=" * 88)
+    return results
+
+
+def add_arguments(parser):
+    parser.add_argument("--vectors", type=int, default=100000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384, help="Vector dimension")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("-k", type=int, default=10, help="Neighbours per query")
+
+
+def main(args):
+    return run_benchmark(args.vectors, args.dim, args.queries, args.k)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types on a synthetic corpus")
+    add_arguments(parser)
+    main(parser.parse_args())
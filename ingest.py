@@ -0,0 +1,310 @@
+# ingest.py
+# Streaming ingestion: file discovery -> parse/chunk (process pool) ->
+# batched embedding -> incremental FAISS adds, with bounded buffers between
+# stages so parsed text and pending vectors never pile up in memory.
+import os
+import sys
+import time
+import queue
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from telemetry import get_logger, metrics, span
+
+logger = get_logger("ingest")
+
+_DONE = object()
+_splitter = None
+
+
+def _init_worker(chunk_size, chunk_overlap):
+    """Create the text splitter once per worker process"""
+    global _splitter
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    _splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len
+    )
+
+
+def parse_and_chunk(path):
+    """Read one file and return (source, source_hash, entries, error).
+
+    Produces the same chunks as loading the file with TextLoader and
+    splitting it with WazuhDocumentProcessor.text_splitter.
+    """
+    from langchain.docstore.document import Document
+    from vector_store import assign_chunk_ids, content_hash
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except Exception as e:
+        return path, None, [], str(e)
+    chunks = _splitter.split_documents([Document(page_content=text, metadata={"source": path})])
+    return path, content_hash(text), assign_chunk_ids(path, chunks), None
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class IngestResult:
+    """FAISS store, BM25 index and per-source manifest produced by a pipeline run"""
+
+    def __init__(self, store, bm25_index, sources, stats):
+        self.store = store
+        self.bm25_index = bm25_index
+        self.sources = sources
+        self.stats = stats
+
+
+class IngestPipeline:
+    """Streams documentation files into a FAISS index with bounded memory.
+
+    Files are discovered lazily and parsed/chunked in a process pool with at
+    most ``max_pending`` files in flight. Parsed files reach the embedding
+    stage through a queue of ``queue_size`` files, and chunks are embedded
+    ``batch_size`` at a time and added straight to the index, so only a few
+    batches of text and vectors are ever buffered. IVF indexes buffer up to
+    ``train_sample`` vectors before training. The docstore, the BM25 index
+    and the FAISS index itself still grow with the corpus.
+    """
+
+    def __init__(self, embeddings, workers=None, batch_size=256, max_pending=None,
+                 queue_size=8, chunk_size=1000, chunk_overlap=200, progress_interval=5.0):
+        self.embeddings = embeddings
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.max_pending = max_pending or self.workers * 2
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.progress_interval = progress_interval
+
+    # ------------------------------------------------------------------
+    # Parse/chunk stage
+    # ------------------------------------------------------------------
+
+    def _parsed_files(self, files):
+        """Yield parse_and_chunk results in order with a bounded number in flight"""
+        if self.workers <= 1:
+            _init_worker(self.chunk_size, self.chunk_overlap)
+            for path in files:
+                yield parse_and_chunk(path)
+            return
+
+        # Spawned rather than forked: the parent may already hold the
+        # embedding model, which workers must not inherit
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.chunk_size, self.chunk_overlap)
+        ) as pool:
+            pending = deque()
+            for path in files:
+                pending.append(pool.submit(parse_and_chunk, path))
+                if len(pending) >= self.max_pending:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def parse(self, files):
+        """Yield (source, source_hash, entries) for each readable file, without embedding"""
+        for source, source_hash, entries, error in self._parsed_files(iter(files)):
+            if error is not None:
+                logger.error(f"❌ Error loading {source}: {error}")
+                continue
+            yield source, source_hash, entries
+
+    @staticmethod
+    def _put(parsed, item, stop):
+        """Put an item unless the consumer has stopped; returns False if it has"""
+        while not stop.is_set():
+            try:
+                parsed.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, files, parsed, stop):
+        results = self._parsed_files(files)
+        try:
+            for result in results:
+                if not self._put(parsed, result, stop):
+                    return
+            self._put(parsed, _DONE, stop)
+        except BaseException as e:
+            self._put(parsed, e, stop)
+        finally:
+            results.close()
+
+    # ------------------------------------------------------------------
+    # Embed/index stage
+    # ------------------------------------------------------------------
+
+    def run(self, files, config):
+        """Ingest an iterable of file paths into a new index built with ``config``"""
+        from langchain.vectorstores import FAISS
+        from langchain.docstore.in_memory import InMemoryDocstore
+        from bm25_index import BM25Index
+
+        builder = _IndexBuilder(config)
+        docstore = {}
+        index_to_docstore_id = {}
+        bm25_index = BM25Index()
+        sources = {}
+        batch = []
+        counts = {"files": 0, "failed": 0, "chunks": 0}
+
+        def flush():
+            texts = [chunk.page_content for chunk in batch]
+            vectors = self.embeddings.embed_documents(texts)
+            for chunk in batch:
+                chunk_id = chunk.metadata['chunk_id']
+                index_to_docstore_id[len(index_to_docstore_id)] = chunk_id
+                docstore[chunk_id] = chunk
+                bm25_index.add(chunk_id, chunk.page_content)
+            builder.add(vectors)
+            counts["chunks"] += len(batch)
+            metrics.inc("ingest_chunks_total", len(batch))
+            batch.clear()
+
+        parsed = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce, args=(iter(files), parsed, stop),
+            name="ingest-parse", daemon=True
+        )
+        start = time.perf_counter()
+        last_report = start
+        logger.info(f"🏭 Ingesting with {self.workers} parse workers, "
+                    f"embedding batches of {self.batch_size}")
+
+        with span("ingest", workers=self.workers, batch_size=self.batch_size) as stage:
+            producer.start()
+            try:
+                # stop is set in finally, so the producer never blocks on a
+                # full queue once this loop has stopped reading it
+                while True:
+                    item = parsed.get()
+                    if item is _DONE:
+                        break
+                    if isinstance(item, BaseException):
+                        raise item
+                    source, source_hash, entries, error = item
+                    if error is not None:
+                        counts["failed"] += 1
+                        logger.error(f"❌ Error loading {source}: {error}")
+                        continue
+                    counts["files"] += 1
+                    sources[source] = {
+                        "hash": source_hash,
+                        "chunks": [{"id": chunk_id, "hash": chunk_hash}
+                                   for chunk_id, chunk_hash, _ in entries]
+                    }
+                    for _, _, chunk in entries:
+                        batch.append(chunk)
+                        if len(batch) >= self.batch_size:
+                            flush()
+
+                    now = time.perf_counter()
+                    if now - last_report >= self.progress_interval:
+                        last_report = now
+                        self._report(counts, now - start, parsed.qsize())
+                if batch:
+                    flush()
+            finally:
+                stop.set()
+                producer.join()
+            stage.set(**counts)
+
+        elapsed = time.perf_counter() - start
+        stats = dict(counts, seconds=elapsed, peak_rss_mb=_peak_rss_mb())
+        self._report(counts, elapsed, 0, final=True)
+        if not counts["chunks"]:
+            return IngestResult(None, bm25_index, sources, stats)
+
+        store = FAISS(self.embeddings, builder.finish(), InMemoryDocstore(docstore),
+                      index_to_docstore_id)
+        return IngestResult(store, bm25_index, sources, stats)
+
+    def _report(self, counts, elapsed, queued, final=False):
+        rate = counts["chunks"] / elapsed if elapsed else 0.0
+        message = (f"{counts['files']} files, {counts['chunks']} chunks in {elapsed:.1f}s "
+                   f"({rate:.0f} chunks/s")
+        if final:
+            peak = _peak_rss_mb()
+            if peak is not None:
+                message += f", peak RSS {peak:.0f} MB"
+            logger.info(f"📥 Ingested {message})")
+        else:
+            logger.info(f"⏳ {message}, parse queue {queued}/{self.queue_size})")
+
+
+class _IndexBuilder:
+    """Adds vector batches to a FAISS index as they arrive.
+
+    Flat and HNSW indexes are filled immediately. IVF indexes buffer vectors
+    until ``train_sample`` are available, train on them, then stream the rest.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.index = None
+        self.buffer = []
+        self.buffered = 0
+
+    def add(self, vectors):
+        import numpy as np
+
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        if self.index is not None and self.index.is_trained:
+            self.index.add(vectors)
+            return
+        if self.config.index_type in ("flat", "hnsw"):
+            self._create(vectors.shape[1], len(vectors))
+            self.index.add(vectors)
+            return
+        self.buffer.append(vectors)
+        self.buffered += len(vectors)
+        if self.buffered >= self.config.train_sample:
+            self._train()
+
+    def _create(self, dim, n_vectors):
+        from ann_index import create_index
+
+        if self.index is None:
+            self.index = create_index(dim, self.config, n_vectors)
+
+    def _train(self):
+        import numpy as np
+        from ann_index import train_index
+
+        vectors = np.concatenate(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+        # nlist is sized from the training sample when the corpus size is unknown
+        self._create(vectors.shape[1], len(vectors))
+        with span("index_train", index_type=self.config.index_type, vectors=len(vectors)):
+            train_index(self.index, vectors, self.config)
+        self.index.add(vectors)
+
+    def finish(self):
+        from ann_index import apply_search_params
+
+        if self.buffer:
+            self._train()
+        apply_search_params(self.index, self.config)
+        return self.index
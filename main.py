@@ -1,16 +1,112 @@
 # main.py
-from wazuh_specialist import WazuhSpecialist
-from vector_store import WazuhVectorStore
+import time
+
+_PROCESS_START = time.perf_counter()
+
 import sys
+import atexit
+import logging
+import argparse
+from contextlib import contextmanager, redirect_stdout
+import alert_enrichment
+import batch
+import benchmark
+import embedding_backend
+import embedding_benchmark
+import index_benchmark
+from telemetry import configure_logging, get_logger, metrics
+
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+class StartupProfiler:
+    """Records wall time and RSS for each startup stage"""
+    
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = []
+    
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        yield
+        self.stages.append((name, time.perf_counter() - start, current_rss_mb()))
+    
+    def report(self):
+        if not self.enabled:
+            return
+        print("\n" + "=" * 60)
+        print("⏱️  STARTUP PROFILE")
+        print("=" * 60)
+        for name, elapsed, rss in self.stages:
+            print(f"  {name:<36} {elapsed:>7.2f}s  {rss:>8.1f} MB RSS")
+        print(f"  {'total since process start':<36} {time.perf_counter() - _PROCESS_START:>7.2f}s  "
+              f"{current_rss_mb():>8.1f} MB RSS")
+        print("=" * 60)
 
-def setup_application():
+def setup_sharded_store(versions, default_version=None, profiler=None, embedding_options=None):
+    """Per-version shards, built on first use and loaded lazily per query"""
+    profiler = profiler or StartupProfiler()
+    with profiler.stage("import sharded_store"):
+        from sharded_store import ShardedVectorStore
+    
+    store = ShardedVectorStore(
+        versions=versions,
+        default_versions=[default_version] if default_version else None,
+        **(embedding_options or {})
+    )
+    missing = [v for v in versions if v not in store.available_versions()]
+    if missing:
+        print(f"🆕 Building knowledge base shards for {', '.join(missing)}...")
+        try:
+            store.build(versions=missing)
+        except Exception as e:
+            print(f"❌ Failed to build shards: {e}")
+            sys.exit(1)
+    print(f"✅ Version shards available: {', '.join(store.versions)} "
+          f"(default {', '.join(store.default_versions)})")
+    return store
+
+def setup_application(ollama_host=None, profiler=None, versions=None, default_version=None,
+                      embedding_options=None):
     """Setup the application - run this first time"""
+    profiler = profiler or StartupProfiler()
     print("🚀 Setting up Wazuh AI Specialist...")
     print("This will download all Wazuh documentation and create a knowledge base.")
     
-    # Create vector store
-    vector_store = WazuhVectorStore()
-    if not vector_store.load_vector_store():
+    with profiler.stage("import vector_store"):
+        from vector_store import WazuhVectorStore
+    with profiler.stage("import wazuh_specialist"):
+        from wazuh_specialist import WazuhSpecialist
+    
+    if versions:
+        vector_store = setup_sharded_store(versions, default_version, profiler, embedding_options)
+        with profiler.stage("initialize specialist"):
+            specialist = WazuhSpecialist(vector_store=vector_store, ollama_host=ollama_host)
+        profiler.report()
+        return specialist
+    
+    # Create vector store, shared with the specialist below
+    vector_store = WazuhVectorStore.shared(**(embedding_options or {}))
+    with profiler.stage("load embedding model"):
+        vector_store.embeddings
+    with profiler.stage("load FAISS index"):
+        index_loaded = vector_store.load_vector_store()
+    if not index_loaded:
         print("🆕 Creating knowledge base from Wazuh documentation...")
         try:
             chunk_count = vector_store.create_vector_store()
@@ -22,17 +118,192 @@ def setup_application():
         print("✅ Knowledge base already exists and loaded!")
     
     # Test the specialist
-    specialist = WazuhSpecialist()
+    with profiler.stage("initialize specialist"):
+        specialist = WazuhSpecialist(vector_store=vector_store, ollama_host=ollama_host)
+    profiler.report()
     return specialist
 
+def serve(args):
+    """Run the long-lived HTTP API sharing one knowledge base across requests"""
+    from server import WazuhAssistantServer
+    
+    specialist = setup_application(
+        ollama_host=args.ollama_host,
+        profiler=StartupProfiler(args.profile_startup),
+        versions=args.versions,
+        default_version=args.wazuh_version,
+        embedding_options=embedding_backend.embedding_options(args)
+    )
+    server = WazuhAssistantServer(
+        specialist,
+        host=args.host,
+        port=args.port,
+        max_concurrent_generations=args.max_concurrent,
+        max_queue=args.max_queue,
+        retrieval_workers=args.retrieval_workers
+    )
+    server.run()
+
+def crawl(args):
+    """Crawl the documentation site, then re-index what changed"""
+    from document_processor import WazuhDocumentProcessor
+    
+    processor = WazuhDocumentProcessor(
+        max_workers=args.workers, requests_per_second=args.requests_per_second
+    )
+    ok = processor.crawl_wazuh_documentation(
+        max_depth=args.max_depth,
+        max_pages=args.max_pages,
+        time_budget=args.time_budget,
+        use_sitemap=not args.no_sitemap,
+        restart=args.restart
+    )
+    if not ok:
+        print("❌ Crawl fetched no pages")
+        return 1
+    if not args.no_index:
+        from vector_store import WazuhVectorStore
+        WazuhVectorStore.shared(**embedding_backend.embedding_options(args)).update_vector_store()
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Wazuh AI Specialist")
+    parser.add_argument("--ollama-host", default=None,
+                        help="Ollama server URL (defaults to OLLAMA_HOST or localhost)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print import/load times and RSS for each startup stage")
+    parser.add_argument("--versions", type=lambda value: [v for v in value.split(",") if v],
+                        default=None,
+                        help="Comma-separated Wazuh versions to index as separate shards, e.g. 4.7,4.8,4.9")
+    parser.add_argument("--wazuh-version", default=None,
+                        help="Version searched when a question names none (default: newest shard)")
+    parser.add_argument("--log-level", default="INFO",
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Verbosity of status messages (written to stderr)")
+    parser.add_argument("--log-json", action="store_true",
+                        help="Write log records as JSON lines")
+    parser.add_argument("--trace", action="store_true",
+                        help="Time each pipeline stage and log one debug record per span")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Write stage latencies and counters in Prometheus format on exit")
+    embedding_backend.add_embedding_arguments(parser)
+    subparsers = parser.add_subparsers(dest="command")
+    
+    serve_parser = subparsers.add_parser("serve", help="Run the HTTP API service")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--max-concurrent", type=int, default=2,
+                              help="Maximum concurrent Ollama generations")
+    serve_parser.add_argument("--max-queue", type=int, default=32,
+                              help="Maximum questions waiting for a generation slot")
+    serve_parser.add_argument("--retrieval-workers", type=int, default=4,
+                              help="Threads used for embedding and FAISS retrieval")
+    
+    crawl_parser = subparsers.add_parser(
+        "crawl", help="Crawl the documentation site from the URL list and sitemap, then re-index"
+    )
+    crawl_parser.add_argument("--max-depth", type=int, default=3,
+                              help="Links followed from a seed page")
+    crawl_parser.add_argument("--max-pages", type=int, default=2000,
+                              help="Pages fetched in this run")
+    crawl_parser.add_argument("--time-budget", type=float, default=None,
+                              help="Stop queuing new fetches after this many seconds")
+    crawl_parser.add_argument("--workers", type=int, default=8)
+    crawl_parser.add_argument("--requests-per-second", type=float, default=4.0,
+                              help="Politeness limit per host")
+    crawl_parser.add_argument("--no-sitemap", action="store_true",
+                              help="Seed only from the URL list")
+    crawl_parser.add_argument("--restart", action="store_true",
+                              help="Re-fetch every known page instead of resuming")
+    crawl_parser.add_argument("--no-index", action="store_true",
+                              help="Only crawl, do not update the vector store")
+    
+    enrich_parser = subparsers.add_parser(
+        "enrich", help="Enrich Wazuh alerts from alerts.json or stdin into NDJSON"
+    )
+    alert_enrichment.add_arguments(enrich_parser)
+    
+    batch_parser = subparsers.add_parser(
+        "batch", help="Answer a JSONL file of questions into an output JSONL"
+    )
+    batch.add_arguments(batch_parser)
+    
+    benchmark_parser = subparsers.add_parser(
+        "benchmark-index", help="Compare FAISS index types on a synthetic corpus"
+    )
+    index_benchmark.add_arguments(benchmark_parser)
+    
+    embeddings_parser = subparsers.add_parser(
+        "benchmark-embeddings",
+        help="Compare PyTorch/ONNX/int8 embedding speed and check recall against fp32"
+    )
+    embedding_benchmark.add_arguments(embeddings_parser)
+    
+    e2e_parser = subparsers.add_parser(
+        "benchmark", help="Offline end-to-end benchmark with fixture docs and a stub Ollama"
+    )
+    benchmark.add_arguments(e2e_parser)
+    return parser.parse_args(argv)
+
+def setup_telemetry(args):
+    """Configure logging and enable metrics collection when asked for"""
+    configure_logging(args.log_level, json_logs=args.log_json)
+    if args.trace:
+        get_logger("trace").setLevel(logging.DEBUG)
+    if args.trace or args.metrics_file or args.command == "serve":
+        metrics.enable()
+    if args.metrics_file:
+        atexit.register(metrics.write_prometheus, args.metrics_file)
+
 def main():
+    args = parse_args()
+    setup_telemetry(args)
+    if args.command == "serve":
+        serve(args)
+        return
+    if args.command == "crawl":
+        sys.exit(crawl(args))
+    if args.command == "enrich":
+        # Enriched alerts may go to stdout, so setup messages go to stderr
+        with redirect_stdout(sys.stderr):
+            specialist = setup_application(
+                ollama_host=args.ollama_host,
+                profiler=StartupProfiler(args.profile_startup),
+                versions=args.versions,
+                default_version=args.wazuh_version,
+                embedding_options=embedding_backend.embedding_options(args)
+            )
+        sys.exit(alert_enrichment.main(args, specialist))
+    if args.command == "batch":
+        specialist = setup_application(
+            ollama_host=args.ollama_host,
+            profiler=StartupProfiler(args.profile_startup),
+            versions=args.versions,
+            default_version=args.wazuh_version,
+            embedding_options=embedding_backend.embedding_options(args)
+        )
+        sys.exit(batch.main(args, specialist))
+    if args.command == "benchmark-index":
+        index_benchmark.main(args)
+        return
+    if args.command == "benchmark-embeddings":
+        sys.exit(embedding_benchmark.main(args))
+    if args.command == "benchmark":
+        sys.exit(benchmark.main(args))
+    
     print("🎯 Wazuh AI Specialist Application")
     print("==========================================")
     print("Enterprise-grade Wazuh deployment, configuration, and support")
     print("==========================================")
     
     try:
-        specialist = setup_application()
+        specialist = setup_application(
+            ollama_host=args.ollama_host,
+            profiler=StartupProfiler(args.profile_startup),
+            versions=args.versions,
+            default_version=args.wazuh_version,
+            embedding_options=embedding_backend.embedding_options(args)
+        )
         
         # Example questions to help users get started
         print("\n💡 Example questions you can ask:")
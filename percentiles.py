@@ -0,0 +1,12 @@
+# percentiles.py
+# Summary statistics shared by the benchmarks and batch mode.
+import math
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values, 0.0 when there are none"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
@@ -0,0 +1,392 @@
+import re
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from telemetry import get_logger, metrics
+
+logger = get_logger("server")
+
+MAX_BODY_BYTES = 64 * 1024
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+    503: "Service Unavailable",
+}
+
+
+# Error message prefix for each stage of answering a question
+STAGE_ERRORS = {
+    "cache": "Error looking up cached answers",
+    "retrieval": "Error retrieving documentation",
+    "generation": "Error communicating with AI model",
+}
+
+
+class QueueFullError(Exception):
+    """Raised when too many questions are already waiting for generation"""
+
+
+class PayloadTooLargeError(Exception):
+    """Raised when a request body is larger than MAX_BODY_BYTES"""
+
+
+class _InFlightAnswer:
+    """Tokens and final result of one generation, shared by coalesced requests.
+
+    All methods run on the event loop thread. Each subscriber gets its own
+    queue replaying the tokens produced so far, followed by a ``None``
+    sentinel once the answer is finished.
+    """
+
+    def __init__(self):
+        self.tokens = []
+        self.result = None
+        self.subscribers = []
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        for token in self.tokens:
+            queue.put_nowait(token)
+        if self.result is not None:
+            queue.put_nowait(None)
+        self.subscribers.append(queue)
+        return queue
+
+    def publish(self, token):
+        self.tokens.append(token)
+        for queue in self.subscribers:
+            queue.put_nowait(token)
+
+    def finish(self, result):
+        self.result = result
+        for queue in self.subscribers:
+            queue.put_nowait(None)
+
+
+class WazuhAssistantServer:
+    """Long-running asyncio HTTP API in front of a shared WazuhSpecialist.
+
+    The specialist, its embedding model and FAISS index are loaded once and
+    shared by all requests. Cache lookups and retrieval run in a thread pool,
+    at most ``max_concurrent_generations`` Ollama generations run at a time
+    with up to ``max_queue`` questions waiting, and identical in-flight
+    questions are coalesced onto a single generation.
+
+    Endpoints:
+        GET  /health  - liveness and queue statistics
+        GET  /metrics - stage latencies and counters in Prometheus text format
+        POST /ask     - {"question": "...", "stream": false}; returns JSON, or
+                        Server-Sent Events with one ``token`` event per token
+                        and a final ``done`` event when ``stream`` is true
+    """
+
+    def __init__(self, specialist, host="127.0.0.1", port=8000,
+                 max_concurrent_generations=2, max_queue=32, retrieval_workers=4):
+        self.specialist = specialist
+        self.host = host
+        self.port = port
+        self.max_concurrent_generations = max_concurrent_generations
+        self.max_queue = max_queue
+        self.retrieval_pool = ThreadPoolExecutor(
+            max_workers=retrieval_workers, thread_name_prefix="retrieval"
+        )
+        self.generation_pool = ThreadPoolExecutor(
+            max_workers=max_concurrent_generations, thread_name_prefix="generation"
+        )
+        self.generation_semaphore = None
+        self.in_flight = {}
+        self.waiting = 0
+        self.generating = 0
+        self.stats = {"requests": 0, "coalesced": 0, "cache_hits": 0, "rejected": 0, "errors": 0}
+        self._server = None
+
+    @staticmethod
+    def question_key(question):
+        return re.sub(r'\s+', ' ', question).strip().lower()
+
+    # ------------------------------------------------------------------
+    # Answer production
+    # ------------------------------------------------------------------
+
+    def _answer(self, question):
+        """Return the in-flight answer for a question, starting one if needed"""
+        key = self.question_key(question)
+        in_flight = self.in_flight.get(key)
+        if in_flight is not None:
+            self.stats["coalesced"] += 1
+            return in_flight
+
+        if self.waiting >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise QueueFullError(f"{self.waiting} questions already queued")
+
+        in_flight = _InFlightAnswer()
+        self.in_flight[key] = in_flight
+        self.waiting += 1
+        asyncio.get_running_loop().create_task(self._produce(key, question, in_flight))
+        return in_flight
+
+    def _run_generation(self, loop, prompt, stats, start, in_flight):
+        for token in self.specialist.generate_stream(prompt, stats, start=start):
+            loop.call_soon_threadsafe(in_flight.publish, token)
+
+    async def _produce(self, key, question, in_flight):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        queued = True
+        stage = "cache"
+        try:
+            entry, similarity, embedding, namespace = await loop.run_in_executor(
+                self.retrieval_pool, self.specialist.lookup_cached_answer, question
+            )
+            if entry is not None:
+                self.stats["cache_hits"] += 1
+                metrics.observe("ask_seconds", time.perf_counter() - start, cached="true")
+                in_flight.publish(entry["answer"])
+                in_flight.finish({
+                    "answer": entry["answer"],
+                    "sources": entry.get("sources", []),
+                    "cached": True,
+                    "similarity": similarity,
+                    "timings": {"total": time.perf_counter() - start},
+                })
+                return
+
+            stage = "retrieval"
+            context, sources = await loop.run_in_executor(
+                self.retrieval_pool, self.specialist.retrieve, question
+            )
+            retrieval_time = time.perf_counter() - start
+            prompt = self.specialist.build_prompt(question, context)
+
+            stage = "generation"
+            stats = {}
+            async with self.generation_semaphore:
+                self.waiting -= 1
+                queued = False
+                self.generating += 1
+                queue_time = time.perf_counter() - start - retrieval_time
+                metrics.observe("queue_wait_seconds", queue_time)
+                try:
+                    await loop.run_in_executor(
+                        self.generation_pool, self._run_generation,
+                        loop, prompt, stats, start, in_flight
+                    )
+                finally:
+                    self.generating -= 1
+
+            # Let the tokens scheduled from the generation thread land first
+            await asyncio.sleep(0)
+            answer = "".join(in_flight.tokens)
+            total = time.perf_counter() - start
+            try:
+                await loop.run_in_executor(
+                    self.retrieval_pool,
+                    lambda: self.specialist.store_cached_answer(
+                        namespace, question, embedding, answer,
+                        generation_time=total, sources=sources
+                    )
+                )
+            except Exception as e:
+                # The answer is still good; only the cache missed it
+                metrics.inc("answer_cache_store_errors_total")
+                logger.warning(f"⚠️  Could not cache answer: {e}")
+            metrics.observe("ask_seconds", total, cached="false")
+            in_flight.finish({
+                "answer": answer,
+                "sources": sources,
+                "cached": False,
+                "timings": dict(stats, retrieval=retrieval_time, queue=queue_time, total=total),
+            })
+        except Exception as e:
+            self.stats["errors"] += 1
+            metrics.inc("ask_errors_total", stage=stage)
+            logger.error(f"❌ {STAGE_ERRORS[stage]} for '{question}': {e}")
+            in_flight.finish({"error": f"{STAGE_ERRORS[stage]}: {e}", "stage": stage})
+        finally:
+            if queued:
+                self.waiting -= 1
+            self.in_flight.pop(key, None)
+
+    # ------------------------------------------------------------------
+    # HTTP handling
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    async def _read_request(reader):
+        """Parse one request; raises ValueError if it is malformed"""
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode('latin-1').split("\r\n")
+        method, path, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        if length < 0:
+            raise ValueError(f"invalid Content-Length {length}")
+        if length > MAX_BODY_BYTES:
+            raise PayloadTooLargeError(f"{length} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method, path.split("?", 1)[0], headers, body
+
+    @staticmethod
+    async def _send_json(writer, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+
+    @staticmethod
+    async def _send_text(writer, status, text, content_type="text/plain; version=0.0.4"):
+        body = text.encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+
+    @staticmethod
+    async def _send_event(writer, event, payload):
+        writer.write(f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode('utf-8'))
+        await writer.drain()
+
+    def health(self):
+        return dict(
+            self.stats,
+            status="ok",
+            in_flight=len(self.in_flight),
+            waiting=self.waiting,
+            generating=self.generating,
+            max_concurrent_generations=self.max_concurrent_generations,
+        )
+
+    @staticmethod
+    def _status(result):
+        """200, or 502 when Ollama failed and 500 when the failure was local"""
+        if "error" not in result:
+            return 200
+        return 502 if result.get("stage") == "generation" else 500
+
+    async def _handle_ask(self, writer, body):
+        try:
+            request = json.loads(body or b"{}")
+            question = str(request.get("question", "")).strip()
+        except (ValueError, AttributeError):
+            await self._send_json(writer, 400, {"error": "Request body must be a JSON object"})
+            return
+        if not question:
+            await self._send_json(writer, 400, {"error": "Missing 'question'"})
+            return
+
+        try:
+            in_flight = self._answer(question)
+        except QueueFullError as e:
+            await self._send_json(writer, 503, {"error": f"Server busy: {e}"})
+            return
+        queue = in_flight.subscribe()
+
+        if not request.get("stream"):
+            while await queue.get() is not None:
+                pass
+            result = in_flight.result
+            await self._send_json(writer, self._status(result), result)
+            return
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        await writer.drain()
+        while True:
+            token = await queue.get()
+            if token is None:
+                break
+            await self._send_event(writer, "token", {"token": token})
+        result = in_flight.result
+        if "error" in result:
+            await self._send_event(writer, "error", result)
+        else:
+            await self._send_event(writer, "done", {k: v for k, v in result.items() if k != "answer"})
+
+    async def handle_connection(self, reader, writer):
+        self.stats["requests"] += 1
+        try:
+            try:
+                method, path, headers, body = await self._read_request(reader)
+            except PayloadTooLargeError:
+                await self._send_json(writer, 413, {"error": "Request body too large"})
+                return
+            except ValueError:
+                await self._send_json(writer, 400, {"error": "Malformed request"})
+                return
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+
+            if path == "/health":
+                await self._send_json(writer, 200, self.health())
+            elif path == "/metrics":
+                for name in ("waiting", "generating"):
+                    metrics.set_gauge(f"server_{name}", getattr(self, name))
+                await self._send_text(writer, 200, metrics.to_prometheus())
+            elif path == "/ask":
+                if method != "POST":
+                    await self._send_json(writer, 405, {"error": "Use POST"})
+                else:
+                    await self._handle_ask(writer, body)
+            else:
+                await self._send_json(writer, 404, {"error": f"Unknown path {path}"})
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionResetError, BrokenPipeError):
+                pass
+
+    async def start(self):
+        self.generation_semaphore = asyncio.Semaphore(self.max_concurrent_generations)
+        self._server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+
+    async def serve_forever(self):
+        server = await self.start()
+        logger.info(f"🌐 Wazuh AI Specialist API listening on http://{self.host}:{self.port}")
+        logger.info(f"⚙️  Max concurrent generations: {self.max_concurrent_generations}, queue: {self.max_queue}")
+        async with server:
+            await server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.retrieval_pool.shutdown(wait=False)
+        self.generation_pool.shutdown(wait=False)
+
+    def run(self):
+        """Run the server until interrupted"""
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            logger.info("👋 Wazuh AI Specialist API stopped")
+        finally:
+            self.retrieval_pool.shutdown(wait=False)
+            self.generation_pool.shutdown(wait=False)
@@ -0,0 +1,288 @@
+# sharded_store.py
+# One WazuhVectorStore per documentation version, loaded on demand.
+import os
+import re
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from bm25_index import is_identifier_query, reciprocal_rank_fusion
+from embedding_backend import add_embedding_arguments, embedding_options
+from telemetry import configure_logging, get_logger, metrics, span
+from vector_store import WazuhVectorStore, get_shared_embeddings
+
+logger = get_logger("sharded_store")
+
+SHARDS_DIR = "shards"
+# Kept apart from ./wazuh_docs so version docs never end up in the default index
+DEFAULT_VERSIONS_DOCS_FOLDER = "./wazuh_docs_versions"
+
+# "4.8", "4.8.2", "v4.8", "version 4.8" -> "4.8"; routing ignores unknown versions
+VERSION_PATTERN = re.compile(r'\b(?:v|version\s*)?(\d+\.\d+)(?:\.\d+)?\b', re.IGNORECASE)
+
+
+def detect_versions(question):
+    """Documentation versions (major.minor) mentioned in a question, in order"""
+    return list(dict.fromkeys(match.group(1) for match in VERSION_PATTERN.finditer(question)))
+
+
+def version_key(version):
+    return [int(part) if part.isdigit() else -1 for part in version.split(".")]
+
+
+class ShardedVectorStore:
+    """Version-sharded documentation indexes behind the WazuhVectorStore search API.
+
+    Each version lives in ``persist_directory/shards/<version>`` with its own
+    manifest, built from ``docs_folder/<version>``. Queries are routed to the
+    version passed explicitly, else the versions mentioned in the question,
+    else ``default_versions``. Shards are loaded (memory-mapped) on first use
+    and kept in an LRU whose on-disk index size is bounded by
+    ``max_resident_mb``. A query routed to several shards searches them in
+    parallel and fuses their rankings, and the query embedding is computed
+    once for all of them. All shards share one embedding model.
+    """
+
+    def __init__(self, persist_directory="./wazuh_vector_store",
+                 docs_folder=DEFAULT_VERSIONS_DOCS_FOLDER, versions=None, default_versions=None, max_resident_mb=1024, search_workers=4,
+                 embedding_model="sentence-transformers/all-MiniLM-L6-v2",
+                 embedding_cache_path="./wazuh_embedding_cache.sqlite",
+                 embeddings=None, index_config=None, embedding_backend="torch",
+                 embedding_threads=None, embedding_quantize=False, model_batch_size=32):
+        self.persist_directory = persist_directory
+        self.docs_folder = docs_folder
+        self.shards_directory = os.path.join(persist_directory, SHARDS_DIR)
+        self.versions = list(versions) if versions else self.available_versions()
+        self.default_versions = list(default_versions or self.versions[-1:])
+        self.max_resident_bytes = max_resident_mb * 1024 * 1024
+        self.embedding_model = embedding_model
+        self.embedding_cache_path = embedding_cache_path
+        self.index_config = index_config
+        self.embedding_backend = embedding_backend
+        self.embedding_threads = embedding_threads
+        self.embedding_quantize = embedding_quantize
+        self.model_batch_size = model_batch_size
+        self._embeddings = embeddings
+        self._shards = {}
+        self._resident = OrderedDict()
+        self._in_use = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.search_pool = ThreadPoolExecutor(
+            max_workers=search_workers, thread_name_prefix="shard-search"
+        )
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            self._embeddings = get_shared_embeddings(
+                self.embedding_model,
+                self.embedding_cache_path,
+                backend=self.embedding_backend,
+                threads=self.embedding_threads,
+                quantize=self.embedding_quantize,
+                model_batch_size=self.model_batch_size
+            )
+        return self._embeddings
+
+    def available_versions(self):
+        """Versions that have a built shard on disk, oldest first"""
+        if not os.path.isdir(self.shards_directory):
+            return []
+        versions = [name for name in os.listdir(self.shards_directory)
+                    if os.path.isdir(os.path.join(self.shards_directory, name))]
+        return sorted(versions, key=version_key)
+
+    def shard(self, version):
+        """The (possibly unloaded) store for one version"""
+        with self._lock:
+            if version not in self._shards:
+                self._shards[version] = WazuhVectorStore(
+                    persist_directory=os.path.join(self.shards_directory, version),
+                    docs_folder=os.path.join(self.docs_folder, version),
+                    embeddings=self.embeddings,
+                    index_config=self.index_config,
+                    doc_version=version
+                )
+            return self._shards[version]
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def build(self, versions=None, force_download=False, update=False):
+        """Build (or incrementally update) the shard of each version"""
+        counts = {}
+        for version in versions or self.versions:
+            logger.info(f"📦 Building shard {version}...")
+            store = self.shard(version)
+            if update:
+                counts[version] = store.update_vector_store(force_download=force_download)
+            else:
+                counts[version] = store.create_vector_store(force_download=force_download)
+            with self._lock:
+                self._resident.pop(version, None)
+            store.unload()
+        self.versions = sorted(set(self.versions) | set(counts), key=version_key)
+        return counts
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def load_vector_store(self, mmap=True, reload=False):
+        """Shards load lazily; only check that at least one exists"""
+        return bool(self.available_versions())
+
+    def _acquire(self, versions):
+        """Load the requested shards, pin them, and evict idle LRU shards over budget"""
+        stores = []
+        with self._lock:
+            for version in versions:
+                self._in_use[version] = self._in_use.get(version, 0) + 1
+        try:
+            for version in versions:
+                store = self.shard(version)
+                with self._load_lock:
+                    if version not in self._resident:
+                        with span("shard_load", version=version):
+                            if not store.load_vector_store():
+                                raise ValueError(f"Shard for version {version} not found. Build it first.")
+                        with self._lock:
+                            self._resident[version] = store.index_size_bytes()
+                        metrics.inc("shard_loads_total", version=version)
+                with self._lock:
+                    self._resident.move_to_end(version)
+                stores.append(store)
+        except Exception:
+            self._release(versions)
+            raise
+
+        with self._lock:
+            while sum(self._resident.values()) > self.max_resident_bytes:
+                idle = [v for v in self._resident if not self._in_use.get(v)]
+                if not idle:
+                    break
+                del self._resident[idle[0]]
+                self._shards[idle[0]].unload()
+                metrics.inc("shard_evictions_total", version=idle[0])
+                logger.info(f"♻️  Evicted shard {idle[0]} from memory")
+            metrics.set_gauge("resident_shards", len(self._resident))
+        return stores
+
+    def _release(self, versions):
+        with self._lock:
+            for version in versions:
+                self._in_use[version] -= 1
+
+    def resident_versions(self):
+        with self._lock:
+            return list(self._resident)
+
+    # ------------------------------------------------------------------
+    # Querying
+    # ------------------------------------------------------------------
+
+    def route(self, query, version=None):
+        """Versions to search: explicit, else mentioned in the query, else the defaults"""
+        if version:
+            requested = [version] if isinstance(version, str) else list(version)
+        else:
+            requested = [v for v in detect_versions(query) if v in self.versions]
+        unknown = [v for v in requested if v not in self.versions]
+        if unknown:
+            logger.warning(f"⚠️  No shard for version(s) {', '.join(unknown)}, "
+                           f"available: {', '.join(self.versions)}")
+        return [v for v in requested if v in self.versions] or self.default_versions
+
+    def get_index_version(self):
+        """Combined generation of every shard, changes whenever one is rebuilt"""
+        return ",".join(f"{v}={self.shard(v).get_index_version()}" for v in self.versions)
+
+    def search_documents(self, query, k=5, candidates=20, version=None, embedding=None):
+        versions = self.route(query, version)
+        stores = self._acquire(versions)
+        try:
+            if embedding is None and not is_identifier_query(query):
+                embedding = self.embeddings.embed_query(query)
+            if len(stores) == 1:
+                return stores[0].search_documents(
+                    query, k=k, candidates=candidates, embedding=embedding
+                )
+
+            with span("shard_fanout", shards=len(stores)):
+                futures = [
+                    self.search_pool.submit(store.search_documents, query, k, candidates, embedding)
+                    for store in stores
+                ]
+                rankings = [future.result() for future in futures]
+        finally:
+            self._release(versions)
+
+        by_id = {}
+        id_rankings = []
+        for version, docs in zip(versions, rankings):
+            ids = []
+            for doc in docs:
+                key = (version, doc.metadata.get('chunk_id'))
+                by_id[key] = doc
+                ids.append(key)
+            id_rankings.append(ids)
+        fused = reciprocal_rank_fusion(id_rankings)
+        logger.debug(f"🔀 Merged results from shards {', '.join(versions)} for query: '{query}'")
+        return [by_id[key] for key, _ in fused[:k]]
+
+    def search_documents_batch(self, queries, k=5, candidates=20, version=None, embeddings=None):
+        """Search several queries, batching those routed to the same single shard"""
+        queries = list(queries)
+        if embeddings is None:
+            dense_queries = [i for i, query in enumerate(queries) if not is_identifier_query(query)]
+            vectors = self.embeddings.embed_queries([queries[i] for i in dense_queries])
+            embeddings = [None] * len(queries)
+            for i, vector in zip(dense_queries, vectors):
+                embeddings[i] = vector
+
+        groups = {}
+        for i, query in enumerate(queries):
+            groups.setdefault(tuple(self.route(query, version)), []).append(i)
+
+        results = [None] * len(queries)
+        for versions, indices in groups.items():
+            if len(versions) > 1:
+                for i in indices:
+                    results[i] = self.search_documents(
+                        queries[i], k=k, candidates=candidates,
+                        version=list(versions), embedding=embeddings[i]
+                    )
+                continue
+            store = self._acquire(versions)[0]
+            try:
+                ranked = store.search_documents_batch(
+                    [queries[i] for i in indices], k=k, candidates=candidates,
+                    embeddings=[embeddings[i] for i in indices]
+                )
+            finally:
+                self._release(versions)
+            for i, docs in zip(indices, ranked):
+                results[i] = docs
+        return results
+
+    def close(self):
+        self.search_pool.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build per-version Wazuh documentation shards")
+    parser.add_argument("versions", nargs="+", help="Documentation versions, e.g. 4.7 4.8 4.9")
+    parser.add_argument("--update", action="store_true",
+                        help="Re-index only new or changed sources of each shard")
+    parser.add_argument("--download", action="store_true",
+                        help="Refresh the documentation before indexing")
+    add_embedding_arguments(parser)
+    args = parser.parse_args()
+    configure_logging()
+
+    store = ShardedVectorStore(versions=args.versions, **embedding_options(args))
+    for version, count in store.build(force_download=args.download, update=args.update).items():
+        logger.info(f"✅ Shard {version}: {count}")
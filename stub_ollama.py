@@ -0,0 +1,161 @@
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANSWER = (
+    "This is a stub answer from the local Ollama test server. "
+    "Configure the Wazuh manager in /var/ossec/etc/ossec.conf and restart wazuh-manager."
+)
+
+
+class StubOllamaServer:
+    """Minimal local stand-in for the Ollama HTTP API used in tests and benchmarks.
+
+    Implements ``/api/generate``, ``/api/chat`` and ``/api/tags``. Answers are
+    split on whitespace and streamed one token every ``token_latency`` seconds,
+    and the final chunk carries Ollama-style prompt_eval/eval counters.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, answer=DEFAULT_ANSWER,
+                 token_latency=0.01, prompt_eval_latency=0.0):
+        self.answer = answer
+        self.token_latency = token_latency
+        self.prompt_eval_latency = prompt_eval_latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def tokens(self):
+        words = self.answer.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": [{"name": "llama3:latest", "model": "llama3:latest"}]})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with stub._lock:
+                    stub.requests += 1
+
+                if self.path not in ("/api/generate", "/api/chat"):
+                    self._send_json({"error": "not found"}, status=404)
+                    return
+
+                chat = self.path == "/api/chat"
+                prompt = request.get("prompt", "")
+                if chat:
+                    prompt = " ".join(m.get("content", "") for m in request.get("messages", []))
+                prompt_tokens = len(prompt.split()) + len(request.get("system", "").split())
+                tokens = stub.tokens()
+                context = list(request.get("context") or []) + list(range(prompt_tokens + len(tokens)))
+
+                prompt_start = time.perf_counter()
+                if stub.prompt_eval_latency:
+                    time.sleep(stub.prompt_eval_latency)
+                prompt_eval_duration = int((time.perf_counter() - prompt_start) * 1e9)
+
+                def chunk(token, done=False, eval_duration=0):
+                    payload = {"model": request.get("model", "llama3"), "done": done}
+                    if chat:
+                        payload["message"] = {"role": "assistant", "content": token}
+                    else:
+                        payload["response"] = token
+                    if done:
+                        payload.update({
+                            "prompt_eval_count": prompt_tokens,
+                            "prompt_eval_duration": prompt_eval_duration,
+                            "eval_count": len(tokens),
+                            "eval_duration": eval_duration,
+                            "total_duration": prompt_eval_duration + eval_duration,
+                        })
+                        if not chat:
+                            payload["context"] = context
+                    return payload
+
+                eval_start = time.perf_counter()
+                if not request.get("stream", True):
+                    time.sleep(stub.token_latency * len(tokens))
+                    eval_duration = int((time.perf_counter() - eval_start) * 1e9)
+                    self._send_json(chunk("".join(tokens), done=True, eval_duration=eval_duration))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def write(payload):
+                    data = (json.dumps(payload) + "\n").encode('utf-8')
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+
+                for token in tokens:
+                    time.sleep(stub.token_latency)
+                    write(chunk(token))
+                eval_duration = int((time.perf_counter() - eval_start) * 1e9)
+                write(chunk("", done=True, eval_duration=eval_duration))
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a stub Ollama server for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--token-latency", type=float, default=0.01,
+                        help="Seconds between streamed tokens")
+    args = parser.parse_args()
+
+    server = StubOllamaServer(args.host, args.port, token_latency=args.token_latency)
+    print(f"🧪 Stub Ollama listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,235 @@
+import json
+import time
+import logging
+import threading
+
+LOGGER_NAME = "wazuh_ai"
+
+# Seconds; covers embedding calls (ms) up to CPU generations (minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def get_logger(name):
+    """Leveled logger for a module, under the shared wazuh_ai hierarchy"""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including structured fields passed via ``extra``"""
+
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        payload.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def configure_logging(level="INFO", json_logs=False):
+    """Send wazuh_ai logs to stderr, as plain messages or as JSON lines"""
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if json_logs else logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    return logger
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape_label_value(value):
+    """Escape a label value as the Prometheus text format requires"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in items) + "}"
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    def __init__(self, metrics, name, attrs):
+        self.metrics = metrics
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        """Attach attributes known only inside the span (sizes, counts)"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        status = "error" if exc_type else "ok"
+        self.metrics.observe("stage_duration_seconds", duration, stage=self.name)
+        if exc_type:
+            self.metrics.inc("stage_errors_total", stage=self.name)
+        self.metrics.trace_logger.debug(
+            f"span {self.name} {duration * 1000:.1f}ms",
+            extra={"fields": dict(self.attrs, span=self.name, status=status,
+                                  duration_ms=round(duration * 1000, 3))}
+        )
+        return False
+
+
+class Metrics:
+    """Process-wide counters, histograms and timed spans.
+
+    Disabled by default: ``span()`` then returns a shared no-op context
+    manager and ``inc``/``observe`` return immediately, so instrumented code
+    pays one attribute check. When enabled, each span records a
+    ``stage_duration_seconds`` histogram sample and emits a debug log record
+    with structured fields on the ``wazuh_ai.trace`` logger.
+    """
+
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.trace_logger = get_logger("trace")
+        self._lock = threading.Lock()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, attrs)
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    def to_prometheus(self, prefix=LOGGER_NAME):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"{prefix}_{name}"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+        for (name, labels), value in gauges:
+            metric = f"{prefix}_{name}"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} gauge")
+                seen.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+        for (name, labels), histogram in histograms:
+            metric = f"{prefix}_{name}"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} histogram")
+                seen.add(metric)
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f"{metric}_bucket{_format_labels(labels, {'le': bound})} {count}")
+            lines.append(f"{metric}_bucket{_format_labels(labels, {'le': '+Inf'})} {histogram.count}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Metrics as a JSON-serializable dict"""
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self.counters.items()
+                ],
+                "gauges": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self.gauges.items()
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                     "buckets": dict(zip(map(str, h.buckets), h.counts))}
+                    for (name, labels), h in self.histograms.items()
+                ],
+            }
+
+    def write_prometheus(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+
+
+metrics = Metrics()
+span = metrics.span
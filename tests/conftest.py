@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def hashing_embeddings(tmp_path):
+    """Model-free embeddings with a real cache, as used by the offline benchmark"""
+    from benchmark import HashingEmbeddings
+    from embedding_cache import CachedEmbeddings, EmbeddingCache
+
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    return CachedEmbeddings(HashingEmbeddings(), cache, model_name="hashing-384")
@@ -0,0 +1,126 @@
+import argparse
+import io
+import json
+import threading
+import time
+
+import pytest
+
+import alert_enrichment
+from alert_enrichment import AlertEnricher, group_key, synthetic_alerts
+from context_packer import ContextPacker
+
+
+class FakeSpecialist:
+    num_ctx = 4096
+    system_prompt = "You are a Wazuh specialist."
+    model = "fake"
+
+    def __init__(self, delay=0.0):
+        self.context_packer = ContextPacker(num_ctx=self.num_ctx)
+        self.delay = delay
+        self.generations = 0
+        self.lock = threading.Lock()
+
+    def retrieve(self, question, used_tokens=None, select=None):
+        return "Rule documentation.", ["https://documentation.wazuh.com/current/rules.html"]
+
+    def generate_stream(self, prompt, stats, start=None, context=None, keep_alive=None, result=None):
+        with self.lock:
+            self.generations += 1
+        time.sleep(self.delay)
+        stats["generation_time"] = self.delay
+        yield "Enrichment."
+
+
+def lines(alerts):
+    return [json.dumps(alert) + "\n" for alert in alerts]
+
+
+def enriched(output):
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_each_group_gets_one_generation():
+    alerts = list(synthetic_alerts(300, agents=5, cves=2))
+    specialist = FakeSpecialist()
+    output = io.StringIO()
+    stats = AlertEnricher(specialist, output=output, concurrency=4).run(lines(alerts))
+
+    groups = {group_key(alert) for alert in alerts}
+    assert specialist.generations == stats["llm_calls"] == len(groups)
+    assert stats["generated"] + stats["cached"] + stats["coalesced"] == len(alerts)
+    assert len(enriched(output)) == len(alerts)
+
+
+def test_alerts_without_key_fields_are_not_grouped():
+    alerts = [{"id": str(i), "full_log": f"event {i}"} for i in range(3)]
+    specialist = FakeSpecialist()
+    output = io.StringIO()
+    stats = AlertEnricher(specialist, output=output).run(lines(alerts))
+
+    assert stats["llm_calls"] == 3
+    assert stats["coalesced"] == stats["cached"] == 0
+    assert len({alert["ai_enrichment"]["group"] for alert in enriched(output)}) == 3
+
+
+def test_waiting_alerts_per_group_are_bounded():
+    alert = {"rule": {"id": "5710"}, "decoder": {"name": "sshd"}}
+    specialist = FakeSpecialist(delay=0.2)
+    output = io.StringIO()
+    enricher = AlertEnricher(specialist, output=output, max_waiting_per_group=2)
+    largest = []
+    collect = enricher._collect
+
+    def recording_collect(futures):
+        largest.extend(len(waiting) for waiting in enricher._waiting.values())
+        collect(futures)
+
+    enricher._collect = recording_collect
+    stats = enricher.run(lines([alert] * 10))
+
+    assert max(largest) <= 2
+    assert stats["llm_calls"] == 1
+    assert stats["coalesced"] == 1
+    assert stats["cached"] == 8
+    assert len(enriched(output)) == 10
+
+
+class BrokenOutput(io.StringIO):
+    def write(self, text):
+        raise OSError("disk full")
+
+
+def test_reader_stops_when_the_consumer_fails():
+    specialist = FakeSpecialist()
+    enricher = AlertEnricher(specialist, output=BrokenOutput(), queue_size=1)
+    with pytest.raises(OSError):
+        enricher.run(lines(synthetic_alerts(100)))
+
+    deadline = time.time() + 5
+    while any(thread.name == "alert-reader" for thread in threading.enumerate()):
+        assert time.time() < deadline, "reader blocked on a full queue"
+        time.sleep(0.05)
+
+
+def test_main_closes_the_files_it_opens(tmp_path, monkeypatch):
+    alerts_file = tmp_path / "alerts.json"
+    alerts_file.write_text("".join(lines(synthetic_alerts(20))), encoding='utf-8')
+    output_file = tmp_path / "enriched.json"
+    opened = []
+
+    def tracking_open(*args, **kwargs):
+        f = open(*args, **kwargs)
+        opened.append(f)
+        return f
+
+    monkeypatch.setattr(alert_enrichment, "open", tracking_open, raising=False)
+    parser = argparse.ArgumentParser()
+    alert_enrichment.add_arguments(parser)
+    args = parser.parse_args(["--alerts-file", str(alerts_file), "--no-follow",
+                              "--output", str(output_file)])
+
+    assert alert_enrichment.main(args, FakeSpecialist()) == 0
+    assert len(opened) == 2
+    assert all(f.closed for f in opened)
+    assert len(output_file.read_text(encoding='utf-8').splitlines()) == 20
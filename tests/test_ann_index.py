@@ -0,0 +1,33 @@
+
+import numpy as np
+import pytest
+
+from ann_index import IndexConfig, build_index
+from vector_store import WazuhVectorStore
+
+
+@pytest.mark.parametrize("n_vectors", [1, 2, 50])
+def test_ivfpq_builds_with_few_vectors(n_vectors):
+    vectors = np.random.default_rng(0).random((n_vectors, 64), dtype='float32')
+    index = build_index(vectors, IndexConfig("ivfpq"))
+    assert index.ntotal == n_vectors
+    _, ids = index.search(vectors[:1], 1)
+    assert ids[0][0] >= 0
+
+
+def test_ivfpq_store_on_a_small_docs_folder(tmp_path, hashing_embeddings):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for i in range(5):
+        paragraphs = [f"Page {i} section {j}: the Wazuh agent {j} forwards events to the manager. " * 12
+                      for j in range(10)]
+        (docs / f"page-{i}.txt").write_text("\n\n".join(paragraphs), encoding='utf-8')
+    store = WazuhVectorStore(persist_directory=str(tmp_path / "index"), docs_folder=str(docs),
+                             embeddings=hashing_embeddings, index_config=IndexConfig("ivfpq"),
+                             ingest_workers=1)
+
+    chunks = store.create_vector_store()
+
+    assert 40 <= chunks <= 80
+    assert store.vector_store.index.ntotal == chunks
+    assert store.search_documents("How does the agent forward events?", k=3)
@@ -0,0 +1,70 @@
+import json
+import threading
+import time
+
+from answer_cache import SemanticAnswerCache
+
+
+def saved_entries(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)["entries"]
+
+
+def entry(i, created=None):
+    return {"namespace": "ns", "question": f"question {i}", "embedding": [1.0, float(i)],
+            "answer": f"answer {i}", "sources": [], "generation_time": 1.0,
+            "created": created or time.time()}
+
+
+def test_concurrent_writers_leave_a_complete_file(tmp_path):
+    path = tmp_path / "answers.json"
+    cache = SemanticAnswerCache(str(path), max_entries=1000, save_interval=0)
+
+    def writer(worker):
+        for i in range(50):
+            cache.store("ns", f"q{worker}-{i}", [1.0, float(i)], f"a{worker}-{i}", 1.0)
+            cache.lookup("ns", [1.0, float(i)])
+
+    threads = [threading.Thread(target=writer, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cache.flush()
+
+    assert len(saved_entries(path)) == 400
+    assert [p.name for p in tmp_path.iterdir()] == ["answers.json"]
+    assert len(SemanticAnswerCache(str(path), max_entries=1000).entries) == 400
+
+
+def test_stores_are_debounced_until_flush(tmp_path):
+    path = tmp_path / "answers.json"
+    cache = SemanticAnswerCache(str(path), save_interval=3600)
+    cache.store("ns", "first", [1.0, 0.0], "answer", 1.0)
+    cache._last_save = time.monotonic()
+    cache.store("ns", "second", [0.0, 1.0], "answer", 1.0)
+    assert len(saved_entries(path)) == 1
+
+    cache.flush()
+    assert len(saved_entries(path)) == 2
+
+
+def test_expired_entries_are_removed_from_the_file(tmp_path):
+    path = tmp_path / "answers.json"
+    path.write_text(json.dumps({"entries": [entry(0, created=time.time() - 7200), entry(1)]}))
+
+    cache = SemanticAnswerCache(str(path), ttl_seconds=3600)
+    cache.flush()
+
+    assert [e["question"] for e in saved_entries(path)] == ["question 1"]
+
+
+def test_load_trims_an_over_full_file(tmp_path):
+    path = tmp_path / "answers.json"
+    path.write_text(json.dumps({"entries": [entry(i) for i in range(10)]}))
+
+    cache = SemanticAnswerCache(str(path), max_entries=3)
+    assert len(cache.entries) == 3
+    cache.flush()
+
+    assert [e["question"] for e in saved_entries(path)] == ["question 7", "question 8", "question 9"]
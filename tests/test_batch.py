@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from batch import BatchRunner, load_questions
+
+
+class FakeEmbeddings:
+    def embed_queries(self, texts):
+        return [[float(len(text))] for text in texts]
+
+
+class FakeVectorStore:
+    embeddings = FakeEmbeddings()
+
+
+class FakeSpecialist:
+    def __init__(self, failing=()):
+        self.vector_store = FakeVectorStore()
+        self.failing = set(failing)
+        self.generated = []
+
+    def lookup_cached_answer(self, question, question_embedding=None):
+        return None, 0.0, question_embedding, "namespace"
+
+    def store_cached_answer(self, *args, **kwargs):
+        pass
+
+    def retrieve_batch(self, questions, embeddings=None):
+        for question in questions:
+            if question in self.failing:
+                raise RuntimeError("index unavailable")
+        return [(f"context for {question}", ["https://documentation.wazuh.com/current/"])
+                for question in questions]
+
+    def build_prompt(self, question, context):
+        return f"{context}\n\n{question}"
+
+    def generate_stream(self, prompt, stats):
+        self.generated.append(prompt)
+        stats.update(eval_count=3)
+        yield "Answer."
+
+
+QUESTIONS = [(str(i), f"Question {i}?") for i in range(5)]
+
+
+def records(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize("line", ['"text"', '[1]', '3', 'null'])
+def test_non_object_lines_are_rejected(tmp_path, line):
+    path = tmp_path / "questions.jsonl"
+    path.write_text('{"id": "a", "question": "What is Wazuh?"}\n' + line + "\n")
+    with pytest.raises(ValueError, match=r"questions.jsonl:2: expected a JSON object"):
+        load_questions(str(path))
+
+
+def test_failed_question_is_recorded_and_the_rest_answered(tmp_path):
+    output = str(tmp_path / "answers.jsonl")
+    specialist = FakeSpecialist(failing={"Question 2?"})
+    summary = BatchRunner(specialist, batch_size=3).run(QUESTIONS, output)
+
+    assert summary["answered"] == 4
+    assert summary["failed"] == 1
+    by_id = {record["id"]: record for record in records(output)}
+    assert set(by_id) == {qid for qid, _ in QUESTIONS}
+    assert by_id["2"]["error"].startswith("Error preparing question: index unavailable")
+    assert all(by_id[qid]["answer"] == "Answer." for qid in ("0", "1", "3", "4"))
+
+
+def test_resume_does_not_append_failed_ids_again(tmp_path):
+    output = str(tmp_path / "answers.jsonl")
+    BatchRunner(FakeSpecialist(failing={"Question 2?"}), batch_size=3).run(QUESTIONS, output)
+
+    specialist = FakeSpecialist(failing={"Question 2?"})
+    summary = BatchRunner(specialist, batch_size=3).run(QUESTIONS, output)
+    assert summary["skipped"] == len(QUESTIONS)
+    assert not specialist.generated
+    assert len(records(output)) == len(QUESTIONS)
+
+    summary = BatchRunner(FakeSpecialist(), batch_size=3).run(QUESTIONS, output, retry_failed=True)
+    assert summary["answered"] == 1
+    ids = [record["id"] for record in records(output)]
+    assert sorted(ids) == sorted(qid for qid, _ in QUESTIONS)
+    assert not any("error" in record for record in records(output))
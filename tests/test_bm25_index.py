@@ -0,0 +1,44 @@
+import pytest
+
+from bm25_index import BM25Index, is_identifier_query, reciprocal_rank_fusion, tokenize
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "d"]], k=60)
+
+    # Found by both rankings beats first place in only one
+    assert [item for item, _ in fused] == ["b", "c", "a", "d"]
+    assert dict(fused)["b"] == pytest.approx(1 / 62 + 1 / 61)
+    assert dict(fused)["d"] == pytest.approx(1 / 63)
+
+
+def test_compound_identifiers_are_kept_whole_and_split():
+    tokens = tokenize("Restart wazuh-analysisd after editing ossec.conf")
+    assert {"wazuh-analysisd", "wazuh", "analysisd", "ossec.conf", "ossec", "conf"} <= set(tokens)
+
+
+@pytest.mark.parametrize("query, identifier", [
+    ("<localfile>", True),
+    ("wazuh-analysisd", True),
+    ("/agents/summary", True),
+    ("5710", True),
+    ("ossec.conf <syscheck>", True),
+    ("How do I install the Wazuh indexer?", False),
+    ("What does wazuh-analysisd do?", False),
+])
+def test_identifier_queries(query, identifier):
+    assert is_identifier_query(query) is identifier
+
+
+def test_exact_identifier_ranks_first_and_removal_is_incremental():
+    index = BM25Index()
+    index.add("daemons", "wazuh-analysisd decodes events and wazuh-remoted receives them")
+    index.add("agents", "Agents send events to the manager over a secure channel")
+    index.add("rules", "Rule 5710 matches sshd attempts to log in with a non-existent user")
+
+    assert index.search("wazuh-analysisd", k=1)[0][0] == "daemons"
+    assert index.search("5710", k=1)[0][0] == "rules"
+
+    index.remove("rules")
+    assert index.search("5710") == []
+    assert len(index) == 2
@@ -0,0 +1,58 @@
+from langchain.docstore.document import Document
+
+from context_packer import EXCERPT_SEPARATOR, ContextPacker
+
+
+def doc(text, source):
+    return Document(page_content=text, metadata={"source": source})
+
+
+def words(prefix, count):
+    return " ".join(f"{prefix}{i}" for i in range(count))
+
+
+def test_last_excerpt_is_truncated_to_fill_the_budget():
+    packer = ContextPacker(min_excerpt_tokens=20)
+    first = doc(words("alpha", 60), "a.html")
+    second = doc(words("beta", 400), "b.html")
+    budget = packer.count_tokens(f"SOURCE: a.html\nCONTENT:\n{first.page_content}") + 100
+
+    context, sources, used = packer.pack([first, second], budget)
+
+    assert sources == ["a.html", "b.html"]
+    assert used <= budget
+    assert packer.count_tokens(context) <= budget
+    excerpts = context.split(EXCERPT_SEPARATOR)
+    assert excerpts[0].endswith(first.page_content)
+    assert "beta0" in excerpts[1] and "beta399" not in excerpts[1]
+
+
+def test_tail_too_small_for_an_excerpt_is_left_empty():
+    packer = ContextPacker(min_excerpt_tokens=64)
+    first = doc(words("alpha", 60), "a.html")
+    second = doc(words("beta", 400), "b.html")
+    budget = packer.count_tokens(f"SOURCE: a.html\nCONTENT:\n{first.page_content}") + 30
+
+    context, sources, used = packer.pack([first, second], budget)
+
+    assert sources == ["a.html"]
+    assert "beta" not in context
+    assert used <= budget
+
+
+def test_overlapping_chunks_merge_and_duplicates_drop():
+    packer = ContextPacker()
+    text = words("gamma", 200)
+    start, end = text[:900], text[700:]
+    duplicate = doc(text[:880], "mirror.html")
+
+    context, sources, _ = packer.pack([doc(start, "g.html"), doc(end, "g.html"), duplicate], 10000)
+
+    assert sources == ["g.html"]
+    assert context == f"SOURCE: g.html\nCONTENT:\n{text}"
+
+
+def test_budget_reserves_room_for_the_answer():
+    packer = ContextPacker(num_ctx=4096, answer_reserve=1024)
+    assert packer.budget(1000) == 2072
+    assert packer.budget(5000) == 0
@@ -0,0 +1,65 @@
+from context_packer import ContextPacker
+from conversation import ConversationSession
+
+DOCUMENTATION = ("The agent enrollment key is stored in /var/ossec/etc/client.keys "
+                 "and is created when the agent registers with the manager.")
+
+ANSWER = ("Agents register with the manager using an enrollment key. Once enrolled they "
+          "also report vulnerability detection and file integrity monitoring events on Linux.")
+
+
+class FakeSpecialist:
+    num_ctx = 4096
+    system_prompt = "You are a Wazuh specialist."
+
+    def __init__(self):
+        self.context_packer = ContextPacker(num_ctx=self.num_ctx)
+        self.retrievals = []
+
+    def lookup_cached_answer(self, question, question_embedding=None):
+        return None, 0.0, None, None
+
+    def store_cached_answer(self, *args, **kwargs):
+        pass
+
+    def build_prompt(self, question, context):
+        return f"{context}\n\n{question}"
+
+    def retrieve(self, question, used_tokens=None, select=None):
+        self.retrievals.append(question)
+        return DOCUMENTATION, ["https://documentation.wazuh.com/current/agent.html"]
+
+    def generate_stream(self, prompt, stats, start=None, context=None, keep_alive=None, result=None):
+        stats.update(prompt_eval_count=10, prompt_eval_time=0.01, eval_count=1)
+        result["context"] = list(context or []) + [1] * 50
+        yield ANSWER
+
+
+def session_after_first_turn():
+    specialist = FakeSpecialist()
+    session = ConversationSession(specialist)
+    session.ask("How does a Wazuh agent enroll with the manager?")
+    return specialist, session
+
+
+def test_topics_only_mentioned_in_an_answer_are_retrieved_again():
+    _, session = session_after_first_turn()
+    assert session.classify("How do I configure vulnerability detection?") == "new"
+    assert session.classify("How do I configure file integrity monitoring on Linux agents?") == "new"
+
+
+def test_reuse_needs_an_explicit_reference_and_covered_terms():
+    _, session = session_after_first_turn()
+    assert session.classify("Where is that key stored?") == "reuse"
+    # Covered terms without a reference are retrieved again
+    assert session.classify("Where is the enrollment key stored?") == "new"
+    # A reference with new terms searches the sources already used
+    assert session.classify("How do I rotate it?") == "narrow"
+
+
+def test_reused_turn_skips_retrieval_and_continues_the_context():
+    specialist, session = session_after_first_turn()
+    session.ask("Where is that key stored?")
+    assert specialist.retrievals == ["How does a Wazuh agent enroll with the manager?"]
+    assert session.last_turn["continued"] is True
+    assert session.last_turn["retrieved"] is False
@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+from benchmark import FixtureDocsServer
+from crawler import SiteCrawler, normalize_url
+from doc_downloader import url_to_filename
+
+
+@pytest.fixture
+def site():
+    with FixtureDocsServer(n_pages=15, link_fanout=2) as server:
+        yield server
+
+
+def make_crawler(folder, **kwargs):
+    kwargs.setdefault("max_workers", 2)
+    return SiteCrawler(str(folder), requests_per_second=0, **kwargs)
+
+
+def test_normalize_url_deduplicates_equivalent_links():
+    base = "https://documentation.wazuh.com/current/user-manual/index.html"
+    assert normalize_url("../quickstart.html#top", base) == \
+        "https://documentation.wazuh.com/current/quickstart.html"
+    assert normalize_url("HTTPS://Documentation.Wazuh.com:443/current/./a.html?b=2&a=1") == \
+        "https://documentation.wazuh.com/current/a.html?a=1&b=2"
+    assert normalize_url("mailto:info@wazuh.com") is None
+
+
+def test_query_strings_get_distinct_filenames():
+    plain = url_to_filename("https://documentation.wazuh.com/current/search.html")
+    first = url_to_filename("https://documentation.wazuh.com/current/search.html?page=1")
+    second = url_to_filename("https://documentation.wazuh.com/current/search.html?page=2")
+    assert plain == "current_search.html.txt"
+    assert len({plain, first, second}) == 3
+
+
+def test_crawl_follows_links_within_depth(site, tmp_path):
+    crawler = make_crawler(tmp_path, max_depth=1)
+    try:
+        crawler.seed([site.urls[0]])
+        results = crawler.crawl()
+    finally:
+        crawler.close()
+    # Page 0 links to pages 1 and 2; off-site, other-version and asset links are skipped
+    assert sorted(r["url"] for r in results) == sorted(site.urls[:3])
+    assert all(r["status"] == "downloaded" for r in results)
+
+
+def test_interrupted_crawl_resumes_from_frontier(site, tmp_path):
+    crawler = make_crawler(tmp_path, max_pages=5)
+    try:
+        crawler.seed([site.urls[0]])
+        first = crawler.crawl()
+        assert len(first) == 5
+        assert crawler.frontier.counts().get("pending")
+    finally:
+        crawler.close()
+
+    crawler = make_crawler(tmp_path)
+    try:
+        crawler.seed([site.urls[0]])
+        second = crawler.crawl()
+        counts = crawler.frontier.counts()
+    finally:
+        crawler.close()
+    fetched = [r["url"] for r in first + second]
+    assert len(fetched) == len(set(fetched)) == len(site.urls)
+    assert counts == {"done": len(site.urls)}
+
+
+def test_validators_survive_an_interrupted_crawl(site, tmp_path):
+    class Interrupted(Exception):
+        pass
+
+    def interrupt_after_four(result, seen=[]):
+        seen.append(result)
+        if len(seen) == 4:
+            raise Interrupted()
+
+    crawler = make_crawler(tmp_path, max_workers=1)
+    try:
+        crawler.seed([site.urls[0]])
+        with pytest.raises(Interrupted):
+            crawler.crawl(on_result=interrupt_after_four)
+    finally:
+        crawler.close()
+    # The crawl never reached the end, where the downloader's cache file is written
+    assert not os.path.exists(tmp_path / ".http_cache.json")
+
+    crawler = make_crawler(tmp_path)
+    try:
+        crawler.seed([site.urls[0]])
+        crawler.frontier.restart()
+        results = crawler.crawl()
+    finally:
+        crawler.close()
+    statuses = [r["status"] for r in results]
+    assert len(results) == len(site.urls)
+    assert statuses.count("not_modified") == 4
+    assert statuses.count("downloaded") == len(site.urls) - 4
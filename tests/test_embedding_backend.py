@@ -0,0 +1,23 @@
+import embedding_backend
+from embedding_backend import model_key
+from vector_store import WazuhVectorStore
+
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def test_embedding_key_follows_the_onnx_fallback(monkeypatch):
+    store = WazuhVectorStore(embedding_backend="onnx", embedding_quantize=True)
+
+    monkeypatch.setattr(embedding_backend, "onnx_available", lambda *args, **kwargs: False)
+    assert store.embedding_key == model_key(MODEL, "torch", True)
+
+    monkeypatch.setattr(embedding_backend, "onnx_available", lambda *args, **kwargs: True)
+    assert store.embedding_key == model_key(MODEL, "onnx", True)
+    assert store._embeddings is None
+
+
+def test_onnx_needs_its_runtime_modules(monkeypatch, tmp_path):
+    monkeypatch.setattr(embedding_backend.importlib.util, "find_spec", lambda name: None)
+    assert not embedding_backend.onnx_available(MODEL, str(tmp_path))
+    assert embedding_backend.resolve_backend("onnx", MODEL) == "torch"
+    assert embedding_backend.resolve_backend("torch", MODEL) == "torch"
@@ -0,0 +1,39 @@
+import argparse
+
+import numpy as np
+import pytest
+
+import embedding_benchmark
+
+
+def fake_measure(available):
+    def measure_backend(backend, quantize, model_name, chunks, queries, threads, batch_size):
+        if (backend, quantize) not in available:
+            raise ImportError(f"{backend} is not installed")
+        rng = np.random.default_rng(0)
+        doc_vectors = rng.random((len(chunks), 8), dtype='float32')
+        query_vectors = rng.random((len(queries), 8), dtype='float32')
+        if quantize:
+            doc_vectors += rng.normal(0, 1e-4, doc_vectors.shape).astype('float32')
+        stats = {"backend": f"{backend}{'-int8' if quantize else ''}", "load_seconds": 0.0,
+                 "chunks_per_sec": 1.0, "query_p50_ms": 0.0, "query_p99_ms": 0.0}
+        return stats, doc_vectors, query_vectors
+    return measure_backend
+
+
+def run_main(monkeypatch, available):
+    monkeypatch.setattr(embedding_benchmark, "measure_backend", fake_measure(available))
+    parser = argparse.ArgumentParser()
+    embedding_benchmark.add_arguments(parser)
+    return embedding_benchmark.main(parser.parse_args(
+        ["--docs-folder", "", "--pages", "20", "--max-chunks", "50", "--queries", "10"]
+    ))
+
+
+@pytest.mark.parametrize("available, status", [
+    ({("torch", False), ("onnx", False), ("onnx", True)}, 0),
+    ({("torch", False)}, 1),
+    ({("onnx", True)}, 1),
+])
+def test_exit_status_requires_a_checked_quantized_backend(monkeypatch, available, status):
+    assert run_main(monkeypatch, available) == status
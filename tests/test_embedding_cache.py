@@ -0,0 +1,63 @@
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingModel:
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def cached(tmp_path, model, model_name="model-a", batch_size=2):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    return CachedEmbeddings(model, cache, model_name=model_name, batch_size=batch_size)
+
+
+def test_only_misses_reach_the_model_in_batches(tmp_path):
+    model = CountingModel()
+    embeddings = cached(tmp_path, model)
+    texts = ["alpha", "beta", "gamma", "alpha", "delta", "epsilon"]
+
+    vectors = embeddings.embed_documents(texts)
+
+    assert [len(batch) for batch in model.batches] == [2, 2, 1]
+    assert sorted(text for batch in model.batches for text in batch) == sorted(set(texts))
+    assert vectors[0] == vectors[3] == [5.0, 1.0]
+    assert embeddings.cache.stats()["misses"] == len(texts)
+
+    model.batches.clear()
+    embeddings.cache.reset_stats()
+    again = embeddings.embed_documents(["beta", "  alpha\n", "zeta"])
+
+    assert model.batches == [["zeta"]]
+    assert again[1] == vectors[0]
+    assert embeddings.cache.stats()["hits"] == 2
+
+
+def test_vectors_are_persisted_per_model(tmp_path):
+    first = CountingModel()
+    cached(tmp_path, first).embed_documents(["alpha", "beta"])
+
+    reopened = CountingModel()
+    cached(tmp_path, reopened).embed_documents(["alpha", "beta"])
+    assert reopened.batches == []
+
+    other = CountingModel()
+    cached(tmp_path, other, model_name="model-b").embed_documents(["alpha", "beta"])
+    assert other.batches == [["alpha", "beta"]]
+
+
+def test_repeated_queries_skip_the_model(tmp_path):
+    model = CountingModel()
+    embeddings = cached(tmp_path, model, batch_size=8)
+
+    embeddings.embed_queries(["How do I install?", "What is FIM?", "How do I  install?"])
+    assert model.batches == [["How do I install?", "What is FIM?"]]
+
+    embeddings.embed_query("What is FIM?")
+    assert len(model.batches) == 1
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from ann_index import IndexConfig
+from ingest import IngestPipeline
+
+
+class FailingEmbeddings:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        time.sleep(self.delay)
+        raise RuntimeError("embedding model crashed")
+
+
+def write_files(folder, count):
+    paths = []
+    for i in range(count):
+        path = folder / f"page-{i}.txt"
+        path.write_text(f"Page {i}: the Wazuh manager analyzes agent events. " * 40, encoding='utf-8')
+        paths.append(str(path))
+    return paths
+
+
+def run_with_deadline(fn, seconds=120):
+    """Run fn on a thread and return its exception, failing if it never returns"""
+    outcome = {}
+
+    def target():
+        try:
+            fn()
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), "ingest pipeline did not terminate"
+    return outcome.get("error")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_consumer_failure_stops_the_producer(tmp_path, workers):
+    files = write_files(tmp_path, 40)
+    embeddings = FailingEmbeddings()
+    pipeline = IngestPipeline(embeddings, workers=workers, batch_size=4, queue_size=1)
+
+    error = run_with_deadline(lambda: pipeline.run(files, IndexConfig()))
+
+    assert isinstance(error, RuntimeError)
+    assert str(error) == "embedding model crashed"
+    assert embeddings.calls == 1
+    assert not [t for t in threading.enumerate() if t.name == "ingest-parse"]
+
+
+def test_consumer_failure_after_the_last_file_is_parsed(tmp_path):
+    # The producer is left holding the end marker in front of a full queue
+    files = write_files(tmp_path, 2)
+    pipeline = IngestPipeline(FailingEmbeddings(delay=0.5), workers=1, batch_size=1, queue_size=1)
+
+    error = run_with_deadline(lambda: pipeline.run(files, IndexConfig()), seconds=10)
+
+    assert isinstance(error, RuntimeError)
+
+
+def test_file_discovery_failure_is_propagated(tmp_path, hashing_embeddings):
+    files = write_files(tmp_path, 5)
+
+    def discover():
+        yield from files
+        raise OSError("docs folder disappeared")
+
+    pipeline = IngestPipeline(hashing_embeddings, workers=1, batch_size=4, queue_size=1)
+    error = run_with_deadline(lambda: pipeline.run(discover(), IndexConfig()))
+
+    assert isinstance(error, OSError)
+    assert str(error) == "docs folder disappeared"
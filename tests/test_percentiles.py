@@ -0,0 +1,14 @@
+import pytest
+
+from percentiles import percentile
+
+
+@pytest.mark.parametrize("pct, expected", [(0, 1), (10, 1), (11, 2), (50, 5), (90, 9), (99, 10), (100, 10)])
+def test_nearest_rank(pct, expected):
+    assert percentile(range(10, 0, -1), pct) == expected
+
+
+def test_p99_of_a_hundred_values_is_the_99th():
+    assert percentile(range(1, 101), 99) == 99
+    assert percentile([7.5], 99) == 7.5
+    assert percentile([], 50) == 0.0
@@ -0,0 +1,224 @@
+import json
+import asyncio
+import threading
+
+from server import MAX_BODY_BYTES, WazuhAssistantServer
+from telemetry import metrics
+
+
+class FakeSpecialist:
+    """Answers every question with fixed tokens once ``release`` is set"""
+
+    def __init__(self, tokens=("Restart", " wazuh-manager."), store_error=None):
+        self.tokens = tokens
+        self.store_error = store_error
+        self.release = threading.Event()
+        self.release.set()
+        self.generations = 0
+        self.stored = []
+
+    def lookup_cached_answer(self, question, question_embedding=None):
+        return None, 0.0, [1.0, 0.0], "test"
+
+    def retrieve(self, question):
+        return "context", ["https://documentation.wazuh.com/current/index.html"]
+
+    def build_prompt(self, question, context):
+        return f"{context}\n{question}"
+
+    def generate_stream(self, prompt, stats, start=None):
+        self.generations += 1
+        self.release.wait(5)
+        stats["eval_count"] = len(self.tokens)
+        yield from self.tokens
+
+    def store_cached_answer(self, namespace, question, embedding, answer, generation_time, sources=None):
+        if self.store_error:
+            raise self.store_error
+        self.stored.append(question)
+
+
+async def request(port, raw):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), body
+
+
+async def post(port, path, payload):
+    body = json.dumps(payload).encode()
+    raw = (f"POST {path} HTTP/1.1\r\nHost: test\r\nContent-Type: application/json\r\n"
+           f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+    return await request(port, raw)
+
+
+def serve(specialist, scenario, **kwargs):
+    """Run ``scenario(server)`` against a started server on a free port"""
+    async def main():
+        server = WazuhAssistantServer(specialist, port=0, **kwargs)
+        await server.start()
+        try:
+            return await scenario(server)
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+
+def test_health_and_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", True)
+
+    async def scenario(server):
+        status, body = await request(server.port, b"GET /health HTTP/1.1\r\n\r\n")
+        assert status == 200
+        assert json.loads(body)["status"] == "ok"
+        status, body = await request(server.port, b"GET /metrics HTTP/1.1\r\n\r\n")
+        assert status == 200
+        assert b"server_waiting" in body
+
+    serve(FakeSpecialist(), scenario)
+
+
+def test_ask_returns_answer_and_caches_it():
+    specialist = FakeSpecialist()
+
+    async def scenario(server):
+        status, body = await post(server.port, "/ask", {"question": "How do I restart?"})
+        assert status == 200
+        result = json.loads(body)
+        assert result["answer"] == "Restart wazuh-manager."
+        assert result["cached"] is False
+        assert result["sources"]
+
+    serve(specialist, scenario)
+    assert specialist.stored == ["How do I restart?"]
+
+
+def test_ask_streams_server_sent_events():
+    async def scenario(server):
+        status, body = await post(server.port, "/ask", {"question": "How?", "stream": True})
+        assert status == 200
+        events = [block.split("\n") for block in body.decode().strip().split("\n\n")]
+        names = [lines[0][len("event: "):] for lines in events]
+        assert names == ["token", "token", "done"]
+        tokens = [json.loads(lines[1][len("data: "):])["token"] for lines in events[:2]]
+        assert "".join(tokens) == "Restart wazuh-manager."
+
+    serve(FakeSpecialist(), scenario)
+
+
+def test_identical_questions_are_coalesced():
+    specialist = FakeSpecialist()
+    specialist.release.clear()
+
+    async def scenario(server):
+        requests = [asyncio.ensure_future(post(server.port, "/ask", {"question": question}))
+                    for question in ("How do I restart?", "how do I   restart?", "HOW DO I RESTART?")]
+        while server.stats["requests"] < 3 or server.stats["coalesced"] < 2:
+            await asyncio.sleep(0.01)
+        specialist.release.set()
+        responses = await asyncio.gather(*requests)
+        assert [status for status, _ in responses] == [200, 200, 200]
+        assert {json.loads(body)["answer"] for _, body in responses} == {"Restart wazuh-manager."}
+        assert server.stats["coalesced"] == 2
+
+    serve(specialist, scenario)
+    assert specialist.generations == 1
+
+
+def test_full_queue_is_rejected():
+    specialist = FakeSpecialist()
+    specialist.release.clear()
+
+    async def scenario(server):
+        first = asyncio.ensure_future(post(server.port, "/ask", {"question": "first"}))
+        while server.generating < 1:
+            await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(post(server.port, "/ask", {"question": "second"}))
+        while server.waiting < 1:
+            await asyncio.sleep(0.01)
+        status, body = await post(server.port, "/ask", {"question": "third"})
+        assert status == 503
+        specialist.release.set()
+        assert [status for status, _ in await asyncio.gather(first, second)] == [200, 200]
+
+    serve(specialist, scenario, max_concurrent_generations=1, max_queue=1)
+
+
+def test_cache_store_failure_still_returns_answer():
+    specialist = FakeSpecialist(store_error=FileNotFoundError("ac.json.tmp"))
+
+    async def scenario(server):
+        status, body = await post(server.port, "/ask", {"question": "How do I restart?"})
+        assert status == 200
+        assert json.loads(body)["answer"] == "Restart wazuh-manager."
+        assert server.stats["errors"] == 0
+
+    serve(specialist, scenario)
+
+
+def test_bad_requests():
+    async def scenario(server):
+        status, _ = await request(server.port, b"GET /nowhere HTTP/1.1\r\n\r\n")
+        assert status == 404
+        status, _ = await request(server.port, b"GET /ask HTTP/1.1\r\n\r\n")
+        assert status == 405
+        status, _ = await post(server.port, "/ask", {"stream": False})
+        assert status == 400
+        status, _ = await request(server.port, b"POST /ask HTTP/1.1\r\nContent-Length: 2\r\n\r\n[]")
+        assert status == 400
+
+    serve(FakeSpecialist(), scenario)
+
+
+def test_malformed_request_is_400_and_oversized_body_is_413():
+    async def scenario(server):
+        status, _ = await request(server.port, b"GARBAGE\r\n\r\n")
+        assert status == 400
+        status, _ = await request(server.port, b"POST /ask HTTP/1.1\r\nContent-Length: ten\r\n\r\n")
+        assert status == 400
+        too_large = f"POST /ask HTTP/1.1\r\nContent-Length: {MAX_BODY_BYTES + 1}\r\n\r\n"
+        status, _ = await request(server.port, too_large.encode())
+        assert status == 413
+
+    serve(FakeSpecialist(), scenario)
+
+
+class FailingSpecialist(FakeSpecialist):
+    """Fails at one stage of answering: 'cache', 'retrieval' or 'generation'"""
+
+    def __init__(self, stage):
+        super().__init__()
+        self.stage = stage
+
+    def lookup_cached_answer(self, question, question_embedding=None):
+        if self.stage == "cache":
+            raise OSError("answer cache unreadable")
+        return super().lookup_cached_answer(question, question_embedding)
+
+    def retrieve(self, question):
+        if self.stage == "retrieval":
+            raise ValueError("Vector store not found")
+        return super().retrieve(question)
+
+    def generate_stream(self, prompt, stats, start=None):
+        if self.stage == "generation":
+            raise ConnectionError("Ollama is down")
+        yield from super().generate_stream(prompt, stats, start)
+
+
+def test_errors_name_the_stage_that_failed():
+    expected = {
+        "cache": (500, "Error looking up cached answers: answer cache unreadable"),
+        "retrieval": (500, "Error retrieving documentation: Vector store not found"),
+        "generation": (502, "Error communicating with AI model: Ollama is down"),
+    }
+    for stage, (expected_status, message) in expected.items():
+        async def scenario(server):
+            return await post(server.port, "/ask", {"question": "How do I restart?"})
+
+        status, body = serve(FailingSpecialist(stage), scenario)
+        assert status == expected_status
+        assert json.loads(body) == {"error": message, "stage": stage}
@@ -0,0 +1,76 @@
+import os
+
+from sharded_store import ShardedVectorStore
+from vector_store import WazuhVectorStore
+
+
+def write_docs(folder, names):
+    os.makedirs(folder, exist_ok=True)
+    for name in names:
+        with open(os.path.join(folder, name), 'w', encoding='utf-8') as f:
+            f.write(f"{name} explains how the Wazuh manager decodes and analyzes events. " * 20)
+
+
+def indexed_files(store):
+    return {os.path.basename(source) for source in store._load_manifest()["sources"]}
+
+
+def test_shard_and_default_index_keep_their_own_docs(tmp_path, monkeypatch, hashing_embeddings):
+    monkeypatch.chdir(tmp_path)
+    sharded = ShardedVectorStore(embeddings=hashing_embeddings)
+    write_docs(os.path.join(sharded.docs_folder, "4.8"), ["shard-page.txt"])
+    sharded.shard("4.8").ingest_workers = 1
+    sharded.build(["4.8"])
+
+    # The default docs folder was never downloaded into by the shard build
+    assert not os.path.exists("wazuh_docs")
+    write_docs("wazuh_docs", ["default-page.txt"])
+    default = WazuhVectorStore(embeddings=hashing_embeddings, ingest_workers=1)
+    default.create_vector_store()
+
+    assert indexed_files(sharded.shard("4.8")) == {"shard-page.txt"}
+    assert indexed_files(default) == {"default-page.txt"}
+    sharded.close()
+
+
+def build_shards(tmp_path, embeddings, versions, **kwargs):
+    sharded = ShardedVectorStore(persist_directory=str(tmp_path / "store"),
+                                 docs_folder=str(tmp_path / "docs"), embeddings=embeddings,
+                                 **kwargs)
+    for version in versions:
+        write_docs(os.path.join(sharded.docs_folder, version), [f"page-{version}.txt"])
+        sharded.shard(version).ingest_workers = 1
+    sharded.build(versions)
+    return sharded
+
+
+def test_least_recently_used_shard_is_evicted(tmp_path, hashing_embeddings):
+    sharded = build_shards(tmp_path, hashing_embeddings, ["4.7", "4.8", "4.9"])
+    size = max(sharded.shard(v).index_size_bytes() for v in sharded.versions)
+    # Room for two shards but not three
+    sharded.max_resident_bytes = int(size * 2.5)
+
+    sharded.search_documents("manager events", version="4.7")
+    sharded.search_documents("manager events", version="4.8")
+    sharded.search_documents("manager events in 4.7")
+    assert sharded.resident_versions() == ["4.8", "4.7"]
+
+    docs = sharded.search_documents("manager events", version="4.9")
+    assert sharded.resident_versions() == ["4.7", "4.9"]
+    assert sharded.shard("4.8").vector_store is None
+    assert all(doc.metadata["source"].endswith("page-4.9.txt") for doc in docs)
+    sharded.close()
+
+
+def test_shards_in_use_are_not_evicted(tmp_path, hashing_embeddings):
+    sharded = build_shards(tmp_path, hashing_embeddings, ["4.7", "4.8"])
+    sharded.max_resident_bytes = 1
+
+    sharded._acquire(["4.7"])
+    sharded._acquire(["4.8"])
+    # Both shards are pinned by callers, so the budget cannot evict either
+    assert sharded.resident_versions() == ["4.7", "4.8"]
+    sharded._release(["4.8"])
+    sharded._acquire(["4.7"])
+    assert sharded.resident_versions() == ["4.7"]
+    sharded.close()
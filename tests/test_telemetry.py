@@ -0,0 +1,11 @@
+from telemetry import Metrics
+
+
+def test_label_values_are_escaped_in_prometheus_text():
+    metrics = Metrics(enabled=True)
+    metrics.inc("shard_loads_total", version='4.8 "beta"\\n\nnext')
+
+    line = next(line for line in metrics.to_prometheus().splitlines()
+                if line.startswith("wazuh_ai_shard_loads_total{"))
+
+    assert line == 'wazuh_ai_shard_loads_total{version="4.8 \\"beta\\"\\\\n\\nnext"} 1'
@@ -0,0 +1,91 @@
+from vector_store import WazuhVectorStore
+
+
+def page(topic, paragraphs=4):
+    return "\n\n".join(f"{topic} paragraph {i}: Wazuh collects {topic} events from agents "
+                       f"and the manager decodes them with rules. " * 8 for i in range(paragraphs))
+
+
+def build(tmp_path, embeddings, pages):
+    docs = tmp_path / "docs"
+    docs.mkdir(exist_ok=True)
+    for name, text in pages.items():
+        (docs / name).write_text(text, encoding='utf-8')
+    store = WazuhVectorStore(persist_directory=str(tmp_path / "index"), docs_folder=str(docs),
+                             embeddings=embeddings, ingest_workers=1)
+    store.create_vector_store()
+    return store, docs
+
+
+def chunk_ids(store, name):
+    manifest = store._load_manifest()
+    source = next(source for source in manifest["sources"] if source.endswith(name))
+    return {chunk["id"] for chunk in manifest["sources"][source]["chunks"]}
+
+
+def test_update_reindexes_only_changed_sources(tmp_path, hashing_embeddings):
+    store, docs = build(tmp_path, hashing_embeddings, {
+        "syscheck.txt": page("syscheck"),
+        "vulnerability.txt": page("vulnerability"),
+        "removed.txt": page("removed"),
+    })
+    syscheck_ids = chunk_ids(store, "syscheck.txt")
+    old_vulnerability_ids = chunk_ids(store, "vulnerability.txt")
+    removed_ids = chunk_ids(store, "removed.txt")
+
+    # Change one paragraph, delete one page and add another
+    text = page("vulnerability").replace("vulnerability paragraph 3:", "CVE feed paragraph 3:")
+    (docs / "vulnerability.txt").write_text(text, encoding='utf-8')
+    (docs / "removed.txt").unlink()
+    (docs / "added.txt").write_text(page("added"), encoding='utf-8')
+
+    updated = WazuhVectorStore(persist_directory=str(tmp_path / "index"), docs_folder=str(docs),
+                               embeddings=hashing_embeddings, ingest_workers=1)
+    counts = updated.update_vector_store()
+
+    new_vulnerability_ids = chunk_ids(updated, "vulnerability.txt")
+    changed = new_vulnerability_ids - old_vulnerability_ids
+    assert changed and len(changed) < len(new_vulnerability_ids)
+    assert counts["added"] == len(changed) + len(chunk_ids(updated, "added.txt"))
+    assert counts["deleted"] == len(old_vulnerability_ids - new_vulnerability_ids) + len(removed_ids)
+    assert counts["unchanged"] == len(syscheck_ids) + len(old_vulnerability_ids & new_vulnerability_ids)
+    assert chunk_ids(updated, "syscheck.txt") == syscheck_ids
+
+    indexed = {doc_id for doc_id, _ in updated._iter_documents()}
+    assert not indexed & removed_ids
+    assert indexed == set().union(*(chunk_ids(updated, name) for name in
+                                    ("syscheck.txt", "vulnerability.txt", "added.txt")))
+
+    assert updated.update_vector_store() == {"added": 0, "deleted": 0, "unchanged": len(indexed)}
+
+
+class CountingModel:
+    def __init__(self, model):
+        self.model = model
+        self.queries = 0
+
+    def embed_documents(self, texts):
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text):
+        self.queries += 1
+        return self.model.embed_query(text)
+
+
+def test_identifier_queries_skip_embedding(tmp_path, hashing_embeddings):
+    store, _ = build(tmp_path, hashing_embeddings, {
+        "daemons.txt": "wazuh-analysisd decodes events and applies rules.\n\n" + page("daemon"),
+        "fim.txt": page("syscheck"),
+    })
+    model = CountingModel(hashing_embeddings.embeddings)
+    hashing_embeddings.embeddings = model
+
+    docs, mode = store._search("wazuh-analysisd", k=3, candidates=10)
+    assert mode == "lexical"
+    assert "wazuh-analysisd" in docs[0].page_content
+    assert model.queries == 0
+
+    docs, mode = store._search("How are syscheck events collected?", k=3, candidates=10)
+    assert mode == "hybrid"
+    assert model.queries == 1
+    assert all(doc.metadata["source"].endswith(("daemons.txt", "fim.txt")) for doc in docs)
@@ -1,72 +1,628 @@
 # vector_store.py
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import FAISS
-from document_processor import WazuhDocumentProcessor
+# langchain, sentence-transformers/torch and FAISS are imported lazily on the
+# code paths that need them to keep process startup fast.
 import os
+import json
+import uuid
+import pickle
+import hashlib
+import argparse
+import threading
+from bm25_index import BM25Index, is_identifier_query, reciprocal_rank_fusion
+from ann_index import INDEX_TYPES, IndexConfig, apply_search_params, supports_removal
+from embedding_backend import add_embedding_arguments, embedding_options, model_key, resolve_backend
+from telemetry import configure_logging, get_logger, span
+
+MANIFEST_FILE = "manifest.json"
+DEFAULT_INDEX_NAME = "index"
+
+logger = get_logger("vector_store")
+
+_shared_lock = threading.Lock()
+_shared_embeddings = {}
+_shared_stores = {}
+
+
+def content_hash(text):
+    """Stable content hash used for sources and chunks in the manifest"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def assign_chunk_ids(source, chunks):
+    """Give a source's chunks stable IDs and return (chunk_id, chunk_hash, chunk) entries.
+    
+    A chunk ID is derived from its source, its content hash and its
+    occurrence within the source, so unchanged chunks keep their IDs
+    when other parts of the page change.
+    """
+    seen = {}
+    entries = []
+    for chunk in chunks:
+        chunk_hash = content_hash(chunk.page_content)
+        occurrence = seen.get(chunk_hash, 0)
+        seen[chunk_hash] = occurrence + 1
+        chunk_id = content_hash(f"{source}\0{chunk_hash}\0{occurrence}")[:32]
+        chunk.metadata['chunk_id'] = chunk_id
+        entries.append((chunk_id, chunk_hash, chunk))
+    return entries
+
+
+def get_shared_embeddings(model_name, cache_path, batch_size=256, cache_max_entries=200000,
+                          backend="torch", threads=None, quantize=False, model_batch_size=32,
+                          query_cache_size=1024):
+    """Return the process-wide cached embedding model, loading it on first use"""
+    key = (model_name, backend, quantize, os.path.abspath(cache_path))
+    with _shared_lock:
+        if key not in _shared_embeddings:
+            from embedding_backend import create_embedding_backend
+            from embedding_cache import EmbeddingCache, CachedEmbeddings
+            
+            model = create_embedding_backend(
+                backend, model_name, threads=threads, batch_size=model_batch_size, quantize=quantize
+            )
+            cache = EmbeddingCache(cache_path, max_entries=cache_max_entries)
+            _shared_embeddings[key] = CachedEmbeddings(
+                model,
+                cache,
+                # Cached vectors are keyed by model, backend and quantization
+                model_name=model.model_key,
+                batch_size=batch_size,
+                query_cache_size=query_cache_size
+            )
+        return _shared_embeddings[key]
+
+def _lazy_embeddings(store):
+    """Embeddings object that loads the store's shared model on first use.
+    
+    Opening an index only needs the FAISS file and the docstore, so the
+    model is not loaded until something is actually embedded.
+    """
+    try:
+        from langchain_core.embeddings import Embeddings
+    except ImportError:
+        from langchain.embeddings.base import Embeddings
+    
+    class LazyEmbeddings(Embeddings):
+        def embed_documents(self, texts):
+            return store.embeddings.embed_documents(texts)
+        
+        def embed_query(self, text):
+            return store.embeddings.embed_query(text)
+    
+    return LazyEmbeddings()
+
 
 class WazuhVectorStore:
-    def __init__(self, persist_directory="./wazuh_vector_store"):
+    def __init__(self, persist_directory="./wazuh_vector_store",
+                 embedding_model="sentence-transformers/all-MiniLM-L6-v2",
+                 embedding_cache_path="./wazuh_embedding_cache.sqlite",
+                 embedding_batch_size=256, embedding_cache_max_entries=200000,
+                 index_config=None, docs_folder="./wazuh_docs", embeddings=None,
+                 ingest_workers=None, doc_version="current", embedding_backend="torch",
+                 embedding_threads=None, embedding_quantize=False, model_batch_size=32):
         self.persist_directory = persist_directory
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
+        self.docs_folder = docs_folder
+        # Documentation version downloaded into docs_folder when it is empty
+        self.doc_version = doc_version
+        # None keeps whatever index type was saved (flat for new stores)
+        self.index_config = index_config
+        self.active_index_config = None
+        self.embedding_model = embedding_model
+        self.embedding_cache_path = embedding_cache_path
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_cache_max_entries = embedding_cache_max_entries
+        # "torch" or "onnx", optionally int8-quantized, with intra-op threads
+        self.embedding_backend = embedding_backend
+        self.embedding_threads = embedding_threads
+        self.embedding_quantize = embedding_quantize
+        self.model_batch_size = model_batch_size
+        # Parse/chunk processes used when building; None uses every core
+        self.ingest_workers = ingest_workers
+        # An explicit embeddings object (with a .cache) replaces the shared model
+        self._embeddings = embeddings
         self.vector_store = None
+        self.bm25_index = None
+        self.memory_mapped = False
+    
+    @classmethod
+    def shared(cls, persist_directory="./wazuh_vector_store", **kwargs):
+        """Return the process-wide store for a persist directory"""
+        key = os.path.abspath(persist_directory)
+        with _shared_lock:
+            if key not in _shared_stores:
+                _shared_stores[key] = cls(persist_directory, **kwargs)
+            return _shared_stores[key]
+    
+    @property
+    def embeddings(self):
+        """Shared embedding model, loaded on first access"""
+        if self._embeddings is None:
+            self._embeddings = get_shared_embeddings(
+                self.embedding_model,
+                self.embedding_cache_path,
+                batch_size=self.embedding_batch_size,
+                cache_max_entries=self.embedding_cache_max_entries,
+                backend=self.embedding_backend,
+                threads=self.embedding_threads,
+                quantize=self.embedding_quantize,
+                model_batch_size=self.model_batch_size
+            )
+        return self._embeddings
+    
+    @property
+    def embedding_key(self):
+        """Key of the vectors queries are embedded with, without loading the model"""
+        if self._embeddings is not None:
+            return self._embeddings.model_name
+        # The backend that will load, after any fallback from ONNX Runtime to PyTorch
+        backend = resolve_backend(self.embedding_backend, self.embedding_model)
+        return model_key(self.embedding_model, backend, self.embedding_quantize)
+    
+    @property
+    def embedding_cache(self):
+        return self.embeddings.cache
+    
+    def log_embedding_cache_stats(self):
+        """Log embedding cache hit/miss counts for the last build"""
+        stats = self.embedding_cache.stats()
+        logger.info(f"🧠 Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+                    f"({stats['hit_rate']:.0%} hit rate, {stats['entries']} entries)")
+    
+    def _load_manifest(self):
+        """Load the content-hash manifest stored next to the index"""
+        path = os.path.join(self.persist_directory, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Ignoring unreadable manifest {path}: {e}")
+            return None
+    
+    @staticmethod
+    def _source_manifest(source_hash, entries):
+        return {
+            "hash": source_hash,
+            "chunks": [{"id": chunk_id, "hash": chunk_hash} for chunk_id, chunk_hash, _ in entries]
+        }
+    
+    def _save_atomic(self, manifest):
+        """Save the index under a new generation name, then switch the manifest.
+        
+        The manifest is replaced atomically and is the only pointer to the
+        live index files, so readers never observe a half-written index.
+        """
+        os.makedirs(self.persist_directory, exist_ok=True)
+        previous = self._load_manifest()
+        index_name = f"index-{uuid.uuid4().hex[:12]}"
+        with span("index_save", vectors=self.vector_store.index.ntotal):
+            self.vector_store.save_local(self.persist_directory, index_name=index_name)
+            if self.bm25_index is not None:
+                self.bm25_index.save(os.path.join(self.persist_directory, index_name + ".bm25"))
+        
+        manifest["index_name"] = index_name
+        path = os.path.join(self.persist_directory, MANIFEST_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+        
+        old_name = previous.get("index_name") if previous else DEFAULT_INDEX_NAME
+        if old_name and old_name != index_name:
+            for ext in (".faiss", ".pkl", ".bm25"):
+                old_path = os.path.join(self.persist_directory, old_name + ext)
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+    
+    def _build_faiss_store(self, chunks, ids, config):
+        """Embed chunks and build a FAISS store with the configured index type"""
+        from langchain.vectorstores import FAISS
+        
+        if config.index_type == "flat":
+            return FAISS.from_documents(chunks, self.embeddings, ids=ids)
+        
+        import numpy as np
+        from langchain.docstore.in_memory import InMemoryDocstore
+        from ann_index import build_index
+        
+        vectors = np.array(
+            self.embeddings.embed_documents([chunk.page_content for chunk in chunks]),
+            dtype='float32'
+        )
+        logger.debug(f"🧮 Training and filling {config.describe()} index...")
+        with span("index_build", index_type=config.index_type, vectors=len(vectors)):
+            index = build_index(vectors, config)
+        docstore = InMemoryDocstore(dict(zip(ids, chunks)))
+        return FAISS(self.embeddings, index, docstore, dict(enumerate(ids)))
     
     def create_vector_store(self, force_download=False):
         """Create vector store from Wazuh documents"""
-        processor = WazuhDocumentProcessor()
+        from document_processor import WazuhDocumentProcessor
+        
+        processor = WazuhDocumentProcessor(docs_folder=self.docs_folder, version=self.doc_version)
         
         # Download documentation if forced or no docs exist
         if force_download or not os.path.exists(processor.docs_folder) or not os.listdir(processor.docs_folder):
-            print("📥 No existing documentation found. Downloading...")
+            logger.info("📥 No existing documentation found. Downloading...")
             if not processor.download_wazuh_documentation():
                 raise Exception("Failed to download Wazuh documentation")
         
-        # Load documents
-        documents = processor.load_documents()
-        if not documents:
+        # Stream files through parse/chunk workers, batched embedding and index adds
+        from ingest import IngestPipeline
+        
+        config = self.index_config or IndexConfig()
+        pipeline = IngestPipeline(
+            self.embeddings,
+            workers=self.ingest_workers,
+            batch_size=self.embedding_batch_size,
+            chunk_size=processor.chunk_size,
+            chunk_overlap=processor.chunk_overlap
+        )
+        self.embedding_cache.reset_stats()
+        result = pipeline.run(processor.iter_document_files(), config)
+        if result.store is None:
             raise Exception("No documents found after download")
+        self.vector_store = result.store
+        self.bm25_index = result.bm25_index
+        self.active_index_config = config
+        self.memory_mapped = False
+        self.log_embedding_cache_stats()
         
-        # Split into chunks
-        chunks = processor.chunk_documents(documents)
-        print(f"🔨 Creating vector store with {len(chunks)} document chunks...")
+        # Save locally
+        manifest = {
+            "index": config.to_dict(),
+            "embeddings": self.embeddings.model_name,
+            "sources": result.sources
+        }
+        self._save_atomic(manifest)
+        logger.info(f"💾 Vector store saved to {self.persist_directory}")
+        return result.stats["chunks"]
+    
+    def update_vector_store(self, force_download=False):
+        """Re-index only new or changed sources using the content-hash manifest"""
+        from document_processor import WazuhDocumentProcessor
         
-        # Create vector store
-        self.vector_store = FAISS.from_documents(chunks, self.embeddings)
+        manifest = self._load_manifest()
+        # Memory-mapped indexes are read-only, so load a writable copy
+        if manifest is None or not self.load_vector_store(mmap=False):
+            logger.info("🆕 No indexed manifest found, building a full vector store...")
+            count = self.create_vector_store(force_download=force_download)
+            return {"added": count, "deleted": 0, "unchanged": 0}
         
-        # Save locally
-        self.vector_store.save_local(self.persist_directory)
-        print(f"💾 Vector store saved to {self.persist_directory}")
-        return len(chunks)
+        processor = WazuhDocumentProcessor(docs_folder=self.docs_folder, version=self.doc_version)
+        if force_download:
+            if not processor.download_wazuh_documentation():
+                raise Exception("Failed to download Wazuh documentation")
+        
+        # Files stream through the parse/chunk workers; only the chunks of
+        # new or changed sources are kept until they are embedded
+        from ingest import IngestPipeline
+        
+        pipeline = IngestPipeline(
+            self.embeddings,
+            workers=self.ingest_workers,
+            chunk_size=processor.chunk_size,
+            chunk_overlap=processor.chunk_overlap
+        )
+        old_sources = manifest.get("sources", {})
+        to_delete = []
+        to_add = []
+        unchanged = 0
+        new_sources = {}
+        
+        for source, source_hash, entries in pipeline.parse(processor.iter_document_files()):
+            old_entry = old_sources.get(source)
+            if old_entry and old_entry["hash"] == source_hash:
+                new_sources[source] = old_entry
+                unchanged += len(old_entry["chunks"])
+                continue
+            
+            old_ids = {chunk["id"] for chunk in old_entry["chunks"]} if old_entry else set()
+            new_ids = {chunk_id for chunk_id, _, _ in entries}
+            to_delete.extend(old_ids - new_ids)
+            to_add.extend(chunk for chunk_id, _, chunk in entries if chunk_id not in old_ids)
+            unchanged += len(old_ids & new_ids)
+            new_sources[source] = self._source_manifest(source_hash, entries)
+        
+        if not new_sources:
+            raise Exception("No documents found to index")
+        for source, entry in old_sources.items():
+            if source not in new_sources:
+                to_delete.extend(chunk["id"] for chunk in entry["chunks"])
+        
+        config = self.active_index_config
+        config_changed = (self.index_config is not None
+                          and self.index_config.build_params() != config.build_params())
+        # Vectors from another model, backend or quantization cannot be mixed in
+        embeddings_changed = manifest.get("embeddings") not in (None, self.embeddings.model_name)
+        if embeddings_changed:
+            logger.info(f"🧠 Embeddings changed from {manifest['embeddings']} to "
+                        f"{self.embeddings.model_name}, re-embedding every chunk")
+            config_changed = True
+        if not to_delete and not to_add and not config_changed:
+            logger.info(f"✅ Vector store is up to date ({unchanged} chunks unchanged)")
+            return {"added": 0, "deleted": 0, "unchanged": unchanged}
+        
+        if config_changed or (to_delete and not supports_removal(config)):
+            # Vectors come back from the embedding cache, so a rebuild only
+            # pays for embedding the new chunks
+            config = self.index_config or config
+            logger.info(f"🔁 Rebuilding {config.describe()} index...")
+            deleted = set(to_delete)
+            docs = [doc for doc_id, doc in self._iter_documents() if doc_id not in deleted] + to_add
+            self.embedding_cache.reset_stats()
+            self.vector_store = self._build_faiss_store(
+                docs, [doc.metadata['chunk_id'] for doc in docs], config
+            )
+            self.active_index_config = config
+            self.log_embedding_cache_stats()
+        else:
+            if to_delete:
+                logger.info(f"🗑️  Removing {len(to_delete)} stale chunks...")
+                self.vector_store.delete(to_delete)
+            if to_add:
+                logger.info(f"🔨 Embedding {len(to_add)} new or changed chunks...")
+                self.embedding_cache.reset_stats()
+                self.vector_store.add_documents(
+                    to_add, ids=[chunk.metadata['chunk_id'] for chunk in to_add]
+                )
+                self.log_embedding_cache_stats()
+        
+        for chunk_id in to_delete:
+            self.bm25_index.remove(chunk_id)
+        for chunk in to_add:
+            self.bm25_index.add(chunk.metadata['chunk_id'], chunk.page_content)
+        
+        manifest["index"] = config.to_dict()
+        manifest["embeddings"] = self.embeddings.model_name
+        manifest["sources"] = new_sources
+        self._save_atomic(manifest)
+        logger.info(f"💾 Vector store updated: +{len(to_add)} / -{len(to_delete)} chunks, {unchanged} unchanged")
+        return {"added": len(to_add), "deleted": len(to_delete), "unchanged": unchanged}
+    
+    def _read_index(self, index_name, mmap=False):
+        """Read the saved index, optionally memory-mapped instead of read into RAM.
+        
+        The pickle is read directly rather than through FAISS.load_local,
+        which newer langchain versions refuse without an opt-in flag that
+        older versions do not accept. The file is one this class wrote.
+        """
+        import faiss
+        from langchain.vectorstores import FAISS
+        
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        with span("index_load", mmap=mmap):
+            index = faiss.read_index(
+                os.path.join(self.persist_directory, index_name + ".faiss"), flags
+            )
+            with open(os.path.join(self.persist_directory, index_name + ".pkl"), 'rb') as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(self._embeddings or _lazy_embeddings(self), index, docstore, index_to_docstore_id)
+    
+    def _configure_index(self, manifest):
+        """Apply the saved index type plus any runtime nprobe/efSearch overrides"""
+        config = IndexConfig.from_dict(manifest.get("index") if manifest else None)
+        if self.index_config is not None and self.index_config.index_type == config.index_type:
+            config.nprobe = self.index_config.nprobe
+            config.ef_search = self.index_config.ef_search
+        if config.index_type != "flat":
+            apply_search_params(self.vector_store.index, config)
+        self.active_index_config = config
     
-    def load_vector_store(self):
+    def _load_bm25(self, index_name, manifest):
+        """Load the lexical index saved with this generation, or rebuild it from the docstore"""
+        path = os.path.join(self.persist_directory, index_name + ".bm25")
+        if os.path.exists(path):
+            try:
+                self.bm25_index = BM25Index.load(path)
+                return
+            except Exception as e:
+                logger.warning(f"⚠️  Rebuilding unreadable BM25 index {path}: {e}")
+        if manifest is None:
+            # Indexes built before the manifest have no stable chunk IDs
+            self.bm25_index = None
+            return
+        self.bm25_index = BM25Index()
+        for doc_id, doc in self._iter_documents():
+            self.bm25_index.add(doc_id, doc.page_content)
+    
+    def load_vector_store(self, mmap=True, reload=False):
         """Load existing vector store"""
+        if self.vector_store is not None and not reload and (mmap or not self.memory_mapped):
+            return True
         if os.path.exists(self.persist_directory):
+            manifest = self._load_manifest()
+            index_name = manifest.get("index_name", DEFAULT_INDEX_NAME) if manifest else DEFAULT_INDEX_NAME
+            built_with = manifest.get("embeddings") if manifest else None
+            if built_with and built_with != self.embedding_key:
+                logger.warning(f"⚠️  Index was built with {built_with} embeddings but queries use "
+                               f"{self.embedding_key}; run an update to re-embed it")
+            if mmap:
+                try:
+                    self.vector_store = self._read_index(index_name, mmap=True)
+                    self.memory_mapped = True
+                    self._configure_index(manifest)
+                    self._load_bm25(index_name, manifest)
+                    logger.info("📂 Vector store loaded successfully (memory-mapped)")
+                    return True
+                except Exception as e:
+                    logger.warning(f"⚠️  Memory-mapped load unavailable ({e}), reading index into memory")
             try:
-                self.vector_store = FAISS.load_local(
-                    self.persist_directory, 
-                    self.embeddings
-                )
-                print("📂 Vector store loaded successfully")
+                self.vector_store = self._read_index(index_name)
+                self.memory_mapped = False
+                self._configure_index(manifest)
+                self._load_bm25(index_name, manifest)
+                logger.info("📂 Vector store loaded successfully")
                 return True
             except Exception as e:
-                print(f"❌ Error loading vector store: {e}")
+                logger.error(f"❌ Error loading vector store: {e}")
                 return False
         return False
     
-    def search_documents(self, query, k=5):
-        """Search for relevant documents"""
+    def get_index_version(self):
+        """Identifier of the saved index generation, changes on every rebuild"""
+        manifest = self._load_manifest()
+        if manifest and manifest.get("index_name"):
+            return manifest["index_name"]
+        return DEFAULT_INDEX_NAME
+    
+    def index_size_bytes(self):
+        """On-disk size of the live index generation, a proxy for its resident memory"""
+        manifest = self._load_manifest()
+        index_name = manifest.get("index_name", DEFAULT_INDEX_NAME) if manifest else DEFAULT_INDEX_NAME
+        total = 0
+        for ext in (".faiss", ".pkl", ".bm25"):
+            path = os.path.join(self.persist_directory, index_name + ext)
+            if os.path.exists(path):
+                total += os.path.getsize(path)
+        return total
+    
+    def unload(self):
+        """Drop the loaded index so its memory can be reclaimed"""
+        self.vector_store = None
+        self.bm25_index = None
+        self.memory_mapped = False
+    
+    def _iter_documents(self):
+        """Yield (chunk_id, document) for every vector in the loaded index"""
+        docstore = self.vector_store.docstore
+        for doc_id in self.vector_store.index_to_docstore_id.values():
+            doc = docstore.search(doc_id)
+            if not isinstance(doc, str):
+                yield doc_id, doc
+    
+    def _documents_by_id(self, chunk_ids):
+        documents = []
+        for chunk_id in chunk_ids:
+            doc = self.vector_store.docstore.search(chunk_id)
+            if not isinstance(doc, str):
+                documents.append(doc)
+        return documents
+    
+    def search_documents(self, query, k=5, candidates=20, embedding=None):
+        """Search for relevant documents.
+        
+        Dense FAISS results and BM25 lexical results are fused with
+        reciprocal rank fusion. Queries made only of identifiers (config
+        options, daemon names, rule IDs, API endpoints) take a lexical-only
+        path that skips query embedding. A precomputed query ``embedding``
+        can be passed to avoid embedding the same query once per index.
+        """
         if self.vector_store is None:
             if not self.load_vector_store():
                 raise ValueError("Vector store not found. Please create it first.")
         
-        results = self.vector_store.similarity_search(query, k=k)
-        print(f"🔍 Found {len(results)} relevant documents for query: '{query}'")
+        with span("search", k=k) as stage:
+            results, mode = self._search(query, k, candidates, embedding)
+            stage.set(mode=mode, results=len(results))
+        logger.debug(f"🔍 Found {len(results)} relevant documents ({mode}) for query: '{query}'")
         return results
+    
+    def search_documents_batch(self, queries, k=5, candidates=20, embeddings=None):
+        """Search several queries at once; returns one result list per query.
+        
+        Query vectors (``embeddings``, or embedded here in one batched
+        call) go through a single multi-query FAISS search, then each
+        query is fused with its BM25 results as in search_documents.
+        """
+        if self.vector_store is None:
+            if not self.load_vector_store():
+                raise ValueError("Vector store not found. Please create it first.")
+        
+        queries = list(queries)
+        with span("search_batch", queries=len(queries), k=k):
+            if embeddings is None:
+                dense_queries = [i for i, query in enumerate(queries) if not is_identifier_query(query)]
+                vectors = self.embeddings.embed_queries([queries[i] for i in dense_queries])
+                embeddings = [None] * len(queries)
+                for i, vector in zip(dense_queries, vectors):
+                    embeddings[i] = vector
+            dense_queries = [i for i, vector in enumerate(embeddings) if vector is not None]
+            dense = [None] * len(queries)
+            ranked = self._dense_search_batch(
+                [embeddings[i] for i in dense_queries], max(k, candidates)
+            )
+            for i, docs in zip(dense_queries, ranked):
+                dense[i] = docs
+            return [self._search(query, k, candidates, embedding, dense=docs)[0]
+                    for query, embedding, docs in zip(queries, embeddings, dense)]
+    
+    def _dense_search_batch(self, embeddings, k):
+        """Nearest chunks of several query vectors with one FAISS search call"""
+        if not embeddings:
+            return []
+        import numpy as np
+        import faiss
+        
+        store = self.vector_store
+        vectors = np.array(embeddings, dtype='float32')
+        if store._normalize_L2:
+            faiss.normalize_L2(vectors)
+        _, indices = store.index.search(vectors, k)
+        return [self._documents_by_id(store.index_to_docstore_id[i] for i in row if i != -1)
+                for row in indices]
+    
+    def _dense_search(self, query, k, embedding, dense=None):
+        if dense is not None:
+            return dense[:k]
+        if embedding is not None:
+            return self.vector_store.similarity_search_by_vector(embedding, k=k)
+        return self.vector_store.similarity_search(query, k=k)
+    
+    def _search(self, query, k, candidates, embedding=None, dense=None):
+        """Return (documents, retrieval mode) for a query, optionally with precomputed dense results"""
+        if self.bm25_index is not None and len(self.bm25_index) and is_identifier_query(query):
+            lexical = self.bm25_index.search(query, k=k)
+            if lexical:
+                return self._documents_by_id(chunk_id for chunk_id, _ in lexical), "lexical"
+        
+        if self.bm25_index is None or not len(self.bm25_index):
+            return self._dense_search(query, k, embedding, dense), "dense"
+        
+        fetch = max(k, candidates)
+        dense = self._dense_search(query, fetch, embedding, dense)
+        dense_ids = [doc.metadata.get('chunk_id') for doc in dense]
+        lexical_ids = [chunk_id for chunk_id, _ in self.bm25_index.search(query, k=fetch)]
+        fused = reciprocal_rank_fusion([dense_ids, lexical_ids])
+        
+        dense_by_id = dict(zip(dense_ids, dense))
+        top_ids = [chunk_id for chunk_id, _ in fused[:k]]
+        missing = self._documents_by_id(i for i in top_ids if i not in dense_by_id)
+        missing_by_id = {doc.metadata.get('chunk_id'): doc for doc in missing}
+        results = [dense_by_id.get(i) or missing_by_id.get(i) for i in top_ids]
+        return [doc for doc in results if doc is not None], "hybrid"
 
 if __name__ == "__main__":
-    vector_store = WazuhVectorStore()
+    parser = argparse.ArgumentParser(description="Build or refresh the Wazuh vector store")
+    parser.add_argument("--update", action="store_true",
+                        help="Re-index only new or changed documentation sources")
+    parser.add_argument("--download", action="store_true",
+                        help="Refresh the documentation before indexing")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=None,
+                        help="FAISS index type (default: keep the saved type, flat for new stores)")
+    parser.add_argument("--nprobe", type=int, default=8, help="IVF lists searched per query")
+    parser.add_argument("--ef-search", type=int, default=64, help="HNSW search breadth")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Parse/chunk worker processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=256,
+                        help="Chunks embedded and added to the index per batch")
+    add_embedding_arguments(parser)
+    args = parser.parse_args()
+    configure_logging()
+    
+    index_config = None
+    if args.index_type:
+        index_config = IndexConfig(args.index_type, nprobe=args.nprobe, ef_search=args.ef_search)
+    vector_store = WazuhVectorStore(
+        index_config=index_config,
+        embedding_batch_size=args.batch_size,
+        ingest_workers=args.workers,
+        **embedding_options(args)
+    )
     
-    if not vector_store.load_vector_store():
-        print("🆕 Creating new vector store...")
-        vector_store.create_vector_store()
+    if args.update:
+        vector_store.update_vector_store(force_download=args.download)
+    elif not vector_store.load_vector_store():
+        logger.info("🆕 Creating new vector store...")
+        vector_store.create_vector_store(force_download=args.download)
@@ -1,13 +1,59 @@
 # wazuh_specialist.py
 import ollama
 from vector_store import WazuhVectorStore
-import json
+from answer_cache import SemanticAnswerCache
+from context_packer import ContextPacker
+from conversation import ConversationSession
+from telemetry import configure_logging, get_logger, metrics, span
+import time
+
+logger = get_logger("wazuh_specialist")
+
+# Bump whenever the system prompt or PROMPT_TEMPLATE changes so cached
+# answers produced by an older prompt are no longer served.
+PROMPT_TEMPLATE_VERSION = "2"
+
+PROMPT_TEMPLATE = """Based on the following Wazuh documentation context, please answer the user's question thoroughly and professionally.
+
+DOCUMENTATION CONTEXT:
+{context}
+
+USER QUESTION: {question}
+
+Please provide a comprehensive answer as a Wazuh specialist. Include:
+1. Clear explanation of the concept or solution
+2. Step-by-step instructions if applicable
+3. Configuration examples or code snippets
+4. Best practices and considerations
+5. References to relevant Wazuh components
+
+Wazuh Specialist Answer:"""
 
 class WazuhSpecialist:
-    def __init__(self):
-        self.vector_store = WazuhVectorStore()
+    def __init__(self, vector_store=None, ollama_host=None, use_answer_cache=True,
+                 answer_cache_path="./wazuh_answer_cache.json",
+                 cache_similarity_threshold=0.92, cache_max_entries=500,
+                 cache_ttl_seconds=7 * 24 * 3600, num_ctx=4096, answer_reserve=1024,
+                 retrieval_candidates=15):
+        # Reuse the process-wide store so the embedding model and index load once
+        self.vector_store = vector_store or WazuhVectorStore.shared()
         self.vector_store.load_vector_store()
         self.model = "llama3"  # or "mistral" or "codellama"
+        self.client = ollama.Client(host=ollama_host)
+        self.num_ctx = num_ctx
+        self.retrieval_candidates = retrieval_candidates
+        self.context_packer = ContextPacker(num_ctx=num_ctx, answer_reserve=answer_reserve)
+        self.answer_cache = None
+        if use_answer_cache:
+            self.answer_cache = SemanticAnswerCache(
+                answer_cache_path,
+                similarity_threshold=cache_similarity_threshold,
+                max_entries=cache_max_entries,
+                ttl_seconds=cache_ttl_seconds
+            )
+        self.last_answer_info = {}
+        self.last_generation_stats = {}
+        self.last_sources = []
         
         # Enhanced system prompt for Wazuh expertise
         self.system_prompt = """You are a Senior Wazuh Specialist with extensive experience in:
@@ -28,58 +74,228 @@ Always include specific configuration examples, command line instructions, and b
 
 CRITICAL: If the information is not found in the provided context, explicitly state that you cannot find it in the documentation and suggest checking the official Wazuh documentation or community forums."""
 
+    def cache_namespace(self):
+        """Key under which cached answers are valid"""
+        return f"{self.model}|{PROMPT_TEMPLATE_VERSION}|{self.vector_store.get_index_version()}"
+
+    def retrieve(self, question, used_tokens=None, select=None):
+        """Return (context, sources) for a question without touching instance state.
+        
+        More candidates than fit are retrieved and packed into the token
+        budget left by num_ctx after the system prompt, the prompt template
+        and the answer reserve. A conversation passes the tokens it already
+        occupies as ``used_tokens`` and can filter candidates with ``select``.
+        """
+        with span("retrieve"):
+            candidates = self.vector_store.search_documents(question, k=self.retrieval_candidates)
+        if select is not None:
+            candidates = select(candidates)
+        return self.pack_context(question, candidates, used_tokens)
+
+    def retrieve_batch(self, questions, embeddings=None):
+        """Return [(context, sources)] for several questions with one batched search"""
+        with span("retrieve", questions=len(questions)):
+            results = self.vector_store.search_documents_batch(
+                questions, k=self.retrieval_candidates, embeddings=embeddings
+            )
+        return [self.pack_context(question, candidates)
+                for question, candidates in zip(questions, results)]
+
+    def pack_context(self, question, candidates, used_tokens=None):
+        """Pack retrieved candidates into the prompt's token budget; return (context, sources)"""
+        with span("prompt_build", candidates=len(candidates)) as stage:
+            if used_tokens is not None:
+                fixed_tokens = used_tokens
+            else:
+                fixed_tokens = (self.context_packer.count_tokens(self.system_prompt)
+                                + self.context_packer.count_tokens(self.build_prompt(question, "")))
+            budget = self.context_packer.budget(fixed_tokens)
+            context, sources, context_tokens = self.context_packer.pack(candidates, budget)
+            stage.set(context_tokens=context_tokens, budget=budget)
+        metrics.observe("prompt_tokens", fixed_tokens + context_tokens)
+        logger.info(f"🧮 Prompt tokens: {fixed_tokens + context_tokens}/{self.num_ctx} "
+                    f"(context {context_tokens}/{budget}, system+template {fixed_tokens}, "
+                    f"{len(sources)} excerpts from {len(candidates)} candidates)")
+        return context, sources
+
     def get_relevant_context(self, question):
         """Get relevant documentation for the question"""
-        relevant_docs = self.vector_store.search_documents(question, k=5)
-        context = "\n\n--- DOCUMENTATION EXCERPT ---\n".join([
-            f"SOURCE: {doc.metadata.get('source', 'Unknown')}\nCONTENT:\n{doc.page_content}" 
-            for doc in relevant_docs
-        ])
+        context, self.last_sources = self.retrieve(question)
         return context
 
-    def ask_question(self, question):
-        """Ask a question to the Wazuh specialist"""
-        print(f"🔍 Searching Wazuh documentation for: '{question}'")
-        
-        # Get relevant context
-        context = self.get_relevant_context(question)
-        
-        # Create the prompt with context
-        prompt = f"""Based on the following Wazuh documentation context, please answer the user's question thoroughly and professionally.
+    def build_prompt(self, question, context):
+        """Fill the answer prompt template"""
+        return PROMPT_TEMPLATE.format(context=context, question=question)
 
-DOCUMENTATION CONTEXT:
-{context}
+    def generation_options(self):
+        """Sampling options passed to Ollama"""
+        return {
+            'temperature': 0.2,  # Lower temperature for more factual responses
+            'top_k': 40,
+            'top_p': 0.9,
+            'num_ctx': self.num_ctx  # Larger context window
+        }
 
-USER QUESTION: {question}
+    @staticmethod
+    def generation_stats(final, first_token_time, generation_time):
+        """Build per-answer timing stats from Ollama's final stream chunk"""
+        eval_count = final.get('eval_count') or 0
+        eval_duration = (final.get('eval_duration') or 0) / 1e9
+        return {
+            "time_to_first_token": first_token_time,
+            "generation_time": generation_time,
+            "prompt_eval_count": final.get('prompt_eval_count') or 0,
+            "prompt_eval_time": (final.get('prompt_eval_duration') or 0) / 1e9,
+            "eval_count": eval_count,
+            "eval_time": eval_duration,
+            "tokens_per_second": eval_count / eval_duration if eval_duration else 0.0
+        }
 
-Please provide a comprehensive answer as a Wazuh specialist. Include:
-1. Clear explanation of the concept or solution
-2. Step-by-step instructions if applicable
-3. Configuration examples or code snippets
-4. Best practices and considerations
-5. References to relevant Wazuh components
+    @staticmethod
+    def record_generation_metrics(stats):
+        """Export Ollama's own prompt-eval and eval counters and timings"""
+        metrics.inc("prompt_eval_tokens_total", stats["prompt_eval_count"])
+        metrics.inc("eval_tokens_total", stats["eval_count"])
+        metrics.observe("prompt_eval_seconds", stats["prompt_eval_time"])
+        metrics.observe("eval_seconds", stats["eval_time"])
+        if stats["time_to_first_token"] is not None:
+            metrics.observe("time_to_first_token_seconds", stats["time_to_first_token"])
 
-Wazuh Specialist Answer:"""
+    def lookup_cached_answer(self, question, question_embedding=None):
+        """Return (entry, similarity, question_embedding, namespace) from the answer cache"""
+        if self.answer_cache is None:
+            return None, None, None, None
+        namespace = self.cache_namespace()
+        if question_embedding is None:
+            question_embedding = self.vector_store.embeddings.embed_query(question)
+        with span("cache_lookup") as stage:
+            entry, similarity = self.answer_cache.lookup(namespace, question_embedding)
+            stage.set(hit=entry is not None)
+        metrics.inc("answer_cache_total", result="hit" if entry is not None else "miss")
+        return entry, similarity, question_embedding, namespace
+
+    def store_cached_answer(self, namespace, question, question_embedding, answer,
+                            generation_time, sources):
+        if self.answer_cache is not None and question_embedding is not None:
+            self.answer_cache.store(
+                namespace, question, question_embedding, answer,
+                generation_time=generation_time, sources=sources
+            )
+
+    def generate_stream(self, prompt, stats, start=None, context=None, keep_alive=None,
+                        result=None):
+        """Yield tokens for a prepared prompt and fill ``stats`` once Ollama is done.
         
-        try:
-            response = ollama.generate(
+        Passing the ``context`` tokens of a previous turn continues that
+        conversation: the system prompt is already part of it and is not
+        sent again. ``result["context"]`` receives the context tokens that
+        continue this turn.
+        """
+        start = start if start is not None else time.perf_counter()
+        final = {}
+        first_token_time = None
+        generation_start = time.perf_counter()
+        request = {"context": context} if context is not None else {"system": self.system_prompt}
+        with span("generate", model=self.model, continued=context is not None) as stage:
+            for chunk in self.client.generate(
                 model=self.model,
                 prompt=prompt,
-                system=self.system_prompt,
-                options={
-                    'temperature': 0.2,  # Lower temperature for more factual responses
-                    'top_k': 40,
-                    'top_p': 0.9,
-                    'num_ctx': 4096  # Larger context window
-                }
-            )
-            
-            return response['response']
+                options=self.generation_options(),
+                stream=True,
+                keep_alive=keep_alive,
+                **request
+            ):
+                token = chunk.get('response', '')
+                if token:
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter() - start
+                    yield token
+                if chunk.get('done'):
+                    final = chunk
+            stats.update(self.generation_stats(
+                final, first_token_time, time.perf_counter() - generation_start
+            ))
+            stage.set(prompt_eval_count=stats["prompt_eval_count"], eval_count=stats["eval_count"])
+        self.record_generation_metrics(stats)
+        if result is not None:
+            result["context"] = final.get('context') if final else None
+
+    def ask_question_stream(self, question):
+        """Ask a question and yield answer tokens as Ollama produces them"""
+        start = time.perf_counter()
+        self.last_answer_info = {"cache_hit": False}
+        self.last_generation_stats = {}
+        
+        entry, similarity, question_embedding, namespace = self.lookup_cached_answer(question)
+        if entry is not None:
+            self.last_sources = entry.get("sources", [])
+            self.last_answer_info = {
+                "cache_hit": True,
+                "similarity": similarity,
+                "cached_question": entry["question"],
+                "latency": time.perf_counter() - start,
+                "latency_saved": entry.get("generation_time", 0.0)
+            }
+            yield entry["answer"]
+            return
+        
+        logger.info(f"🔍 Searching Wazuh documentation for: '{question}'")
+        
+        # Get relevant context
+        context = self.get_relevant_context(question)
+        
+        # Create the prompt with context
+        prompt = self.build_prompt(question, context)
+        
+        parts = []
+        stats = {}
+        try:
+            for token in self.generate_stream(prompt, stats, start=start):
+                parts.append(token)
+                yield token
         
         except Exception as e:
-            return f"❌ Error communicating with AI model: {e}"
+            yield f"❌ Error communicating with AI model: {e}"
+            return
+        
+        latency = time.perf_counter() - start
+        self.last_answer_info["latency"] = latency
+        self.last_generation_stats = stats
+        self.store_cached_answer(
+            namespace, question, question_embedding, "".join(parts),
+            generation_time=latency, sources=self.last_sources
+        )
+
+    def ask_question(self, question):
+        """Ask a question to the Wazuh specialist"""
+        return "".join(self.ask_question_stream(question))
 
-    def start_chat(self):
+    def print_generation_stats(self):
+        """Show time-to-first-token and throughput of the last answer"""
+        stats = self.last_generation_stats
+        if not stats:
+            return
+        first_token = stats["time_to_first_token"]
+        first_token = f"{first_token:.1f}s" if first_token is not None else "n/a"
+        print(f"⏱️  First token: {first_token} | Generation: {stats['generation_time']:.1f}s | "
+              f"{stats['eval_count']} tokens at {stats['tokens_per_second']:.1f} tok/s")
+
+    def print_answer_cache_info(self):
+        """Show whether the last answer came from the cache and the time saved"""
+        if self.answer_cache is None:
+            return
+        info = self.last_answer_info
+        if info.get("cache_hit"):
+            print(f"⚡ Answer cache hit (similarity {info['similarity']:.2f} to "
+                  f"'{info['cached_question']}') in {info['latency']:.2f}s, "
+                  f"saved ~{info['latency_saved']:.1f}s")
+        elif "latency" in info:
+            print(f"🆕 Answer cache miss, generated in {info['latency']:.1f}s")
+        stats = self.answer_cache.stats()
+        print(f"📊 Answer cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['latency_saved']:.1f}s saved this session")
+
+    def start_chat(self, stream=True):
         """Start an interactive chat session"""
         print("=" * 70)
         print("🤖 Wazuh AI Specialist Assistant")
@@ -89,6 +305,8 @@ Wazuh Specialist Answer:"""
         print("Commands: 'quit' to exit, 'clear' to start over, 'sources' to show doc sources")
         print("=" * 70)
         
+        # Follow-up questions continue the same model context until 'clear'
+        session = ConversationSession(self)
         while True:
             user_input = input("\n🎯 Your Wazuh Question: ").strip()
             
@@ -96,22 +314,42 @@ Wazuh Specialist Answer:"""
                 print("👋 Thank you for using Wazuh AI Specialist!")
                 break
             elif user_input.lower() == 'clear':
+                session.reset()
                 print("🔄 Conversation context cleared.")
                 continue
             elif user_input.lower() == 'sources':
-                print("📖 Documentation sources: Official Wazuh documentation (all URLs provided)")
+                if session.sources:
+                    print("📖 Documentation sources used in this conversation:")
+                    for source in session.sources:
+                        print(f"   - {source}")
+                else:
+                    print("📖 Documentation sources: Official Wazuh documentation (all URLs provided)")
                 continue
             elif not user_input:
                 continue
             
             print("⏳ Researching Wazuh documentation...")
-            answer = self.ask_question(user_input)
-            
-            print(f"\n💡 Wazuh Specialist Answer:")
-            print("=" * 60)
-            print(answer)
+            if stream:
+                tokens = session.ask_stream(user_input)
+                first = next(tokens, "")
+                print("\n💡 Wazuh Specialist Answer:")
+                print("=" * 60)
+                print(first, end="", flush=True)
+                for token in tokens:
+                    print(token, end="", flush=True)
+                print()
+            else:
+                answer = session.ask(user_input)
+                print("\n💡 Wazuh Specialist Answer:")
+                print("=" * 60)
+                print(answer)
             print("=" * 60)
+            self.last_generation_stats = session.last_generation_stats
+            self.print_generation_stats()
+            session.print_turn_stats()
+            self.print_answer_cache_info()
 
 if __name__ == "__main__":
+    configure_logging()
     specialist = WazuhSpecialist()
     specialist.start_chat()